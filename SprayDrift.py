@@ -1,11 +1,15 @@
 """Class definition of the SprayDrift component."""
 from osgeo import ogr, osr
+import csv
 import datetime
 import h5py
 import numpy as np
 import os
+import shutil
+import time
 import base
 import attrib
+from . import native
 
 
 class SprayDrift(base.Component):
@@ -20,6 +24,44 @@ class SprayDrift(base.Component):
     """
     # RELEASES
     VERSION = base.VersionCollection(
+        base.VersionInfo("2.6.37", "2026-10-18"),
+        base.VersionInfo("2.6.36", "2026-10-18"),
+        base.VersionInfo("2.6.35", "2026-10-18"),
+        base.VersionInfo("2.6.34", "2026-10-18"),
+        base.VersionInfo("2.6.33", "2026-10-18"),
+        base.VersionInfo("2.6.32", "2026-10-18"),
+        base.VersionInfo("2.6.31", "2026-10-18"),
+        base.VersionInfo("2.6.30", "2026-10-18"),
+        base.VersionInfo("2.6.29", "2026-10-18"),
+        base.VersionInfo("2.6.28", "2026-10-18"),
+        base.VersionInfo("2.6.27", "2026-10-18"),
+        base.VersionInfo("2.6.26", "2026-10-18"),
+        base.VersionInfo("2.6.25", "2026-10-18"),
+        base.VersionInfo("2.6.24", "2026-10-18"),
+        base.VersionInfo("2.6.23", "2026-10-18"),
+        base.VersionInfo("2.6.22", "2026-10-18"),
+        base.VersionInfo("2.6.21", "2026-10-18"),
+        base.VersionInfo("2.6.20", "2026-10-18"),
+        base.VersionInfo("2.6.19", "2026-10-18"),
+        base.VersionInfo("2.6.18", "2026-10-18"),
+        base.VersionInfo("2.6.17", "2026-10-18"),
+        base.VersionInfo("2.6.16", "2026-10-18"),
+        base.VersionInfo("2.6.15", "2026-10-18"),
+        base.VersionInfo("2.6.14", "2026-10-18"),
+        base.VersionInfo("2.6.13", "2026-10-18"),
+        base.VersionInfo("2.6.12", "2026-10-18"),
+        base.VersionInfo("2.6.11", "2026-10-18"),
+        base.VersionInfo("2.6.10", "2026-10-18"),
+        base.VersionInfo("2.6.9", "2026-10-18"),
+        base.VersionInfo("2.6.8", "2026-10-18"),
+        base.VersionInfo("2.6.7", "2026-10-18"),
+        base.VersionInfo("2.6.6", "2026-10-18"),
+        base.VersionInfo("2.6.5", "2026-10-18"),
+        base.VersionInfo("2.6.4", "2026-10-18"),
+        base.VersionInfo("2.6.3", "2026-10-18"),
+        base.VersionInfo("2.6.2", "2026-10-18"),
+        base.VersionInfo("2.6.1", "2026-10-18"),
+        base.VersionInfo("2.6.0", "2026-10-18"),
         base.VersionInfo("2.5.6", "2023-09-19"),
         base.VersionInfo("2.5.5", "2023-09-18"),
         base.VersionInfo("2.5.4", "2023-09-13"),
@@ -158,6 +200,195 @@ class SprayDrift(base.Component):
     VERSION.added("2.5.5", "Input descriptions")
     VERSION.added("2.5.5", "Runtime warnings and notes regarding status of component and documentation")
     VERSION.added("2.5.6", "Documentation of `Exposure` output")
+    VERSION.added("2.6.0", "Native NumPy engine and `Engine` input to select it instead of the R module")
+    VERSION.added("2.6.1", "`Workers` input to simulate applications of the native engine in parallel processes")
+    VERSION.changed("2.6.1", "Native engine derives a random stream per application")
+    VERSION.changed("2.6.2", "Random numbers derived per application and exposure path in both engines")
+    VERSION.changed("2.6.2", "Updated module to version 3.8")
+    VERSION.changed("2.6.3", "Spatial index of habitats and drift-filtering vegetation queried per application")
+    VERSION.changed("2.6.3", "Updated module to version 3.9")
+    VERSION.changed("2.6.4", "Habitats rasterized once into a mask shared by all applications")
+    VERSION.changed("2.6.4", "Updated module to version 3.10")
+    VERSION.added("2.6.5", "`FilteringMethod` input and raster-based drift-filtering of the native engine")
+    VERSION.added("2.6.5", "Benchmark of drift-filtering methods")
+    VERSION.fixed("2.6.5", "Vegetation widths of trajectories through vegetation vertices in the native engine")
+    VERSION.changed(
+        "2.6.6",
+        "Module output is transferred based on the chunk index of `arr.dat`, skipping unwritten and all-zero blocks"
+    )
+    VERSION.added("2.6.7", "`ExposureFormat` input and sparse 1sqm exposure outputs")
+    VERSION.added("2.6.8", "`WriteBufferSize` input")
+    VERSION.changed("2.6.8", "1sqm deposition is combined per day and written once per day in both engines")
+    VERSION.changed("2.6.8", "Updated module to version 3.11")
+    VERSION.changed(
+        "2.6.9",
+        "base_geometry exposure is aggregated from a single label raster and written in one block in both engines"
+    )
+    VERSION.changed("2.6.9", "Updated module to version 3.12")
+    VERSION.changed(
+        "2.6.10",
+        "Base and application geometries are exported to GeoPackages in a single transaction with spatial index and "
+        "timing"
+    )
+    VERSION.changed("2.6.10", "Updated module to version 3.13")
+    VERSION.added(
+        "2.6.11",
+        "`LandscapeCache` and `LandscapeCacheSize` inputs for a cross-run cache of landscape preprocessing"
+    )
+    VERSION.changed(
+        "2.6.12",
+        "Exposure paths and downwind distances are computed once per applied area and wind sector in both engines"
+    )
+    VERSION.changed("2.6.12", "Updated module to version 3.14")
+    VERSION.added(
+        "2.6.13",
+        "`DriftCurves` input and lookup-table evaluation of the deposition curves in the native engine"
+    )
+    VERSION.added("2.6.13", "Deposition curve benchmark")
+    VERSION.added(
+        "2.6.14",
+        "Per-stage instrumentation of wall time, peak memory and counts, reported to the observer and written to "
+        "`instrumentation.json`"
+    )
+    VERSION.changed("2.6.14", "Updated module to version 3.15")
+    VERSION.added("2.6.15", "Throughput benchmark on synthetic landscapes with results recorded per commit")
+    VERSION.added(
+        "2.6.16",
+        "`reference` exposure format that leaves 1-square meter exposure in an HDF5 file of the processing path and "
+        "outputs its path as `ExposureFile`"
+    )
+    VERSION.added(
+        "2.6.17",
+        "Per-application deposition fragments in the landscape cache for incremental re-simulation by the native "
+        "engine"
+    )
+    VERSION.added(
+        "2.6.18",
+        "`MaxMemory` input that bounds the memory for writing 1-square meter exposure by tiling the extent"
+    )
+    VERSION.changed(
+        "2.6.18",
+        "The native engine routes 1-square meter deposition to tiles and spills, reads back and writes every tile on "
+        "its own"
+    )
+    VERSION.changed("2.6.18", "Updated module to version 3.16")
+    VERSION.added(
+        "2.6.19",
+        "`ExposureSummaries` input and `ExposureMax`, `ExposureSum` and `ExposureEventCount` outputs accumulated while"
+        " exposure is written or transferred"
+    )
+    VERSION.added(
+        "2.6.20",
+        "`Realizations` input that simulates a Monte Carlo ensemble in one run of the native engine, sharing the "
+        "landscape and source tables across realizations"
+    )
+    VERSION.changed(
+        "2.6.20",
+        "The native engine evaluates the deposition curves and drift-filtering of all realizations of an application "
+        "at once"
+    )
+    VERSION.added(
+        "2.6.21",
+        "`WindDirection` input accepts daily time series and per-application arrays of wind directions"
+    )
+    VERSION.changed(
+        "2.6.21",
+        "Wind directions are resolved per application into a uint16 vector that the module receives with the "
+        "application geometries instead of rescaling a global value"
+    )
+    VERSION.changed("2.6.21", "The native engine samples random wind directions of all applications at once")
+    VERSION.changed("2.6.21", "Updated module to version 3.17")
+    VERSION.changed(
+        "2.6.22",
+        "Native engine evaluates the deposition curves of consecutive applications of the same day in batches, while "
+        "every application keeps its own region of interest, source table and output write"
+    )
+    VERSION.changed(
+        "2.6.23",
+        "Every input is read from the store and described only once per run, and the reads are counted by the new "
+        "`input read` stage of the instrumentation"
+    )
+    VERSION.changed(
+        "2.6.24",
+        "The scalar module parameters are written as one compound record tagged with a parameter schema version "
+        "instead of one dataset per parameter"
+    )
+    VERSION.changed("2.6.24", "Updated module to version 3.18")
+    VERSION.added(
+        "2.6.25",
+        "`benchmarks/reference_values.py` checks the NumPy port of the XDrift functions against values computed by the"
+        " XDrift R package"
+    )
+    VERSION.changed(
+        "2.6.25",
+        "Exact XSprayDrift deposition inverts the gamma distribution only for distinct pairs of quantile and distance "
+        "class, with SciPy if installed and otherwise iterating only unconverged values"
+    )
+    VERSION.fixed(
+        "2.6.26",
+        "Overlapping habitats at base_geometry scale each receive the deposition of all their cells instead of only "
+        "the last rasterized habitat"
+    )
+    VERSION.fixed(
+        "2.6.27",
+        "Removed the unused lookup tables of the Rautmann and AgDRIFT models, tables only apply to XSprayDrift"
+    )
+    VERSION.fixed(
+        "2.6.28",
+        "The simulation stage of the native engine no longer includes the time of the write-back and base_geometry "
+        "aggregation stages"
+    )
+    VERSION.changed(
+        "2.6.29",
+        "The throughput benchmark runs the SprayDrift component itself instead of a copy of its native pipeline"
+    )
+    VERSION.changed(
+        "2.6.30",
+        "Random streams and cached deposition fragments of the native engine are keyed by the content of an "
+        "application instead of its index"
+    )
+    VERSION.changed(
+        "2.6.31",
+        "Native engine batches the evaluation of deposition curves of applications of the same day and wind sectors "
+        "within 256 consecutive applications instead of only consecutive applications of the same day"
+    )
+    VERSION.changed("2.6.32", "Updated module to version 3.19")
+    VERSION.fixed("2.6.32", "The R engine no longer fails to write its parameters if FilteringTypes are specified")
+    VERSION.changed("2.6.33", "Updated module to version 3.20")
+    VERSION.fixed(
+        "2.6.33",
+        "Overlapping habitats at base_geometry scale each receive the deposition of all their cells with the R engine,"
+        " too"
+    )
+    VERSION.changed(
+        "2.6.34",
+        "The application geometries passed to the module carry the content identity of every application, by which the"
+        " module keys its random streams"
+    )
+    VERSION.changed("2.6.34", "Updated module to version 3.21")
+    VERSION.changed(
+        "2.6.35",
+        "The `RandomSeed` and `Engine` documentation describe content-based random streams and that a fixed seed "
+        "reproduces results only within the same engine"
+    )
+    VERSION.added(
+        "2.6.36",
+        "Source tables of the native engine are kept in the `LandscapeCache` and shared across runs and worker "
+        "processes"
+    )
+    VERSION.added("2.6.37", "`Profiling` input that enables sampling of the peak resident set size per stage")
+    VERSION.changed(
+        "2.6.37",
+        "Stages of the instrumentation sample the peak resident set size only if `Profiling` is enabled"
+    )
+    VERSION.changed(
+        "2.6.37",
+        "`model evaluation` and `filtering` are measured per batch and the write-back of the native engine in total "
+        "instead of per application"
+    )
+
+    # The version of the layout of the parameter record of the module, which the module checks when it starts
+    PARAMETER_SCHEMA_VERSION = 1
 
     def __init__(self, name, observer, store):
         """
@@ -171,7 +402,7 @@ class SprayDrift(base.Component):
         super(SprayDrift, self).__init__(name, observer, store)
         self._module = base.Module(
             "XSprayDrift",
-            "3.6",
+            "3.21",
             "module",
             r"module\README.md",
             base.Module(
@@ -299,14 +530,18 @@ class SprayDrift(base.Component):
             ),
             base.Input(
                 "WindDirection",
-                (attrib.Class(int), attrib.Unit("deg"), attrib.Scales("global")),
+                (attrib.Unit("deg"),),
                 self.default_observer,
-                description="Sets a wind direction at a global scale, i.e., direction of wind is always and everywhere "
-                            "the value of this input. Wind direction is given in a meteorological notation, i.e., as "
+                description="Sets the wind direction. Wind direction is given in a meteorological notation, i.e., as "
                             "the direction where the wind is blowing from. For instance, a value of `270` would "
-                            "describe wind that is blowing from West to East. If you specify the `WindDirection` as "
-                            "`-1`, the spray-drift component will sample a random wind-direction at an application "
-                            "scale based on a uniform distribution across the windrose."
+                            "describe wind that is blowing from West to East. The input is either an `int` at a "
+                            "global scale, i.e., direction of wind is always and everywhere the value of this input, "
+                            "an array of scale `time/day` with a wind direction for every simulated day starting at "
+                            "the `SimulationStart`, e.g., taken from weather data, or an array of scale "
+                            "`other/application` with a wind direction for every application. If you specify a "
+                            "wind direction as `-1`, or as `65535` in unsigned arrays, the spray-drift component "
+                            "will sample a random wind-direction at an application scale based on a uniform "
+                            "distribution across the windrose."
             ),
             base.Input(
                 "SprayDriftModel",
@@ -422,7 +657,11 @@ class SprayDrift(base.Component):
                 description="Allows to fix a seed for the random sampling of wind directions and deposition quantiles "
                             "if the `WindDirection` input is set tp `-1` or `XSprayDrift` is used as spray-drift model "
                             "(see `SprayDriftModel` input). Fixing the seed can help for debugging or demonstration "
-                            "purposes. A value of `0` is not used as seed but results in a randomly sampled seed."
+                            "purposes. A value of `0` is not used as seed but results in a randomly sampled seed. "
+                            "Random numbers are derived from the seed, the identity of the application and the "
+                            "exposure path. The identity is derived from the applied area, the day, the rate and the "
+                            "drift reduction of the application, so an application keeps its random numbers if other "
+                            "applications are added, removed or reordered."
             ),
             base.Input(
                 "FilteringTypes",
@@ -489,6 +728,159 @@ class SprayDrift(base.Component):
                 self.default_observer,
                 description="Specifies the quantile for the AgDRIFT model. This input is only in use, if `AgDrift` "
                             "is used as value of the `SprayDriftModel` input."
+            ),
+            base.Input(
+                "Engine",
+                (attrib.Class(str), attrib.Unit(None), attrib.Scales("global"), attrib.InList(("R", "native"))),
+                self.default_observer,
+                description="Selects the implementation that simulates spray-drift. A value of `R` runs the "
+                            "`XSprayDrift` module in its R runtime environment, which requires a 64-bit Windows. A "
+                            "value of `native` runs a vectorized NumPy implementation of the same simulation "
+                            "in-process and on any platform. The native engine does not exchange data through the "
+                            "file system and writes the simulated deposition directly into the `Exposure` output. "
+                            "It does not reproduce the random numbers drawn by R, so results of both engines agree "
+                            "in distribution, but not value by value if random sampling is involved. A fixed "
+                            "`RandomSeed` therefore reproduces results only within the same engine."
+            ),
+            base.Input(
+                "Workers",
+                (attrib.Class(int), attrib.Unit(None), attrib.Scales("global")),
+                self.default_observer,
+                description="The number of worker processes among which the native engine splits applications. "
+                            "Each worker simulates the deposition of its applications independently and the "
+                            "component merges the results into the `Exposure` output by simulation day. Every "
+                            "application draws from its own random stream, so results do not depend on the number "
+                            "of workers. A value of `1` simulates all applications in the process of the component. "
+                            "This input is only in use, if `native` is used as value of the `Engine` input."
+            ),
+            base.Input(
+                "FilteringMethod",
+                (attrib.Class(str), attrib.Unit(None), attrib.Scales("global"), attrib.InList(("vector", "raster"))),
+                self.default_observer,
+                description="The method by which the native engine determines the width of vegetation that is "
+                            "crossed by the trajectory between a sink and the upwind field edge. `vector` intersects "
+                            "every trajectory with the vegetation geometries. `raster` accumulates the vegetation "
+                            "coverage along the grid lines of the wind direction once per application and derives the "
+                            "widths of all trajectories from cumulative sums, which is considerably faster and "
+                            "deviates by less than 1 m from the `vector` method. This input is only in use, if "
+                            "`native` is used as value of the `Engine` input and `FilteringTypes` are specified."
+            ),
+            base.Input(
+                "DriftCurves",
+                (attrib.Class(str), attrib.Unit(None), attrib.Scales("global"), attrib.InList(("exact", "table"))),
+                self.default_observer,
+                description="The evaluation of the deposition curves of the `XSprayDrift` spray-drift model by the "
+                            "native engine. `exact` evaluates the gamma quantile functions for every exposure path. "
+                            "`table` tabulates them once per distance class and interpolates linearly, which is "
+                            "considerably faster and deviates by less than 0.01% from `exact`. Tables only apply to "
+                            "the `XSprayDrift` model, the `90thRautmann` and `AgDrift` models are always evaluated "
+                            "exactly, because their closed forms are faster than interpolation. This input is only in "
+                            "use, if `native` is used as value of the `Engine` input."
+            ),
+            base.Input(
+                "ExposureFormat",
+                (
+                    attrib.Class(str),
+                    attrib.Unit(None),
+                    attrib.Scales("global"),
+                    attrib.InList(("dense", "sparse", "reference"))
+                ),
+                self.default_observer,
+                description="The representation of 1-square meter deposition. `dense` writes the `Exposure` output "
+                            "as a raster of every cell and day. `sparse` instead writes only the cells with non-zero "
+                            "deposition into the `SparseExposureCells`, `SparseExposureValues` and "
+                            "`SparseExposureIndex` outputs, which reduces disk space and memory by orders of "
+                            "magnitude. A dense view of any window can be restored by `native.SparseExposure`. "
+                            "`reference` leaves the raster in an HDF5 file within the `ProcessingPath` instead of "
+                            "copying it into the store and writes the path of the file into the `ExposureFile` "
+                            "output. Windows of the file are read on demand by `native.ExposureReference`. The "
+                            "`ProcessingPath` must therefore be kept as long as the exposure is used. The "
+                            "`Exposure` output is not written by the `sparse` and `reference` formats. This input is "
+                            "only in use, if `1sqm` is used as value of the `SpatialOutputScale` input."
+            ),
+            base.Input(
+                "WriteBufferSize",
+                (attrib.Class(float), attrib.Unit("MB"), attrib.Scales("global")),
+                self.default_observer,
+                description="The memory that is used to combine the 1-square meter deposition of applications before "
+                            "it is written. Deposition is summed up per day and every day is written once, instead "
+                            "of reading and writing the exposure of every application. If the buffered deposition "
+                            "exceeds the given size, the module adds it to its output early and the native engine "
+                            "spills it to files in the `ProcessingPath`. This input is only in use, if `1sqm` is "
+                            "used as value of the `SpatialOutputScale` input."
+            ),
+            base.Input(
+                "MaxMemory",
+                (attrib.Class(float), attrib.Unit("MB"), attrib.Scales("global")),
+                self.default_observer,
+                description="The memory available for writing 1-square meter exposure, which bounds the memory "
+                            "needed for very large extents. The extent is split into square tiles whose daily "
+                            "window fits into half of the given memory. The deposition of every application is "
+                            "simulated once within its region of interest, i.e., the applied area plus a halo of "
+                            "the maximum drift distance, routed to the tiles it affects and every tile is flushed on "
+                            "its own. The buffered deposition is limited to the other half, capping the "
+                            "`WriteBufferSize`, and the exposure of the module is transferred in blocks of the same "
+                            "bounded size. A value of 0 disables tiling. This input is only in use, if `1sqm` is "
+                            "used as value of the `SpatialOutputScale` input."
+            ),
+            base.Input(
+                "LandscapeCache",
+                (attrib.Class(str), attrib.Unit(None), attrib.Scales("global")),
+                self.default_observer,
+                description="A directory that caches the preprocessed landscape across runs. Entries are keyed by a "
+                            "hash of the `Geometries`, `LandUseLandCoverTypes`, `Extent`, `HabitatTypes` and "
+                            "`FilteringTypes` inputs, so that runs that only differ in their random seed, weather or "
+                            "applications share them. The native engine caches the parsed geometries, spatial "
+                            "indexes, vegetation coverage, a memory-mapped habitat mask and the source table of "
+                            "every applied area and wind sector, the module engine caches the exported base "
+                            "geometries. If the `RandomSeed` input is set, the native engine also "
+                            "caches the deposition of every application as a fragment keyed by its geometry, date, "
+                            "rate, drift reduction, wind direction and the model parameters. Re-runs only simulate "
+                            "new or changed applications, also if applications are added, removed or reordered, and "
+                            "reassemble all others from their fragments. The "
+                            "directory may be shared by concurrent runs. An empty string disables the cache."
+            ),
+            base.Input(
+                "LandscapeCacheSize",
+                (attrib.Class(float), attrib.Unit("MB"), attrib.Scales("global")),
+                self.default_observer,
+                description="The size of the `LandscapeCache`. If it is exceeded, the least recently used entries "
+                            "are removed from the cache."
+            ),
+            base.Input(
+                "ExposureSummaries",
+                (attrib.Class(bool), attrib.Unit(None), attrib.Scales("global")),
+                self.default_observer,
+                description="Specifies whether the maximum, the sum and the number of days with exposure of every "
+                            "cell or base geometry are written into the `ExposureMax`, `ExposureSum` and "
+                            "`ExposureEventCount` outputs. The summaries are accumulated while the daily exposure "
+                            "is written or transferred from the module, so that consumers that only need them never "
+                            "read the daily exposure. They are also written for the `sparse` and `reference` "
+                            "exposure formats."
+            ),
+            base.Input(
+                "Realizations",
+                (attrib.Class(int), attrib.Unit(None), attrib.Scales("global")),
+                self.default_observer,
+                description="The number of Monte Carlo realizations simulated in one run. The landscape and the "
+                            "regions of interest, exposure paths and distances of applications are prepared once "
+                            "and shared by all realizations, whereas field and exposure path distance offsets, "
+                            "quantiles of the `XSprayDrift` model, simple drift-filtering and random wind directions "
+                            "are sampled per realization and evaluated for all realizations at once. The first "
+                            "realization uses the `RandomSeed`, further realizations use seeds derived from it. If "
+                            "more than 1 realization is simulated, the `Exposure` output and the summary outputs "
+                            "get an additional last scale `other/realization`. Several realizations are only "
+                            "supported by the `native` engine with `dense` exposure or at `base_geometry` scale and "
+                            "do not use the per-application fragments of the `LandscapeCache`."
+            ),
+            base.Input(
+                "Profiling",
+                (attrib.Class(bool), attrib.Unit(None), attrib.Scales("global")),
+                self.default_observer,
+                description="Specifies whether the instrumentation samples the peak resident set size of the process "
+                            "at the end of every stage. Wall times, calls and counts of stages are always recorded. "
+                            "Sampling memory costs a system call per stage, so it should only be enabled for "
+                            "profiling."
             )
         ])
         self._outputs = base.OutputContainer(
@@ -533,10 +925,167 @@ class SprayDrift(base.Component):
                             "for scale `space/base_geometries` according to the `Geometries` input if "
                             "`SpatialOutputScale` equals `base_geometry`"
                     }
+                ),
+                base.Output(
+                    "ExposureFile",
+                    store,
+                    self,
+                    None,
+                    "The path of an HDF5 file in the `ProcessingPath` that contains the 1-square meter deposition as "
+                    "dataset `exposure` with scales `space_y/1sqm, space_x/1sqm, time/day`. The dataset's "
+                    "attributes list its scales, unit, offset and maximum. The file is read-only and is opened by "
+                    "`native.ExposureReference`. Only written if the `ExposureFormat` input equals `reference`.",
+                    {
+                        "type": str,
+                        "scales": "global",
+                        "unit": None
+                    }
+                ),
+                base.Output(
+                    "SparseExposureCells",
+                    store,
+                    self,
+                    None,
+                    "The (y, x, t) coordinates of the cells and days with non-zero 1-square meter deposition, "
+                    "sorted by day, by tile of 256 x 256 cells and by position within the tile. Rows and columns "
+                    "count from the upper left corner of the `Extent`, days from the `SimulationStart`. Only written "
+                    "if the `ExposureFormat` input equals `sparse`.",
+                    {
+                        "type": np.ndarray,
+                        "data_type": np.uint32,
+                        "scales": "other/deposition, other/coordinate",
+                        "unit": None
+                    }
+                ),
+                base.Output(
+                    "SparseExposureValues",
+                    store,
+                    self,
+                    None,
+                    "The non-zero 1-square meter deposition of the cells listed by the `SparseExposureCells` output. "
+                    "Only written if the `ExposureFormat` input equals `sparse`.",
+                    {
+                        "type": np.ndarray,
+                        "data_type": np.float32,
+                        "scales": "other/deposition",
+                        "unit": "the same as the unit of the `ApplicationRate` input"
+                    }
+                ),
+                base.Output(
+                    "SparseExposureIndex",
+                    store,
+                    self,
+                    None,
+                    "The position of the first entry of every day and tile in the `SparseExposureCells` and "
+                    "`SparseExposureValues` outputs. The entries of a day and tile end where the next day and tile "
+                    "start. Only written if the `ExposureFormat` input equals `sparse`.",
+                    {
+                        "type": np.ndarray,
+                        "data_type": np.int64,
+                        "scales": "time/day, other/tile_y, other/tile_x",
+                        "unit": None,
+                        "offset": "the simulation start according to the `SimulationStart` input"
+                    }
+                ),
+                base.Output(
+                    "ExposureMax",
+                    store,
+                    self,
+                    {"calculate_max": True},
+                    "The maximum daily spray-drift deposition of every cell or base geometry over the simulated "
+                    "period, at the scale selected by the `SpatialOutputScale` input. Only written if the "
+                    "`ExposureSummaries` input is true.",
+                    {
+                        "type": np.ndarray,
+                        "data_type": np.float32,
+                        "scales":
+                            "`space/base_geometry` if `SpatialOutputScale` equals `base_geometry`, or "
+                            "`space_y/1sqm, space_x/1sqm` if `SpatialOutputScale` is `1sqm`",
+                        "shape":
+                            "the number of base geometries according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`, or the rounded number of meters in "
+                            "y-direction times the rounded number of meters in x-direction spanned by the `Extent` "
+                            "input if `SpatialOutputScale` is `1sqm`",
+                        "unit": "the same as the unit of the `ApplicationRate` input",
+                        "element_names":
+                            "for scale `space/base_geometries` according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`",
+                        "offset":
+                            "the origin according to the `Extent` input for the scales `space_x/1sqm` and "
+                            "`space_y/1sqm` if `SpatialOutputScale` equals `1sqm`",
+                        "geometries":
+                            "for scale `space/base_geometries` according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`"
+                    }
+                ),
+                base.Output(
+                    "ExposureSum",
+                    store,
+                    self,
+                    {"calculate_max": True},
+                    "The cumulative spray-drift deposition of every cell or base geometry over the simulated "
+                    "period, at the scale selected by the `SpatialOutputScale` input. Only written if the "
+                    "`ExposureSummaries` input is true.",
+                    {
+                        "type": np.ndarray,
+                        "data_type": np.float32,
+                        "scales":
+                            "`space/base_geometry` if `SpatialOutputScale` equals `base_geometry`, or "
+                            "`space_y/1sqm, space_x/1sqm` if `SpatialOutputScale` is `1sqm`",
+                        "shape":
+                            "the number of base geometries according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`, or the rounded number of meters in "
+                            "y-direction times the rounded number of meters in x-direction spanned by the `Extent` "
+                            "input if `SpatialOutputScale` is `1sqm`",
+                        "unit": "the same as the unit of the `ApplicationRate` input",
+                        "element_names":
+                            "for scale `space/base_geometries` according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`",
+                        "offset":
+                            "the origin according to the `Extent` input for the scales `space_x/1sqm` and "
+                            "`space_y/1sqm` if `SpatialOutputScale` equals `1sqm`",
+                        "geometries":
+                            "for scale `space/base_geometries` according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`"
+                    }
+                ),
+                base.Output(
+                    "ExposureEventCount",
+                    store,
+                    self,
+                    {"calculate_max": True},
+                    "The number of days with spray-drift deposition of every cell or base geometry over the simulated "
+                    "period, at the scale selected by the `SpatialOutputScale` input. Only written if the "
+                    "`ExposureSummaries` input is true.",
+                    {
+                        "type": np.ndarray,
+                        "data_type": np.int32,
+                        "scales":
+                            "`space/base_geometry` if `SpatialOutputScale` equals `base_geometry`, or "
+                            "`space_y/1sqm, space_x/1sqm` if `SpatialOutputScale` is `1sqm`",
+                        "shape":
+                            "the number of base geometries according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`, or the rounded number of meters in "
+                            "y-direction times the rounded number of meters in x-direction spanned by the `Extent` "
+                            "input if `SpatialOutputScale` is `1sqm`",
+                        "unit": None,
+                        "element_names":
+                            "for scale `space/base_geometries` according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`",
+                        "offset":
+                            "the origin according to the `Extent` input for the scales `space_x/1sqm` and "
+                            "`space_y/1sqm` if `SpatialOutputScale` equals `1sqm`",
+                        "geometries":
+                            "for scale `space/base_geometries` according to the `Geometries` input if "
+                            "`SpatialOutputScale` equals `base_geometry`"
+                    }
                 )
             ]
         )
         self._application_rate_unit = None
+        self._instrumentation = native.Instrumentation()
+        self._input_data = {}
+        self._input_descriptions = {}
         if self.default_observer:
             self.default_observer.write_message(
                 2,
@@ -561,13 +1110,351 @@ class SprayDrift(base.Component):
         Returns:
             Nothing.
         """
-        processing_path = self.inputs["ProcessingPath"].read().values
-        simulation_start = self.inputs["SimulationStart"].read().values
-        simulation_end = self.inputs["SimulationEnd"].read().values
+        self._instrumentation = native.Instrumentation()
+        self._input_data = {}
+        self._input_descriptions = {}
+        self._instrumentation.memory = self.read_input("Profiling").values
+        engine = self.read_input("Engine").values
+        if engine != "native" and self.read_input("Realizations").values > 1:
+            raise ValueError("Several realizations are only supported by the native engine")
+        if engine == "native":
+            self.run_native()
+        else:
+            self.run_module()
+        if self.default_observer:
+            self._instrumentation.report(self.default_observer)
+        self._instrumentation.write(
+            os.path.join(self.read_input("ProcessingPath").values, "instrumentation.json"),
+            engine=engine,
+            spatial_output_scale=self.read_input("SpatialOutputScale").values
+        )
+
+    def read_input(self, name):
+        """
+        Reads an input. Every input is read from the store only once per run, subsequent calls return the data of the
+        first read. Reads from the store are counted by the `input read` stage of the instrumentation.
+
+        Args:
+            name: The name of the input.
+
+        Returns:
+            The data of the input.
+        """
+        if name not in self._input_data:
+            with self._instrumentation.stage("input read", reads=1):
+                self._input_data[name] = self.inputs[name].read()
+        return self._input_data[name]
+
+    def describe_input(self, name):
+        """
+        Gets the metadata of an input. The metadata is retrieved from the store only once per run and counted like
+        reads.
+
+        Args:
+            name: The name of the input.
+
+        Returns:
+            A dictionary of the metadata of the input.
+        """
+        if name not in self._input_descriptions:
+            with self._instrumentation.stage("input read", descriptions=1):
+                self._input_descriptions[name] = self.inputs[name].describe()
+        return self._input_descriptions[name]
+
+    def run_native(self):
+        """
+        Runs the spray-drift simulation with the native engine.
+
+        Returns:
+            Nothing.
+        """
+        processing_path = self.read_input("ProcessingPath").values
+        simulation_start = self.read_input("SimulationStart").values
+        simulation_end = self.read_input("SimulationEnd").values
+        simulation_length = (simulation_end - simulation_start).days + 1
+        geometries = self.read_input("Geometries").values
+        extent = self.read_input("Extent").values
+        spatial_output_scale = self.read_input("SpatialOutputScale").values
+        try:
+            os.makedirs(processing_path)
+        except FileExistsError:
+            raise FileExistsError(f"Cannot run spray-drift in a path that already exists: {processing_path}")
+        with self._instrumentation.stage("landscape preparation", geometries=len(geometries)) as counts:
+            cache = self.landscape_cache()
+            if cache:
+                landscape_key = native.landscape_key(
+                    geometries,
+                    self.read_input("LandUseLandCoverTypes").values,
+                    extent,
+                    [int(x) for x in self.read_input("HabitatTypes").values.split(",")],
+                    self.read_input("FilteringTypes").values
+                )
+                landscape, found = native.cached_landscape(
+                    cache,
+                    geometries,
+                    self.read_input("LandUseLandCoverTypes").values,
+                    extent,
+                    [int(x) for x in self.read_input("HabitatTypes").values.split(",")],
+                    self.read_input("FilteringTypes").values,
+                    landscape_key
+                )
+                if self.default_observer:
+                    self.default_observer.write_message(
+                        4, f"Landscape {'found in' if found else 'added to'} the landscape cache", cache.path)
+            else:
+                landscape = native.Landscape(
+                    geometries,
+                    self.read_input("LandUseLandCoverTypes").values,
+                    extent,
+                    [int(x) for x in self.read_input("HabitatTypes").values.split(",")],
+                    self.read_input("FilteringTypes").values,
+                    os.path.join(processing_path, "habitats.npy")
+                )
+            counts["habitats"] = len(landscape.habitats)
+        try:
+            source_exposure = float(self.read_input("SourceExposure").values)
+        except ValueError:
+            source_exposure = np.nan
+        parameters = native.Parameters(
+            self.read_input("SprayDriftModel").values,
+            self.read_input("RautmannClass").values,
+            source_exposure,
+            self.read_input("FieldDistanceSD").values,
+            self.read_input("EPDistanceSD").values,
+            self.read_input("MinimumDistanceToField").values,
+            self.read_input("ReportingThreshold").values,
+            self.read_input("ApplySimpleDriftFiltering").values,
+            self.read_input("FilteringMinWidth").values,
+            self.read_input("FilteringFraction").values,
+            self.read_input("AgDriftBoomHeight").values,
+            self.read_input("AgDriftDropletSize").values,
+            self.read_input("AgDriftQuantile").values,
+            self.read_input("FilteringMethod").values,
+            self.read_input("DriftCurves").values
+        )
+        application_dates = self.read_input("ApplicationDates").values
+        application_rates = self.read_input("ApplicationRates")
+        self._application_rate_unit = application_rates.unit
+        days = np.asarray(application_dates, np.int64) - simulation_start.toordinal()
+        random_seed = self.read_input("RandomSeed").values
+        reference_output = None
+        summary_outputs = None
+        realizations = self.read_input("Realizations").values
+        # ensembles add a last dimension of realizations to the exposure and its summaries
+        ensemble = (realizations,) if realizations > 1 else ()
+        ensemble_scale = ", other/realization" if realizations > 1 else ""
+        ensemble_none = (None,) if realizations > 1 else ()
+        if realizations > 1 and spatial_output_scale == "1sqm" and self.read_input("ExposureFormat").values != "dense":
+            raise ValueError("Several realizations are only supported by the dense exposure format")
+        if spatial_output_scale == "1sqm":
+            summary_outputs = self.summary_outputs(
+                landscape.output_grid.shape + ensemble,
+                "space_y/1sqm, space_x/1sqm" + ensemble_scale,
+                (extent[2], extent[0]) + ensemble_none,
+                None,
+                (None, None) + ensemble_none
+            )
+        if spatial_output_scale == "base_geometry":
+            self.outputs["Exposure"].set_values(
+                np.ndarray,
+                shape=(simulation_length, len(geometries)) + ensemble,
+                data_type=np.float32,
+                chunks=(simulation_length, 1) + (1,) * len(ensemble),
+                scales="time/day, space/base_geometry" + ensemble_scale,
+                unit=self._application_rate_unit,
+                element_names=(None, self.describe_input("Geometries")["element_names"][0]) + ensemble_none,
+                offset=(simulation_start, None) + ensemble_none,
+                geometries=(None, self.describe_input("Geometries")["geometries"][0]) + ensemble_none
+            )
+            writer = native.BaseGeometryWriter(
+                self.outputs["Exposure"],
+                landscape,
+                simulation_length,
+                self.summary_outputs(
+                    (len(geometries),) + ensemble,
+                    "space/base_geometry" + ensemble_scale,
+                    (None,) + ensemble_none,
+                    (self.describe_input("Geometries")["element_names"][0],) + ensemble_none,
+                    (self.describe_input("Geometries")["geometries"][0],) + ensemble_none
+                ),
+                realizations if ensemble else None
+            )
+        elif self.read_input("ExposureFormat").values == "reference":
+            shape = landscape.output_grid.shape + (simulation_length,)
+            exposure_file = h5py.File(os.path.join(processing_path, "exposure.h5"), "w")
+            reference_output = native.DatasetOutput(exposure_file.create_dataset(
+                native.reference.DATASET,
+                shape,
+                np.float32,
+                compression="gzip",
+                chunks=base.chunk_size((None, None, 1), shape)
+            ))
+            writer = self.square_meter_writer(reference_output, landscape, simulation_length, summary_outputs)
+        elif self.read_input("ExposureFormat").values == "sparse":
+            writer = native.SparseWriter(
+                self.outputs,
+                landscape.output_grid.shape + (simulation_length,),
+                landscape.output_offset,
+                self._application_rate_unit,
+                simulation_start,
+                summary_outputs is not None
+            )
+        else:
+            shape = landscape.output_grid.shape + (simulation_length,) + ensemble
+            self.outputs["Exposure"].set_values(
+                np.ndarray,
+                shape=shape,
+                data_type=np.float32,
+                chunks=base.chunk_size((None, None, 1) + (1,) * len(ensemble), shape),
+                scales="space_y/1sqm, space_x/1sqm, time/day" + ensemble_scale,
+                unit=self._application_rate_unit,
+                element_names=None,
+                offset=(extent[2], extent[0], simulation_start) + ensemble_none,
+                geometries=(None, None, None) + ensemble_none
+            )
+            writer = self.square_meter_writer(
+                self.outputs["Exposure"], landscape, simulation_length, summary_outputs, realizations)
+        outside = (days < 0) | (days >= simulation_length)
+        if outside.any() and self.default_observer:
+            self.default_observer.write_message(
+                2,
+                f"{outside.sum()} applications take place outside the simulated period",
+                "They are not considered for the simulation of spray-drift deposition"
+            )
+        wind_directions = self.application_wind_directions(days, simulation_length)
+        write_stage = "base_geometry aggregation" if spatial_output_scale == "base_geometry" else "write-back"
+        simulation = (
+            landscape,
+            parameters,
+            self.read_input("AppliedAreas").values,
+            days,
+            application_rates.values,
+            self.read_input("TechnologyDriftReductions").values,
+            wind_directions,
+            random_seed if random_seed else None,
+            np.flatnonzero(~outside),
+            self.read_input("Workers").values,
+            self._instrumentation
+        )
+        if realizations > 1:
+            # realizations share the landscape and source tables, fragments of the landscape cache are not used
+            applications = native.simulate_ensemble(*simulation, realizations=realizations)
+        elif cache and random_seed:
+            # the deposition of applications is reproducible and kept as fragments in the landscape cache
+            applications = ((i, 0, day, row, col, exposure) for i, day, row, col, exposure in native.cached_simulation(
+                cache, landscape_key, *simulation))
+        else:
+            applications = native.simulate_ensemble(*simulation)
+        # the simulation stage only measures the production of applications, their write-back is a stage of its own
+        # that is measured in total instead of per application
+        write_duration = 0.
+        cells = 0
+        for _, realization, day, row, col, exposure in self._instrumentation.iterate(
+                "simulation", applications, applications=np.sum(~outside), realizations=realizations):
+            start = time.perf_counter()
+            writer.add(day, row, col, exposure, realization)
+            write_duration += time.perf_counter() - start
+            cells += len(row)
+        self._instrumentation.add(write_stage, write_duration, 0, cells=cells)
+        with self._instrumentation.stage(write_stage) as counts:
+            writer.flush()
+            if isinstance(writer, native.SquareMeterWriter):
+                counts["tiles"] = len(writer.tiles)
+        if cache:
+            # source tables are added to the landscape cache during the simulation and evicted once at its end
+            cache.evict(os.path.join(cache.path, landscape_key))
+        if reference_output:
+            native.reference.describe(
+                reference_output.data_set,
+                reference_output.max,
+                "space_y/1sqm, space_x/1sqm, time/day",
+                self._application_rate_unit,
+                (extent[2], extent[0], simulation_start)
+            )
+            exposure_file.close()
+            self.output_reference(os.path.join(processing_path, "exposure.h5"))
+
+    def square_meter_writer(self, output, landscape, simulation_length, summary_outputs=None, realizations=1):
+        """
+        Creates the writer of 1-square meter exposure of the native engine. The buffered deposition is limited by the
+        `WriteBufferSize` and `MaxMemory` inputs and, if a `MaxMemory` is given, the output grid is written in tiles
+        whose daily windows fit into half of it.
+
+        Args:
+            output: The output that receives the deposition.
+            landscape: The Landscape of the simulation.
+            simulation_length: The number of simulated days.
+            summary_outputs: The output container, if the summary outputs are written.
+            realizations: The number of realizations.
+
+        Returns:
+            A SquareMeterWriter.
+        """
+        buffer_size = int(self.read_input("WriteBufferSize").values * 1048576)
+        max_memory = int(self.read_input("MaxMemory").values * 1048576)
+        tile_size = None
+        if max_memory > 0:
+            buffer_size = min(buffer_size, max_memory // 2)
+            tile_size = native.output.tile_size(max_memory)
+        return native.SquareMeterWriter(
+            output,
+            landscape,
+            simulation_length,
+            buffer_size,
+            os.path.join(self.read_input("ProcessingPath").values, "spill"),
+            tile_size,
+            summary_outputs,
+            realizations if realizations > 1 else None
+        )
+
+    def summary_outputs(self, shape, scales, offset, element_names, geometries):
+        """
+        Creates the `ExposureMax`, `ExposureSum` and `ExposureEventCount` outputs, if the `ExposureSummaries` input
+        is true.
+
+        Args:
+            shape: The spatial shape of the exposure.
+            scales: The spatial scales of the exposure.
+            offset: The offset of the exposure per spatial dimension.
+            element_names: The element names of the exposure per spatial dimension, or `None`.
+            geometries: The geometries of the exposure per spatial dimension.
+
+        Returns:
+            The output container of the component, or `None` if no summaries are written.
+        """
+        if not self.read_input("ExposureSummaries").values:
+            return None
+        for name, data_type, unit in (
+                ("ExposureMax", np.float32, self._application_rate_unit),
+                ("ExposureSum", np.float32, self._application_rate_unit),
+                ("ExposureEventCount", np.int32, None)
+        ):
+            self.outputs[name].set_values(
+                np.ndarray,
+                shape=shape,
+                data_type=data_type,
+                chunks=base.chunk_size((None,) * len(shape), shape),
+                scales=scales,
+                unit=unit,
+                element_names=element_names,
+                offset=offset,
+                geometries=geometries
+            )
+        return self.outputs
+
+    def run_module(self):
+        """
+        Runs the spray-drift simulation with the XSprayDrift module in its R runtime environment.
+
+        Returns:
+            Nothing.
+        """
+        processing_path = self.read_input("ProcessingPath").values
+        simulation_start = self.read_input("SimulationStart").values
+        simulation_end = self.read_input("SimulationEnd").values
         simulation_length = (simulation_end - simulation_start).days + 1
-        geometries = self.inputs["Geometries"].read().values
-        crs = self.inputs["GeometryCrs"].read().values
-        extent = self.inputs["Extent"].read().values
+        geometries = self.read_input("Geometries").values
+        extent = self.read_input("Extent").values
         raster_cols = int(round(extent[1] - extent[0]))
         raster_rows = int(round(extent[3] - extent[2]))
         x3df_path = os.path.join(processing_path, "sim.x3df")
@@ -576,27 +1463,28 @@ class SprayDrift(base.Component):
         r_exe = os.path.join(os.path.dirname(__file__), "module", "R-4.1.2", "bin", "x64", "Rscript.exe")
         r_script = os.path.join(os.path.dirname(__file__), "module", "SDModel_XSprayDrift_x3df_2.R")
         library_path = os.path.join(os.path.dirname(__file__), "module", "R-4.1.2", "library")
-        base_shapefile = os.path.join(geom_path, "base.shp")
-        ppm_shapefile = os.path.join(processing_path, "ppm.shp")
+        base_geometries = os.path.join(geom_path, "base.gpkg")
+        ppm_geometries = os.path.join(processing_path, "ppm.gpkg")
 
         try:
             os.makedirs(geom_path)
         except FileExistsError:
             raise FileExistsError(f"Cannot run spray-drift in a path that already exists: {processing_path}")
 
-        spatial_reference = osr.SpatialReference()
-        spatial_reference.ImportFromWkt(crs)
-        ogr_driver = ogr.GetDriverByName("ESRI Shapefile")
-        ogr_data_set = ogr_driver.CreateDataSource(base_shapefile)
-        ogr_layer = ogr_data_set.CreateLayer("geom", spatial_reference, ogr.wkbPolygon)
-        ogr_layer_definition = ogr_layer.GetLayerDefn()
-        for i in range(len(geometries)):
-            feature = ogr.Feature(ogr_layer_definition)
-            feature.SetGeometry(ogr.CreateGeometryFromWkb(geometries[i]))
-            ogr_layer.CreateFeature(feature)
-        del ogr_layer_definition, ogr_layer, ogr_data_set, ogr_driver
+        with self._instrumentation.stage("shapefile export", geometries=len(geometries)):
+            cache = self.landscape_cache()
+            if cache:
+                entry = cache.get(
+                    native.content_hash("base_geometries", list(geometries), self.read_input("GeometryCrs").values),
+                    lambda directory, _: self.write_geometries(
+                        os.path.join(directory, "base.gpkg"), geometries, ogr.wkbUnknown)
+                )
+                shutil.copyfile(os.path.join(entry, "base.gpkg"), base_geometries)
+            else:
+                self.write_geometries(base_geometries, geometries, ogr.wkbUnknown)
 
         hdf5 = os.path.join(x3df_path, "arr.dat")
+        start = time.perf_counter()
         f = h5py.File(hdf5, "a")
         f.create_group("/dims/time").attrs["id"] = 0
         f.create_dataset("/scales/0/simulation", (1,), np.float32)
@@ -605,71 +1493,18 @@ class SprayDrift(base.Component):
         day.attrs["t_offset"] = (simulation_start - datetime.datetime.utcfromtimestamp(0).date()).days
         f.create_group("/dims/space").attrs["id"] = 1
         f.create_dataset("/scales/1/region", (1,), np.float32)
-        f.create_dataset("/scales/1/base_geometry", (len(geometries),), np.float32).attrs["geometries"] = "base.shp"
+        f.create_dataset("/scales/1/base_geometry", (len(geometries),), np.float32).attrs["geometries"] = "base.gpkg"
         sqm = f.create_dataset("/scales/1/1sqm", (raster_cols, raster_rows), np.float32)
         sqm.attrs["transform"] = "Geographic"
         sqm.attrs["t_offset"] = [extent[0], extent[2]]
-        spatial_output_scale = self.inputs["SpatialOutputScale"].read().values
+        spatial_output_scale = self.read_input("SpatialOutputScale").values
         # noinspection PyTypeChecker
         f["/data/simulation/region/ppm/shapefile"] = np.full(
-            (1, 1), ppm_shapefile, np.core.dtype(f"S{len(ppm_shapefile)}"))
+            (1, 1), ppm_geometries, np.core.dtype(f"S{len(ppm_geometries)}"))
         f["/data/simulation/region/ppm/shapefile"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/habitat_types"] = np.full(
-            (1, 1),
-            self.inputs["HabitatTypes"].read().values,
-            np.core.dtype(f"S{len(self.inputs['HabitatTypes'].read().values)}")
-        )
-        f["/data/simulation/region/spray_drift/params/habitat_types"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/ep_width"] = np.full((1, 1), 3, np.float32)
-        f["/data/simulation/region/spray_drift/params/ep_width"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/max_angular_deviation"] = np.full((1, 1), 0, np.float32)
-        f["/data/simulation/region/spray_drift/params/max_angular_deviation"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/field_dist_sd"] = np.full((1, 1), self.inputs[
-            "FieldDistanceSD"].read().values, np.float32)
-        f["/data/simulation/region/spray_drift/params/field_dist_sd"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/ep_dist_sd"] = np.full((1, 1),
-                                                                             self.inputs["EPDistanceSD"].read().values,
-                                                                             np.float32)
-        f["/data/simulation/region/spray_drift/params/ep_dist_sd"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/min_dist"] = np.full((1, 1), self.inputs[
-            "MinimumDistanceToField"].read().values, np.float32)
-        f["/data/simulation/region/spray_drift/params/min_dist"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/source_exposure"] = np.full(
-            (1, 1),
-            self.inputs["SourceExposure"].read().values,
-            np.core.dtype(f"S{len(self.inputs['SourceExposure'].read().values)}")
-        )
-        f["/data/simulation/region/spray_drift/params/source_exposure"].attrs["set"] = True
-        # noinspection PyTypeChecker
-        f["/data/simulation/region/spray_drift/params/pdf_type"] = np.full((1, 1), "gamma", np.core.dtype("S5"))
-        f["/data/simulation/region/spray_drift/params/pdf_type"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/crop"] = np.full(
-            (1, 1),
-            self.inputs["RautmannClass"].read().values,
-            np.core.dtype(f"S{len(self.inputs['RautmannClass'].read().values)}")
-        )
-        f["/data/simulation/region/spray_drift/params/crop"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/reporting_threshold"] = np.full((1, 1), self.inputs[
-            "ReportingThreshold"].read().values, np.float32)
-        f["/data/simulation/region/spray_drift/params/reporting_threshold"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/apply_simple1_drift_filtering"] = np.full((1, 1), self.inputs[
-            "ApplySimpleDriftFiltering"].read().values, np.bool)
-        f["/data/simulation/region/spray_drift/params/apply_simple1_drift_filtering"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/model"] = np.full(
-            (1, 1),
-            self.inputs["SprayDriftModel"].read().values,
-            np.core.dtype(f"S{len(self.inputs['SprayDriftModel'].read().values)}"))
-        f["/data/simulation/region/spray_drift/params/model"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/spatial_output_scale"] = np.full(
-            (1, 1), spatial_output_scale, np.core.dtype(f"S{len(spatial_output_scale)}"))
-        f["/data/simulation/region/spray_drift/params/spatial_output_scale"].attrs["set"] = True
         f["/data/simulation/base_geometry/landscape/feature_type"] = np.full(
-            (1, len(geometries)), self.inputs["LandUseLandCoverTypes"].read().values, np.uint16)
+            (1, len(geometries)), self.read_input("LandUseLandCoverTypes").values, np.uint16)
         f["/data/simulation/base_geometry/landscape/feature_type"].attrs["set"] = True
-        f["/data/simulation/region/weather/wind_direction"] = np.full((1, 1),
-                                                                      self.inputs["WindDirection"].read().values,
-                                                                      np.uint16)
-        f["/data/simulation/region/weather/wind_direction"].attrs["set"] = True
         if spatial_output_scale == "base_geometry":
             f.create_dataset("/data/day/base_geometry/spray_drift/exposure", (simulation_length, len(geometries)),
                              np.float32, compression="gzip", chunks=(simulation_length, 1))
@@ -681,63 +1516,71 @@ class SprayDrift(base.Component):
                 compression="gzip",
                 chunks=base.chunk_size((None, None, 1), (raster_rows, raster_cols, simulation_length))
             )
-        random_seed = self.inputs["RandomSeed"].read().values
-        if random_seed is None:
-            random_seed = 0
-        f["/data/simulation/region/spray_drift/params/random_seed"] = np.full((1, 1), random_seed, np.int)
-        f["/data/simulation/region/spray_drift/params/random_seed"].attrs["set"] = True
-        if len(self.inputs["FilteringTypes"].read().values) == 0:
-            # noinspection PyTypeChecker
-            f["/data/simulation/region/spray_drift/params/filtering_types"] = np.full((1, 1), " ", np.core.dtype("S1"))
-        else:
-            f["/data/simulation/region/spray_drift/params/filtering_types"] = np.full(
-                (1, 1),
-                self.inputs["FilteringTypes"].read().values,
-                np.core.dtype(f"S{len(self.inputs['FilteringTypes'].read().values)}")
-            )
-        f["/data/simulation/region/spray_drift/params/filtering_types"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/filtering_min_width"] = np.full((1, 1), self.inputs[
-            "FilteringMinWidth"].read().values, np.float32)
-        f["/data/simulation/region/spray_drift/params/filtering_min_width"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/filtering_fraction"] = np.full((1, 1), self.inputs[
-            "FilteringFraction"].read().values, np.float32)
-        f["/data/simulation/region/spray_drift/params/filtering_fraction"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/boom_height"] = np.full(
-            (1, 1),
-            self.inputs["AgDriftBoomHeight"].read().values,
-            np.core.dtype(f"S{len(self.inputs['AgDriftBoomHeight'].read().values)}")
-        )
-        f["/data/simulation/region/spray_drift/params/boom_height"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/droplet_size"] = np.full(
-            (1, 1),
-            self.inputs["AgDriftDropletSize"].read().values,
-            np.core.dtype(f"S{len(self.inputs['AgDriftDropletSize'].read().values)}")
-        )
-        f["/data/simulation/region/spray_drift/params/droplet_size"].attrs["set"] = True
-        f["/data/simulation/region/spray_drift/params/ag_drift_quantile"] = np.full((1, 1), self.inputs[
-            "AgDriftQuantile"].read().values, np.float32)
-        f["/data/simulation/region/spray_drift/params/ag_drift_quantile"].attrs["set"] = True
+        self.write_module_parameters(f, spatial_output_scale)
         f.close()
-        self.prepare_ppm_shapefile(ppm_shapefile)
+        self._instrumentation.add(
+            "parameter write", time.perf_counter() - start, peak_memory=self._instrumentation.peak_memory())
+        with self._instrumentation.stage(
+                "shapefile export", applications=len(self.read_input("AppliedAreas").values)):
+            self.prepare_ppm_geometries(ppm_geometries, simulation_start, simulation_length)
+        start = time.perf_counter()
         base.run_process(
             (r_exe, "--vanilla", r_script, x3df_path),
             processing_path,
             self.default_observer,
             {"R_LIBS": library_path, "R_LIBS_USER": library_path}
         )
+        self._instrumentation.add(
+            "module", time.perf_counter() - start, peak_memory=self._instrumentation.peak_memory(True))
+        self.merge_module_stages(os.path.join(x3df_path, "stages.csv"))
         f = h5py.File(hdf5)
         if spatial_output_scale == "base_geometry":
             data_set = f["/data/day/base_geometry/spray_drift/exposure"]
             scales = "time/day, space/base_geometry"
-            element_names = (None, self.inputs["Geometries"].describe()["element_names"][0])
+            element_names = (None, self.describe_input("Geometries")["element_names"][0])
             offset = (simulation_start, None)
-            geometries= (None, self.inputs["Geometries"].describe()["geometries"][0])
+            geometries = (None, self.describe_input("Geometries")["geometries"][0])
         else:
             data_set = f["/data/day/1sqm/spray_drift/exposure"]
             scales = "space_y/1sqm, space_x/1sqm, time/day"
             element_names = None
             offset = (extent[2], extent[0], simulation_start)
             geometries = (None, None, None)
+        spatial = slice(1, None) if spatial_output_scale == "base_geometry" else slice(0, 2)
+        summary_outputs = self.summary_outputs(
+            data_set.shape[spatial],
+            ", ".join(scales.split(", ")[spatial]),
+            offset[spatial],
+            None if element_names is None else element_names[spatial],
+            geometries[spatial]
+        )
+        if spatial_output_scale == "1sqm" and self.read_input("ExposureFormat").values == "reference":
+            f.close()
+            with self._instrumentation.stage("output transfer"):
+                with h5py.File(hdf5, "r+") as f:
+                    data_set = f["/data/day/1sqm/spray_drift/exposure"]
+                    native.reference.describe(
+                        data_set, native.reference.dataset_max(data_set), scales, self._application_rate_unit, offset)
+                    if summary_outputs:
+                        self.transfer_exposure(data_set, summary_outputs=summary_outputs, copy=False)
+                native.reference.link(
+                    os.path.join(processing_path, "exposure.h5"), hdf5, "/data/day/1sqm/spray_drift/exposure")
+                native.reference.protect(hdf5)
+                self.output_reference(os.path.join(processing_path, "exposure.h5"))
+            return
+        if spatial_output_scale == "1sqm" and self.read_input("ExposureFormat").values == "sparse":
+            writer = native.SparseWriter(
+                self.outputs,
+                data_set.shape,
+                unit=self._application_rate_unit,
+                start=simulation_start,
+                summarize=summary_outputs is not None
+            )
+            with self._instrumentation.stage("output transfer", chunks=data_set.id.get_num_chunks()):
+                self.transfer_exposure(data_set, writer)
+                writer.flush()
+            f.close()
+            return
         self.outputs["Exposure"].set_values(
             np.ndarray,
             shape=data_set.shape,
@@ -749,43 +1592,297 @@ class SprayDrift(base.Component):
             offset=offset,
             geometries=geometries
         )
-        for chunk in base.chunk_slices(data_set.shape, tuple(x * 5 for x in data_set.chunks)):
-            self.outputs["Exposure"].set_values(data_set[chunk], slices=chunk, create=False, calculate_max=True)
+        with self._instrumentation.stage("output transfer", chunks=data_set.id.get_num_chunks()):
+            self.transfer_exposure(data_set, summary_outputs=summary_outputs)
         f.close()
 
-    def prepare_ppm_shapefile(self, shapefile):
+    def write_module_parameters(self, f, spatial_output_scale):
+        """
+        Writes the scalar parameters of the module as a single compound record, so that they are written and read in
+        one call. The record is tagged with the `PARAMETER_SCHEMA_VERSION`.
+
+        Args:
+            f: The HDF5 file of the X3df.
+            spatial_output_scale: The spatial output scale.
+
+        Returns:
+            Nothing.
+        """
+        random_seed = self.read_input("RandomSeed").values
+        filtering_types = self.read_input("FilteringTypes").values
+        parameters = (
+            ("habitat_types", self.read_input("HabitatTypes").values),
+            ("ep_width", np.float32(3)),
+            ("max_angular_deviation", np.float32(0)),
+            ("field_dist_sd", np.float32(self.read_input("FieldDistanceSD").values)),
+            ("ep_dist_sd", np.float32(self.read_input("EPDistanceSD").values)),
+            ("min_dist", np.float32(self.read_input("MinimumDistanceToField").values)),
+            ("source_exposure", self.read_input("SourceExposure").values),
+            ("pdf_type", "gamma"),
+            ("crop", self.read_input("RautmannClass").values),
+            ("reporting_threshold", np.float32(self.read_input("ReportingThreshold").values)),
+            ("apply_simple1_drift_filtering", np.bool_(self.read_input("ApplySimpleDriftFiltering").values)),
+            ("model", self.read_input("SprayDriftModel").values),
+            ("spatial_output_scale", spatial_output_scale),
+            ("random_seed", np.int64(0 if random_seed is None else random_seed)),
+            # the module splits the filtering types at ", ", a single space stands for no filtering types
+            ("filtering_types", ", ".join(str(x) for x in filtering_types) if len(filtering_types) > 0 else " "),
+            ("filtering_min_width", np.float32(self.read_input("FilteringMinWidth").values)),
+            ("filtering_fraction", np.float32(self.read_input("FilteringFraction").values)),
+            ("boom_height", self.read_input("AgDriftBoomHeight").values),
+            ("droplet_size", self.read_input("AgDriftDropletSize").values),
+            ("ag_drift_quantile", np.float32(self.read_input("AgDriftQuantile").values)),
+            ("write_buffer_size", np.float32(self.read_input("WriteBufferSize").values)),
+            ("max_memory", np.float32(self.read_input("MaxMemory").values))
+        )
+        parameters = [(k, v.encode()) if isinstance(v, str) else (k, v) for k, v in parameters]
+        record = np.array(
+            [tuple(v for _, v in parameters)],
+            [(k, f"S{max(len(v), 1)}") if isinstance(v, bytes) else (k, np.asarray(v).dtype) for k, v in parameters]
+        )
+        data_set = f.create_dataset("/data/simulation/region/spray_drift/params", data=record)
+        data_set.attrs["schema_version"] = self.PARAMETER_SCHEMA_VERSION
+        data_set.attrs["set"] = True
+
+    def transfer_exposure(self, data_set, writer=None, summary_outputs=None, copy=True):
+        """
+        Transfers the exposure simulated by the module into the `Exposure` output. Only chunks that the module
+        actually wrote are read, as listed by the chunk index of the HDF5 dataset, and blocks of chunks that contain
+        nothing but zeros are not written at all, so that days without applications cost neither decompression nor
+        store writes. The maximum of the output is updated while the blocks are written. Blocks combine up to 5 chunks
+        per dimension, but fewer if a block would exceed half of the `MaxMemory`. The summary outputs are accumulated
+        from the same blocks.
+
+        Args:
+            data_set: The chunked HDF5 dataset of the exposure.
+            writer: A native writer of 1-square meter exposure that receives the non-zero cells instead of the
+                `Exposure` output.
+            summary_outputs: The output container, if the summary outputs are written.
+            copy: Specifies whether the exposure is copied. Otherwise, only the summary outputs are written.
+
+        Returns:
+            Nothing.
+        """
+        chunks = np.array(data_set.chunks)
+        max_memory = self.read_input("MaxMemory").values * 1048576
+        factor = 5
+        while factor > 1 and max_memory > 0 and np.prod(chunks * factor) * data_set.dtype.itemsize > max_memory / 2:
+            factor -= 1
+        block_shape = chunks * factor
+        # base_geometry exposure of shape (t, base_geometry) is summarized in a single block, 1sqm exposure of shape
+        # (y, x, t) per spatial block, as blocks are visited in that order
+        base_geometry = len(data_set.shape) == 2
+        summary = None
+        if summary_outputs:
+            summary = native.output.ExposureSummary(
+                summary_outputs,
+                data_set.shape[1:] if base_geometry else data_set.shape[:2],
+                None if base_geometry else block_shape[:2]
+            )
+        blocks = {}
+        for i in range(data_set.id.get_num_chunks()):
+            offset = np.array(data_set.id.get_chunk_info(i).chunk_offset)
+            blocks.setdefault(tuple(offset // block_shape), []).append(offset)
+        skipped = 0
+        for block_index in sorted(blocks):
+            block_start = np.array(block_index) * block_shape
+            block_stop = np.minimum(block_start + block_shape, data_set.shape)
+            values = np.zeros(block_stop - block_start, data_set.dtype)
+            for offset in blocks[block_index]:
+                chunk = tuple(slice(o, min(o + c, s)) for o, c, s in zip(offset, chunks, data_set.shape))
+                values[tuple(slice(x.start - b, x.stop - b) for x, b in zip(chunk, block_start))] = data_set[chunk]
+            if not values.any():
+                skipped += 1
+                continue
+            slices = tuple(slice(b, e) for b, e in zip(block_start, block_stop))
+            if summary and base_geometry:
+                summary.add(values.T, slices[1:])
+            elif summary:
+                summary.add(values, slices[:2])
+            if not copy:
+                continue
+            if writer:
+                row, col, day = np.nonzero(values)
+                writer.add(day + block_start[2], row + block_start[0], col + block_start[1], values[row, col, day])
+            else:
+                self.outputs["Exposure"].set_values(values, slices=slices, create=False, calculate_max=True)
+        if summary:
+            summary.flush()
+        if self.default_observer and copy:
+            unwritten = int(np.prod(np.ceil(np.array(data_set.shape) / block_shape))) - len(blocks)
+            self.default_observer.write_message(
+                4,
+                f"Transferred {len(blocks) - skipped} blocks of exposure from the module",
+                f"{skipped} blocks contained only zeros and {unwritten} blocks were never written by the module"
+            )
+
+    def output_reference(self, file_path):
         """
-        Prepares the application geometries.
+        Outputs the path of a file of referenced exposure. The file is made read-only, so that the exposure cannot
+        change while it is consumed.
 
         Args:
-            shapefile: The file path of the geometries.
+            file_path: The path of the file.
 
         Returns:
             Nothing.
         """
-        crs = self.inputs["GeometryCrs"].read().values
-        applied_fields = self.inputs["AppliedFields"].read().values
-        application_dates = self.inputs["ApplicationDates"].read().values
-        application_rates = self.inputs["ApplicationRates"].read()
+        native.reference.protect(file_path)
+        self.outputs["ExposureFile"].set_values(os.path.abspath(file_path), scales="global", unit=None)
+        if self.default_observer:
+            self.default_observer.write_message(
+                4,
+                "The exposure was not copied into the store",
+                f"It is referenced in {file_path}, which must be kept as long as the exposure is used"
+            )
+
+    def merge_module_stages(self, file_path):
+        """
+        Adds the stages reported by the module to the instrumentation of the component. The peak memory of the module
+        is taken from the terminated child processes if the module cannot determine it.
+
+        Args:
+            file_path: The CSV file of stages written by the module.
+
+        Returns:
+            Nothing.
+        """
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, newline="") as f:
+            for row in csv.DictReader(f):
+                self._instrumentation.add(
+                    row["stage"],
+                    float(row["duration"]),
+                    int(float(row["calls"])),
+                    float(row["peak_memory"]) if row["peak_memory"] not in ("", "NA") else
+                    self._instrumentation.peak_memory(True),
+                    cells=float(row["cells"]),
+                    trajectories=float(row["trajectories"])
+                )
+
+    def landscape_cache(self):
+        """
+        Gets the cache of preprocessed landscapes.
+
+        Returns:
+            A `native.LandscapeCache` or `None` if no cache is used.
+        """
+        cache_path = self.read_input("LandscapeCache").values
+        if not cache_path:
+            return None
+        return native.LandscapeCache(cache_path, int(self.read_input("LandscapeCacheSize").values * 1048576))
+
+    def prepare_ppm_geometries(self, file_path, simulation_start, simulation_length):
+        """
+        Prepares the application geometries together with the wind direction and the identity of every application.
+
+        Args:
+            file_path: The file path of the GeoPackage that receives the geometries.
+            simulation_start: The first simulated day.
+            simulation_length: The number of simulated days.
+
+        Returns:
+            Nothing.
+        """
+        applied_fields = self.read_input("AppliedFields").values
+        application_dates = self.read_input("ApplicationDates").values
+        application_rates = self.read_input("ApplicationRates")
         self._application_rate_unit = application_rates.unit
-        technology_drift_reductions = self.inputs["TechnologyDriftReductions"].read().values
-        geometries = self.inputs["AppliedAreas"].read().values
+        technology_drift_reductions = self.read_input("TechnologyDriftReductions").values
+        applied_areas = self.read_input("AppliedAreas").values
+        days = np.asarray(application_dates, np.int64) - simulation_start.toordinal()
+        wind_directions = self.application_wind_directions(days, simulation_length)
+        # the module keys its random streams by the identities of the native engine, reduced to its 31-bit seeds
+        identities = native.streams.application_identities(
+            applied_areas, days, application_rates.values, technology_drift_reductions) % 2147483647
+        self.write_geometries(
+            file_path,
+            applied_areas,
+            ogr.wkbPolygon,
+            {
+                "Field": (ogr.OFTInteger, [int(x) for x in applied_fields]),
+                "Date": (ogr.OFTDate, [str(datetime.datetime.fromordinal(x)) for x in application_dates]),
+                "Rate": (ogr.OFTReal, [float(x) for x in application_rates.values]),
+                "DriftRed": (ogr.OFTReal, [float(x) for x in technology_drift_reductions]),
+                "WindDir": (ogr.OFTInteger, [int(x) for x in wind_directions]),
+                "Identity": (ogr.OFTInteger, [int(x) for x in identities])
+            }
+        )
+
+    def application_wind_directions(self, days, simulation_length):
+        """
+        Gets the wind direction of every application from the `WindDirection` input, which is either a global value,
+        a daily time series or a value per application.
+
+        Args:
+            days: The zero-based simulation day of every application.
+            simulation_length: The number of simulated days.
+
+        Returns:
+            A uint16 array with the wind direction of every application in degrees, where
+            `native.engine.RANDOM_WIND_DIRECTION` requests a randomly sampled wind direction.
+        """
+        values = self.read_input("WindDirection").values
+        scales = self.describe_input("WindDirection")["scales"]
+        if scales == "global":
+            wind_directions = np.full(len(days), values, np.int64)
+        elif scales == "time/day":
+            if len(values) != simulation_length:
+                raise ValueError(
+                    f"The WindDirection input has {len(values)} days, but {simulation_length} days are simulated")
+            # applications outside the simulated period are not simulated
+            wind_directions = np.asarray(values, np.int64)[np.clip(days, 0, simulation_length - 1)]
+        elif scales == "other/application":
+            if len(values) != len(days):
+                raise ValueError(f"The WindDirection input has {len(values)} values, but there are {len(days)} "
+                                 f"applications")
+            wind_directions = np.asarray(values, np.int64)
+        else:
+            raise ValueError(f"Unsupported scales of the WindDirection input: {scales}")
+        random = (wind_directions < 0) | (wind_directions == native.engine.RANDOM_WIND_DIRECTION)
+        if (wind_directions[~random] >= 360).any():
+            raise ValueError("Wind directions must be less than 360 degrees")
+        return np.where(random, native.engine.RANDOM_WIND_DIRECTION, wind_directions).astype(np.uint16)
+
+    def write_geometries(self, file_path, geometries, geometry_type, fields=None):
+        """
+        Writes geometries into a GeoPackage layer with a spatial index. All features are created within a single
+        transaction from a single reused feature, which avoids the per-feature overhead of the Shapefile driver. The
+        duration of the export is reported to the observer.
+
+        Args:
+            file_path: The file path of the GeoPackage.
+            geometries: The geometries in Well-Known-Binary representation.
+            geometry_type: The OGR geometry type of the layer.
+            fields: A dictionary of attribute fields, with the field names as keys and tuples of the OGR field type
+                and the values of all features as values.
+
+        Returns:
+            Nothing.
+        """
+        start = time.perf_counter()
+        fields = fields or {}
         spatial_reference = osr.SpatialReference()
-        spatial_reference.ImportFromWkt(crs)
-        ogr_driver = ogr.GetDriverByName("ESRI Shapefile")
-        ogr_data_set = ogr_driver.CreateDataSource(shapefile)
-        ogr_layer = ogr_data_set.CreateLayer("geom", spatial_reference, ogr.wkbPolygon)
-        ogr_layer.CreateField(ogr.FieldDefn("Field", ogr.OFTInteger))
-        ogr_layer.CreateField(ogr.FieldDefn("Date", ogr.OFTDate))
-        ogr_layer.CreateField(ogr.FieldDefn("Rate", ogr.OFTReal))
-        ogr_layer.CreateField(ogr.FieldDefn("DriftRed", ogr.OFTReal))
-        ogr_layer_definition = ogr_layer.GetLayerDefn()
-        for i in range(len(geometries)):
-            feature = ogr.Feature(ogr_layer_definition)
-            feature.SetField("Field", int(applied_fields[i]))
-            feature.SetField("Date", str(datetime.datetime.fromordinal(application_dates[i])))
-            feature.SetField("Rate", float(application_rates.values[i]))
-            feature.SetField("DriftRed", float(technology_drift_reductions[i]))
-            feature.SetGeometry(ogr.CreateGeometryFromWkb(geometries[i]))
+        spatial_reference.ImportFromWkt(self.read_input("GeometryCrs").values)
+        ogr_driver = ogr.GetDriverByName("GPKG")
+        ogr_data_set = ogr_driver.CreateDataSource(file_path)
+        ogr_layer = ogr_data_set.CreateLayer("geom", spatial_reference, geometry_type, ["SPATIAL_INDEX=YES"])
+        for name, (field_type, _) in fields.items():
+            ogr_layer.CreateField(ogr.FieldDefn(name, field_type))
+        feature = ogr.Feature(ogr_layer.GetLayerDefn())
+        ogr_layer.StartTransaction()
+        for i, geometry in enumerate(geometries):
+            for name, (_, values) in fields.items():
+                feature.SetField(name, values[i])
+            feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(geometry))
+            feature.SetFID(-1)
             ogr_layer.CreateFeature(feature)
-        del ogr_layer_definition, ogr_layer, ogr_data_set, ogr_driver
+        ogr_layer.CommitTransaction()
+        del feature, ogr_layer, ogr_data_set, ogr_driver
+        if self.default_observer:
+            self.default_observer.write_message(
+                4,
+                f"Exported {len(geometries)} geometries to {os.path.basename(file_path)}",
+                f"The export took {time.perf_counter() - start:.2f} s"
+            )
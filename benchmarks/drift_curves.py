@@ -0,0 +1,73 @@
+"""
+Compares the lookup-table evaluation of the XSprayDrift deposition curves in `native.lookup` with the reference
+function of `native.xdrift` regarding runtime and relative deviation. Run as `python benchmarks/drift_curves.py` from
+the component folder.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from native import lookup, xdrift  # noqa: E402
+
+
+def measure(reference, table, arguments):
+    """
+    Measures a reference function and its table.
+
+    Args:
+        reference: The reference function.
+        table: The lookup-table evaluation of the function.
+        arguments: The arguments of both functions.
+
+    Returns:
+        A tuple of the time needed to build the table, the runtimes of the reference and the table and the maximum
+        relative deviation of the table.
+    """
+    start = time.perf_counter()
+    table(*(x[:1] if isinstance(x, np.ndarray) else x for x in arguments))
+    build_duration = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = reference(*arguments)
+    reference_duration = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = table(*arguments)
+    table_duration = time.perf_counter() - start
+    differing = (actual != expected) & (expected != 0)
+    error = np.max(np.abs(actual[differing] - expected[differing]) / np.abs(expected[differing]), initial=0)
+    return build_duration, reference_duration, table_duration, error
+
+
+def main():
+    """
+    Runs the benchmark.
+
+    Returns:
+        Nothing.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cells", type=int, default=100000, help="number of evaluated distances")
+    parser.add_argument("--max-distance", type=float, default=150., help="largest evaluated distance in meters")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of distances and quantiles")
+    args = parser.parse_args()
+    random = np.random.default_rng(args.seed)
+    distance = random.uniform(0, args.max_distance, args.cells)
+    q = random.random(args.cells)
+    print(f"{'curve':<40}{'table':>10}{'exact':>10}{'lookup':>10}{'speed-up':>10}{'max. error':>12}")
+    cases = [(f"xspraydrift {crop}", xdrift.xspraydrift, lookup.xspraydrift, (distance, q, np.nan, crop)) for crop in (
+        "arable", "vines", "orchards.early", "orchards.late", "hops")]
+    worst = 0.
+    for name, reference, table, arguments in cases:
+        build_duration, reference_duration, table_duration, error = measure(reference, table, arguments)
+        worst = max(worst, error)
+        print(
+            f"{name:<40}{build_duration:>9.3f}s{reference_duration:>9.3f}s{table_duration:>9.3f}s"
+            f"{reference_duration / table_duration:>10.1f}{error:>12.2e}"
+        )
+    print(f"maximum relative error:    {worst:.2e} (tolerance {lookup.TOLERANCE:.0e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares the `vector` and `raster` drift-filtering methods of the native engine regarding runtime and the
+vegetation widths they determine. Run as `python benchmarks/drift_filtering.py` from the component folder.
+"""
+import argparse
+import time
+import numpy as np
+import synthetic
+from synthetic import native
+from native import geometry, xdrift
+
+
+def main():
+    """
+    Runs the benchmark.
+
+    Returns:
+        Nothing.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1000, help="edge length of the landscape in meters")
+    parser.add_argument("--applications", type=int, default=20, help="number of applied fields")
+    parser.add_argument("--hedge-vertices", type=int, default=50, help="segments of each long side of a hedge")
+    parser.add_argument("--min-width", type=float, default=3., help="vegetation width needed for filtering")
+    args = parser.parse_args()
+    geometries, types, fields, extent = synthetic.landscape(args.size, hedge_vertices=args.hedge_vertices)
+    start = time.perf_counter()
+    landscape = native.Landscape(
+        geometries, types, extent, (synthetic.GRASS, synthetic.HEDGE), (synthetic.HEDGE,))
+    for wind_direction in (0, 45, 90, 135):
+        dx, dy = xdrift.DOWNWIND_VECTORS[wind_direction]
+        landscape.vegetation_coverage((dy, -dx))
+    coverage_duration = time.perf_counter() - start
+    durations = {"vector": 0., "raster": 0.}
+    errors = []
+    decisions = 0
+    crossing = 0
+    differing_decisions = 0
+    for field in fields[:args.applications]:
+        area = landscape.geometries[field]
+        window = landscape.roi(geometry.bounding_box(area))
+        grid = landscape.grid.subgrid(window)
+        sources = geometry.rasterize_mask([area], grid)
+        cells = landscape.habitat_mask[window] | sources
+        for wind_direction in xdrift.DOWNWIND_VECTORS:
+            distance = xdrift.mindwdist(sources, wind_direction, cells)
+            row, col = np.nonzero(cells & (distance > 0))
+            widths = {}
+            for method in durations:
+                start = time.perf_counter()
+                widths[method] = native.vegetation_widths(
+                    landscape, window, row, col, distance[row, col], wind_direction, method)
+                durations[method] += time.perf_counter() - start
+            errors.append(np.abs(widths["vector"] - widths["raster"]))
+            crossing += np.sum(widths["vector"] > 0)
+            decisions += len(row)
+            differing_decisions += np.sum(
+                (widths["vector"] >= args.min_width) != (widths["raster"] >= args.min_width))
+    errors = np.concatenate(errors)
+    print(f"trajectories:              {len(errors)}")
+    print(f"crossing vegetation:       {crossing}")
+    print(f"landscape and coverage:    {coverage_duration:.3f} s")
+    for method, duration in durations.items():
+        print(f"{method + ' method:':<27}{duration:.3f} s")
+    print(f"speed-up:                  {durations['vector'] / durations['raster']:.1f}")
+    print(f"maximum width difference:  {errors.max():.2e} m")
+    print(f"mean width difference:     {errors.mean():.2e} m")
+    print(f"differing filtering:       {differing_decisions / max(decisions, 1):.5%} of trajectories")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Checks the NumPy port in `native.xdrift` against reference values computed by the XDrift R package. The reference
+values are read from `reference_values.csv`, which `reference_values.R` creates with the R runtime of the module. Run
+as `python benchmarks/reference_values.py` from the component folder; the script exits with a non-zero status if a
+value deviates by more than the tolerance.
+"""
+import argparse
+import csv
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from native import xdrift  # noqa: E402
+
+
+def cases():
+    """
+    Evaluates the ported functions for the cases of `reference_values.R`.
+
+    Returns:
+        A dictionary of the values of the port by case name.
+    """
+    result = {}
+    x = np.array((0, .3, 1.2, 2.5, 3.7, -1.4, 5.9, 7.25, -3.3, 10.1))
+    y = np.array((0, 2.1, -.8, 4.4, 1.6, 3.3, -2.7, 6.05, 8.8, -4.2))
+    for angle in (0, 30, 45, 60, 90, 120, 135, 170):
+        for width in (1, .7):
+            result[f"bands {angle:g} {width:g} mathematical"] = xdrift.bands(x, y, angle, width, "mathematical")
+    for angle in (0, 90, 225, 270):
+        result[f"bands {angle:g} 3 meteorological"] = xdrift.bands(x, y, angle, 3, "meteorological")
+    row, col = np.indices((8, 8))
+    sources = (np.isin(row, (3, 4)) & np.isin(col, (3, 4))) | ((row == 1) & (col == 6))
+    for direction in range(0, 360, 45):
+        result[f"mindwdist {direction:g}"] = xdrift.mindwdist(sources, direction).ravel()
+    distance = np.array((0, .5, 1, 3, 5, 7.5, 10, 11.4577, 15, 20, 30, 50, 75, 100, 150, 249))
+    crops = ("arable", "vines", "orchards.early", "orchards.late", "hops")
+    for crop in crops:
+        result[f"rautmann90 {crop}"] = xdrift.rautmann90(distance, crop, 1)
+    for droplets in ("fine", "medium"):
+        for q in (.5, .9):
+            for boom in ("low", "high"):
+                result[f"agdrift_g {droplets} {q:g} {boom}"] = xdrift.agdrift_g(distance, droplets, q, boom, 1)
+    for crop in crops:
+        for q in (.1, .5, .9):
+            result[f"xspraydrift {crop} {q:g}"] = xdrift.xspraydrift(distance, q, 1, crop)
+    return result
+
+
+def read_reference(file_path):
+    """
+    Reads the reference values written by `reference_values.R`.
+
+    Args:
+        file_path: The path of the CSV file.
+
+    Returns:
+        A dictionary of the reference values by case name.
+    """
+    values = {}
+    with open(file_path, newline="") as f:
+        for record in csv.DictReader(f):
+            values.setdefault(record["case"], []).append(np.nan if record["value"] == "NA" else float(record["value"]))
+    return {k: np.array(v) for k, v in values.items()}
+
+
+def main():
+    """
+    Runs the check.
+
+    Returns:
+        Nothing.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--reference",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference_values.csv"),
+        help="CSV file of reference values written by reference_values.R"
+    )
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="maximum relative deviation")
+    args = parser.parse_args()
+    if not os.path.exists(args.reference):
+        sys.exit(f"{args.reference} does not exist, create it by running reference_values.R with the module's R")
+    reference = read_reference(args.reference)
+    failed = 0
+    print(f"{'case':<40}{'values':>8}{'max. error':>12}")
+    for name, actual in cases().items():
+        if name not in reference:
+            print(f"{name:<40}{'missing':>8}")
+            failed += 1
+            continue
+        expected = reference[name]
+        if expected.shape != actual.shape or not np.array_equal(np.isnan(expected), np.isnan(actual)):
+            print(f"{name:<40}{len(actual):>8}{'NA differ':>12}")
+            failed += 1
+            continue
+        known = ~np.isnan(expected)
+        error = np.max(
+            np.abs(actual[known] - expected[known]) / np.maximum(np.abs(expected[known]), 1e-300), initial=0)
+        failed += error > args.tolerance
+        print(f"{name:<40}{len(actual):>8}{error:>12.2e}")
+    if failed:
+        sys.exit(f"{failed} cases deviate from the XDrift R package")
+    print("all cases agree with the XDrift R package")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Synthetic landscapes for benchmarking the native engine of the XSprayDrift component. Landscapes are regular
+patterns of fields that are separated by grass margins and hedges of varying orientation, so that their size and
+complexity can be scaled without external data.
+"""
+import datetime
+import math
+import os
+import struct
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import native  # noqa: E402
+
+
+# The land use / land cover types of synthetic landscapes
+FIELD = 1
+GRASS = 2
+HEDGE = 3
+
+
+def polygon_wkb(ring):
+    """
+    Encodes a polygon without holes in little-endian Well-Known-Binary representation.
+
+    Args:
+        ring: The exterior ring as sequence of (x, y) coordinates. It is closed automatically.
+
+    Returns:
+        The Well-Known-Binary representation.
+    """
+    ring = list(ring)
+    if ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return struct.pack("<BII", 1, 3, 1) + struct.pack("<I", len(ring)) + b"".join(
+        struct.pack("<dd", x, y) for x, y in ring)
+
+
+def rectangle(x, y, width, height, angle=0., vertices=1, jitter=0., random=None):
+    """
+    Creates the exterior ring of a rectangle rotated around its center. The long sides can be digitized with
+    additional, randomly displaced vertices to resemble mapped landscape elements.
+
+    Args:
+        x: The x-coordinate of the center.
+        y: The y-coordinate of the center.
+        width: The width of the rectangle.
+        height: The height of the rectangle.
+        angle: The counter-clockwise rotation in degrees.
+        vertices: The number of segments of each long side.
+        jitter: The maximum displacement of additional vertices perpendicular to the side.
+        random: The NumPy random generator used for the displacement.
+
+    Returns:
+        A list of (x, y) coordinates.
+    """
+    cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    offsets = np.linspace(-height / 2, height / 2, vertices + 1)
+    displacement = np.zeros((2, vertices + 1))
+    if jitter > 0:
+        displacement[:, 1:-1] = random.uniform(-jitter, jitter, (2, vertices - 1))
+    ring = [(width / 2 + d, o) for o, d in zip(offsets, displacement[0])] + [
+        (-width / 2 + d, o) for o, d in zip(offsets[::-1], displacement[1, ::-1])]
+    return [(x + dx * cos - dy * sin, y + dx * sin + dy * cos) for dx, dy in ring]
+
+
+def landscape(size=1000, field_size=100, margin=6, hedge_share=.5, meadow_share=.3, hedge_vertices=50, seed=1):
+    """
+    Creates a synthetic landscape. Grass margins and meadows are habitats, hedges are habitats that filter
+    spray-drift.
+
+    Args:
+        size: The edge length of the square landscape in meters.
+        field_size: The edge length of the cells of the field pattern in meters.
+        margin: The width of the grass margin east of every field in meters.
+        hedge_share: The share of fields that have a hedge within their margin.
+        meadow_share: The share of the field pattern that is covered by meadows instead of fields.
+        hedge_vertices: The number of segments of each long side of a hedge.
+        seed: The random seed of the landscape.
+
+    Returns:
+        A tuple of the geometries in Well-Known-Binary representation, their land use / land cover types, the
+        indices of fields and the extent (x-min, x-max, y-min, y-max) of the landscape.
+    """
+    random = np.random.default_rng(seed)
+    geometries = []
+    types = []
+    fields = []
+    for x in range(0, size, field_size):
+        for y in range(0, size, field_size):
+            if random.random() < meadow_share:
+                types.append(GRASS)
+            else:
+                fields.append(len(geometries))
+                types.append(FIELD)
+            geometries.append(polygon_wkb(rectangle(
+                x + (field_size - margin) / 2, y + field_size / 2, field_size - margin, field_size)))
+            geometries.append(polygon_wkb(rectangle(
+                x + field_size - margin / 2, y + field_size / 2, margin, field_size)))
+            types.append(GRASS)
+            if random.random() < hedge_share:
+                geometries.append(polygon_wkb(rectangle(
+                    x + field_size - margin / 2,
+                    y + field_size / 2,
+                    random.uniform(1, margin - 1),
+                    random.uniform(.3, .9) * field_size,
+                    random.uniform(-20, 20),
+                    hedge_vertices,
+                    .3,
+                    random
+                )))
+                types.append(HEDGE)
+    return geometries, np.array(types), np.array(fields), (0., float(size), 0., float(size))
+
+
+def inputs(
+        size=1000,
+        applications=50,
+        simulation_length=30,
+        hedge_share=.5,
+        meadow_share=.3,
+        spatial_output_scale="1sqm",
+        model="XSprayDrift",
+        filtering=True,
+        seed=1
+):
+    """
+    Creates the values of all inputs of the SprayDrift component for a synthetic landscape. Applications are
+    distributed over the fields and days of the simulation in turn.
+
+    Args:
+        size: The edge length of the square landscape in meters.
+        applications: The number of applications.
+        simulation_length: The number of simulated days.
+        hedge_share: The share of fields that have a hedge within their margin.
+        meadow_share: The share of the field pattern that is covered by meadows instead of fields.
+        spatial_output_scale: The spatial output scale, either `1sqm` or `base_geometry`.
+        model: The spray-drift model, one of `XSprayDrift`, `90thRautmann` or `AgDrift`.
+        filtering: Specifies whether hedges filter spray-drift.
+        seed: The random seed of the landscape and of the simulation.
+
+    Returns:
+        A dictionary of input values by input name.
+    """
+    geometries, types, fields, extent = landscape(size, hedge_share=hedge_share, meadow_share=meadow_share, seed=seed)
+    applied_fields = fields[np.arange(applications) % len(fields)]
+    simulation_start = datetime.date(2000, 1, 1)
+    return {
+        "ProcessingPath": None,
+        "SimulationStart": simulation_start,
+        "SimulationEnd": simulation_start + datetime.timedelta(simulation_length - 1),
+        "Geometries": geometries,
+        "GeometryCrs": "+proj=utm +zone=32 +ellps=WGS84 +units=m +no_defs",
+        "Extent": extent,
+        "HabitatTypes": f"{GRASS}, {HEDGE}",
+        "FieldDistanceSD": 1.,
+        "EPDistanceSD": 1.,
+        "ReportingThreshold": 0.,
+        "ApplySimpleDriftFiltering": False,
+        "LandUseLandCoverTypes": types,
+        "WindDirection": -1,
+        "SprayDriftModel": model,
+        "SourceExposure": "NA",
+        "RautmannClass": "arable",
+        "AppliedFields": applied_fields,
+        "ApplicationDates": np.array(
+            [(simulation_start + datetime.timedelta(int(x))).toordinal() for x in np.arange(
+                applications) % simulation_length]),
+        "ApplicationRates": np.full(applications, 100.),
+        "TechnologyDriftReductions": np.zeros(applications),
+        "AppliedAreas": [geometries[x] for x in applied_fields],
+        "SpatialOutputScale": spatial_output_scale,
+        "RandomSeed": seed,
+        "MinimumDistanceToField": 0.,
+        "FilteringTypes": [HEDGE] if filtering else [],
+        "FilteringMinWidth": 1.,
+        "FilteringFraction": .5,
+        "AgDriftBoomHeight": "low",
+        "AgDriftDropletSize": "fine",
+        "AgDriftQuantile": .9,
+        "Engine": "native",
+        "Workers": 1,
+        "FilteringMethod": "raster",
+        "DriftCurves": "exact",
+        "ExposureFormat": "dense",
+        "WriteBufferSize": 256.,
+        "MaxMemory": 0.,
+        "ExposureSummaries": False,
+        "Realizations": 1,
+        "Profiling": True,
+        "LandscapeCache": "",
+        "LandscapeCacheSize": 4096.
+    }
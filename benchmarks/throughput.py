@@ -0,0 +1,250 @@
+"""
+Measures the throughput of the native engine on synthetic landscapes for both spatial output scales, all spray-drift
+models and with drift-filtering on and off. Every run passes the inputs of a synthetic landscape to a SprayDrift
+component, calls its `run` method against outputs that only keep summary statistics and appends a record with the
+current commit, the landscape and the per-stage instrumentation of the component to a JSON lines file, so that scaling
+curves can be compared across commits. Run as `python benchmarks/throughput.py` from the component folder with the
+Python environment of the Landscape Model. The `core` folder of the model, which provides the `base` and `attrib`
+packages, is expected next to the `variant` folder of the component unless it is given by `--core`.
+"""
+import argparse
+import datetime
+import importlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import numpy as np
+import synthetic
+
+
+# The folder of the component
+COMPONENT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The units of inputs that have one
+UNITS = {"ApplicationRates": "g/ha"}
+
+
+class StubInput:
+    """
+    Stands in for an input of the component and provides a fixed value with global scale.
+    """
+    def __init__(self, value, unit=None):
+        """
+        Initializes a StubInput.
+
+        Args:
+            value: The value of the input.
+            unit: The unit of the value.
+        """
+        self._value = value
+        self._unit = unit
+
+    def read(self):
+        """
+        Reads the input.
+
+        Returns:
+            The data of the input with its values and unit.
+        """
+        return types.SimpleNamespace(values=self._value, unit=self._unit)
+
+    def describe(self):
+        """
+        Describes the input.
+
+        Returns:
+            A dictionary of the metadata of the input.
+        """
+        return {"unit": self._unit, "scales": "global", "element_names": (None,), "geometries": (None,)}
+
+
+class SummaryOutput:
+    """
+    Stands in for an output of the component and keeps only the sum, the maximum and the number of written values.
+    """
+    def __init__(self):
+        """
+        Initializes a SummaryOutput.
+        """
+        self.sum = 0.
+        self.max = 0.
+        self.values = 0
+
+    def set_values(self, values, **keywords):
+        """
+        Receives a block of values. Creating the output with a type instead of values is ignored.
+
+        Args:
+            values: The values or the type of the output.
+            keywords: The slices, shape and metadata of the write, which are ignored.
+
+        Returns:
+            Nothing.
+        """
+        if isinstance(values, type):
+            return
+        values = np.asarray(values)
+        self.sum += float(values.sum(dtype=np.float64))
+        self.max = max(self.max, float(values.max(initial=0)))
+        self.values += values.size
+
+
+def commit():
+    """
+    Gets the commit of the component folder.
+
+    Returns:
+        The hash of the checked-out commit, or `None` if it cannot be determined.
+    """
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "HEAD"),
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def component_class(core):
+    """
+    Imports the SprayDrift component from the component folder.
+
+    Args:
+        core: The `core` folder of the Landscape Model.
+
+    Returns:
+        The SprayDrift class.
+    """
+    sys.path.insert(0, os.path.abspath(core))
+    sys.path.insert(0, os.path.dirname(COMPONENT_FOLDER))
+    return importlib.import_module(os.path.basename(COMPONENT_FOLDER)).SprayDrift
+
+
+def run(component_type, values, processing_path):
+    """
+    Runs a SprayDrift component for the values of its inputs against SummaryOutputs.
+
+    Args:
+        component_type: The SprayDrift class.
+        values: The input values by input name.
+        processing_path: An existing directory for temporary files.
+
+    Returns:
+        A tuple of the SummaryOutputs by output name and the stages of the instrumentation of the run.
+    """
+    component = component_type("SprayDrift", None, None)
+    # the component creates its processing path itself
+    processing_path = os.path.join(processing_path, "SprayDrift")
+    component._inputs = {
+        name: StubInput(processing_path if name == "ProcessingPath" else value, UNITS.get(name))
+        for name, value in values.items()
+    }
+    outputs = {name: SummaryOutput() for name in (
+        "Exposure",
+        "ExposureFile",
+        "SparseExposureCells",
+        "SparseExposureValues",
+        "SparseExposureIndex",
+        "ExposureMax",
+        "ExposureSum",
+        "ExposureEventCount"
+    )}
+    component._outputs = outputs
+    component.run()
+    with open(os.path.join(processing_path, "instrumentation.json")) as f:
+        return outputs, {x.pop("name"): x for x in json.load(f)["stages"]}
+
+
+def main():
+    """
+    Runs the benchmark.
+
+    Returns:
+        Nothing.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000], help="edge lengths of landscapes in m")
+    parser.add_argument("--applications", type=int, nargs="+", default=[10, 40], help="numbers of applications")
+    parser.add_argument(
+        "--meadow-shares", type=float, nargs="+", default=[.3], help="shares of meadows, controlling habitat counts")
+    parser.add_argument(
+        "--scales",
+        nargs="+",
+        default=["1sqm", "base_geometry"],
+        choices=["1sqm", "base_geometry"],
+        help="spatial output scales"
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["XSprayDrift", "90thRautmann", "AgDrift"],
+        choices=["XSprayDrift", "90thRautmann", "AgDrift"],
+        help="spray-drift models"
+    )
+    parser.add_argument(
+        "--filtering", nargs="+", default=["on", "off"], choices=["on", "off"], help="drift-filtering by hedges")
+    parser.add_argument("--days", type=int, default=30, help="number of simulated days")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument(
+        "--max-memory", type=float, default=0., help="memory limit of tiled 1sqm write-back in MB, 0 disables tiling")
+    parser.add_argument(
+        "--core",
+        default=os.path.join(COMPONENT_FOLDER, "..", "..", "core"),
+        help="core folder of the Landscape Model that provides the base and attrib packages"
+    )
+    parser.add_argument("--results", default=os.path.join(os.path.dirname(__file__), "results.jsonl"), help=(
+        "JSON lines file to which results are appended"))
+    args = parser.parse_args()
+    revision = commit()
+    component_type = component_class(args.core)
+    print(f"{'size':>6}{'apps':>6}{'habitats':>10}{'scale':>15}{'model':>14}{'filter':>8}{'time':>10}{'cells/s':>12}")
+    with open(args.results, "a") as results:
+        for size, applications, meadow_share, scale, model, filtering in itertools.product(
+                args.sizes, args.applications, args.meadow_shares, args.scales, args.models, args.filtering):
+            values = synthetic.inputs(
+                size, applications, args.days, meadow_share=meadow_share, spatial_output_scale=scale, model=model,
+                filtering=filtering == "on")
+            values["Workers"] = args.workers
+            values["MaxMemory"] = args.max_memory
+            with tempfile.TemporaryDirectory() as processing_path:
+                start = time.perf_counter()
+                outputs, stages = run(component_type, values, processing_path)
+                duration = time.perf_counter() - start
+            cells = stages.get("model evaluation", {"counts": {}})["counts"].get("cells", 0)
+            habitats = stages["landscape preparation"]["counts"]["habitats"]
+            record = {
+                "commit": revision,
+                "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                "size": size,
+                "area": size * size,
+                "applications": applications,
+                "geometries": len(values["Geometries"]),
+                "habitats": habitats,
+                "days": args.days,
+                "workers": args.workers,
+                "max_memory": args.max_memory,
+                "spatial_output_scale": scale,
+                "model": model,
+                "filtering": filtering == "on",
+                "duration": duration,
+                "exposure_sum": outputs["Exposure"].sum,
+                "exposure_max": outputs["Exposure"].max,
+                "stages": [dict(name=k, **v) for k, v in stages.items()]
+            }
+            results.write(json.dumps(record) + "\n")
+            print(
+                f"{size:>6}{applications:>6}{habitats:>10}{scale:>15}{model:>14}{filtering:>8}{duration:>9.2f}s"
+                f"{cells / duration:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Imports for the native engine of the Landscape Model XSprayDrift component.
+"""
+
+from .cache import LandscapeCache, SourceTableCache, cached_landscape, cached_simulation, content_hash, landscape_key
+from .engine import (
+    Landscape, Parameters, simulate, simulate_application, simulate_batch, simulate_ensemble, simulate_realizations,
+    vegetation_widths)
+from .output import BaseGeometryWriter, ExposureSummary, SparseWriter, SquareMeterWriter
+from .profiling import Instrumentation, peak_rss
+from .reference import DatasetOutput, ExposureReference
+from .sparse import SparseExposure
+from .streams import RandomStreams
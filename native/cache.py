@@ -0,0 +1,416 @@
+"""
+A content-addressed on-disk cache of landscape preprocessing that is shared between runs. Entries are keyed by a hash
+of the inputs they are derived from, so that runs on the same landscape reuse them regardless of their random seed,
+weather or application schedule. The least recently used entries are evicted when the cache exceeds its size.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import uuid
+import numpy as np
+from . import engine
+from . import streams
+
+
+# The version of the cache layout; entries of other versions are never matched
+CACHE_VERSION = 1
+
+
+def _update(digest, value):
+    """
+    Adds a value to a hash in a representation that distinguishes types and nesting.
+
+    Args:
+        digest: The hash object.
+        value: A value of type bytes, str, int, float, None, NumPy array or a sequence of these.
+
+    Returns:
+        Nothing.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        digest.update(b"b%d:" % len(value) + bytes(value))
+    elif isinstance(value, str):
+        _update(digest, value.encode())
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        value = np.ascontiguousarray(value)
+        digest.update(f"a{value.dtype.str}{value.shape}:".encode() + value.tobytes())
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        digest.update(b"l%d:" % len(value))
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(f"v{value!r}:".encode())
+
+
+def content_hash(*values):
+    """
+    Gets the hash of a set of values.
+
+    Args:
+        values: The values. See `_update` for the supported types.
+
+    Returns:
+        The hexadecimal SHA-256 hash.
+    """
+    digest = hashlib.sha256()
+    _update(digest, CACHE_VERSION)
+    for value in values:
+        _update(digest, value)
+    return digest.hexdigest()
+
+
+class LandscapeCache:
+    """
+    A directory of cache entries. Every entry is a sub-directory named by its key. The modification time of an entry
+    is updated whenever it is used and serves as its last access time.
+    """
+    def __init__(self, path, max_size):
+        """
+        Initializes a LandscapeCache.
+
+        Args:
+            path: The cache directory. It is created if needed.
+            max_size: The size in bytes above which least recently used entries are evicted.
+        """
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, key, create, evict=True):
+        """
+        Gets a cache entry and creates it if it does not exist.
+
+        Args:
+            key: The key of the entry.
+            create: A function that writes the content of a new entry. It receives the temporary directory that is
+                written to and the final directory of the entry.
+            evict: Specifies whether least recently used entries are evicted after creating the entry. Callers that
+                create many entries at once evict them once at the end instead.
+
+        Returns:
+            The directory of the entry.
+        """
+        entry = os.path.join(self.path, key)
+        if os.path.isdir(entry):
+            os.utime(entry)
+            return entry
+        temporary = os.path.join(self.path, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(temporary)
+        try:
+            create(temporary, entry)
+            os.rename(temporary, entry)
+        except OSError:
+            # Another run created the entry concurrently
+            shutil.rmtree(temporary, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+        if evict:
+            self.evict(entry)
+        return entry
+
+    def evict(self, keep=()):
+        """
+        Removes least recently used entries until the cache does not exceed its size.
+
+        Args:
+            keep: The directory of an entry or a collection of directories of entries that are never evicted.
+
+        Returns:
+            Nothing.
+        """
+        if isinstance(keep, str):
+            keep = {keep}
+        entries = []
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if name.startswith(".") or not os.path.isdir(entry):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(directory, x)) for directory, _, files in os.walk(entry) for x in files)
+            entries.append((os.path.getmtime(entry), size, entry))
+        total = sum(x[1] for x in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            if entry not in keep:
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+
+def landscape_key(geometries, land_use_land_cover_types, extent, habitat_types, filtering_types=()):
+    """
+    Gets the cache key of a landscape.
+
+    Args:
+        geometries: The landscape geometries in Well-Known-Binary representation.
+        land_use_land_cover_types: The land use / land cover type of every geometry.
+        extent: The extent of the square-meter output as x-min, x-max, y-min and y-max.
+        habitat_types: The land use / land cover types that are habitats.
+        filtering_types: The land use / land cover types that filter spray-drift.
+
+    Returns:
+        The key.
+    """
+    return content_hash(
+        "landscape",
+        list(geometries),
+        np.asarray(land_use_land_cover_types),
+        tuple(float(x) for x in extent),
+        sorted(int(x) for x in habitat_types),
+        sorted(int(x) for x in filtering_types)
+    )
+
+
+def cached_landscape(
+        cache, geometries, land_use_land_cover_types, extent, habitat_types, filtering_types=(), key=None):
+    """
+    Gets a Landscape from the cache or preprocesses and caches it. Cached landscapes contain the parsed geometries,
+    the spatial indexes, the vegetation coverage along all grid line families and a habitat mask that is
+    memory-mapped from the cache.
+
+    Args:
+        cache: The LandscapeCache.
+        geometries: The landscape geometries in Well-Known-Binary representation.
+        land_use_land_cover_types: The land use / land cover type of every geometry.
+        extent: The extent of the square-meter output as x-min, x-max, y-min and y-max.
+        habitat_types: The land use / land cover types that are habitats.
+        filtering_types: The land use / land cover types that filter spray-drift.
+        key: The cache key of the landscape, if it is already known.
+
+    Returns:
+        A tuple of the Landscape and a Boolean that is `True` if the Landscape was found in the cache.
+    """
+    if key is None:
+        key = landscape_key(geometries, land_use_land_cover_types, extent, habitat_types, filtering_types)
+    found = os.path.isdir(os.path.join(cache.path, key))
+
+    def create(directory, entry):
+        landscape = engine.Landscape(
+            geometries,
+            land_use_land_cover_types,
+            extent,
+            habitat_types,
+            filtering_types,
+            os.path.join(directory, "habitats.npy")
+        )
+        if len(landscape.filtering) > 0:
+            for step in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                landscape.vegetation_coverage(step)
+        landscape.mask_path = os.path.join(entry, "habitats.npy")
+        with open(os.path.join(directory, "landscape.pkl"), "wb") as f:
+            pickle.dump(landscape, f, pickle.HIGHEST_PROTOCOL)
+
+    entry = cache.get(key, create)
+    with open(os.path.join(entry, "landscape.pkl"), "rb") as f:
+        landscape = pickle.load(f)
+    landscape.source_table_cache = SourceTableCache(cache, key)
+    return landscape, found
+
+
+class SourceTableCache:
+    """
+    Keeps the source tables of a cached landscape as cache entries, so that runs and worker processes on the same
+    landscape share them. Entries are keyed by the landscape key, the applied area and the wind sector. They are not
+    evicted when they are created, callers evict the cache once at the end of a run.
+    """
+    def __init__(self, cache, key):
+        """
+        Initializes a SourceTableCache.
+
+        Args:
+            cache: The LandscapeCache.
+            key: The cache key of the landscape as returned by `landscape_key`.
+        """
+        self.cache = cache
+        self.key = key
+
+    def get(self, area, wind_direction, create, instrumentation=None):
+        """
+        Gets the source table of an applied area and a wind sector from the cache and creates it if it is not cached.
+
+        Args:
+            area: The applied area in Well-Known-Binary representation.
+            wind_direction: The wind direction in degrees, binned into the eight principal directions.
+            create: A function without arguments that returns the source table as returned by `engine.source_table`.
+            instrumentation: The Instrumentation that counts hits and misses of the `source table cache` stage.
+
+        Returns:
+            The source table as returned by `engine.source_table`.
+        """
+        key = content_hash("source table", self.key, bytes(area), int(wind_direction))
+        found = os.path.isdir(os.path.join(self.cache.path, key))
+        created = []
+
+        def write(directory, _):
+            table = create()
+            created.append(table)
+            if table is not None:
+                window, row, col, distance, bands, ep_index = table
+                np.savez(
+                    os.path.join(directory, "source_table.npz"),
+                    window=[window[0].start, window[0].stop, window[1].start, window[1].stop],
+                    row=row,
+                    col=col,
+                    distance=distance,
+                    bands=bands,
+                    ep_index=ep_index
+                )
+
+        if instrumentation is not None:
+            instrumentation.add("source table cache", 0., 0, hits=int(found), misses=int(not found))
+        try:
+            entry = self.cache.get(key, write, False)
+            if created:
+                return created[0]
+            file_path = os.path.join(entry, "source_table.npz")
+            if not os.path.exists(file_path):
+                return None
+            with np.load(file_path) as table:
+                window = table["window"]
+                arrays = [table[x] for x in ("row", "col", "distance", "bands", "ep_index")]
+        except OSError:
+            # the entry was evicted by a concurrent run
+            return create()
+        for array in arrays:
+            array.setflags(write=False)
+        return ((slice(int(window[0]), int(window[1])), slice(int(window[2]), int(window[3]))),) + tuple(arrays)
+
+
+def application_key(landscape, parameters, area, rate, drift_reduction, wind_direction, random_seed, identity):
+    """
+    Gets the cache key of the deposition of an application. The key covers everything the deposition depends on,
+    but not the position of the application in the schedule, so that fragments are reused if other applications are
+    added, removed or reordered.
+
+    Args:
+        landscape: The cache key of the landscape.
+        parameters: The Parameters.
+        area: The applied area in Well-Known-Binary representation.
+        rate: The application rate.
+        drift_reduction: The drift reduction by technology.
+        wind_direction: The wind direction in degrees, or a negative value for a randomly sampled wind direction.
+        random_seed: The random seed of the simulation.
+        identity: The identity of the application as returned by `streams.application_identities`, which covers its
+            day and identifies its random streams.
+
+    Returns:
+        The key.
+    """
+    return content_hash(
+        "application",
+        landscape,
+        [(k, v if isinstance(v, str) else float(v)) for k, v in sorted(vars(parameters).items())],
+        bytes(area),
+        float(rate),
+        float(drift_reduction),
+        float(wind_direction),
+        int(random_seed),
+        int(identity)
+    )
+
+
+def cached_simulation(
+        cache,
+        key,
+        landscape,
+        parameters,
+        areas,
+        days,
+        rates,
+        drift_reductions,
+        wind_directions,
+        random_seed,
+        applications=None,
+        workers=1,
+        instrumentation=None
+):
+    """
+    Simulates a series of applications like `engine.simulate`, but keeps the deposition of every application as a
+    fragment in the cache. Only applications without a fragment are simulated, all others are read from the cache.
+    Results are yielded in the order of the applications and are identical to those of `engine.simulate`.
+
+    Args:
+        cache: The LandscapeCache.
+        key: The cache key of the landscape as returned by `landscape_key`.
+        landscape: The Landscape.
+        parameters: The Parameters.
+        areas: The applied areas in Well-Known-Binary representation.
+        days: The zero-based simulation day of each application.
+        rates: The application rates.
+        drift_reductions: The drift reductions by technology.
+        wind_directions: The wind direction in degrees per application.
+        random_seed: The random seed of the simulation. It must be set for fragments to be reusable.
+        applications: The indices of the applications to simulate. If `None`, all applications are simulated.
+        workers: The number of worker processes.
+        instrumentation: The Instrumentation into which the stages of simulated applications are merged.
+
+    Returns:
+        A generator of tuples of the application index, the simulation day and the row indices, column indices and
+        exposure of exposed cells, in the order of the applications.
+    """
+    if applications is None:
+        applications = range(len(areas))
+    identities = streams.application_identities(areas, days, rates, drift_reductions)
+    entries = {
+        i: os.path.join(cache.path, application_key(
+            key,
+            parameters,
+            areas[i],
+            rates[i],
+            drift_reductions[i],
+            wind_directions[i],
+            random_seed,
+            identities[i]
+        )) for i in applications
+    }
+    missing = [i for i in applications if not os.path.isdir(entries[i])]
+    missing_set = set(missing)
+    if instrumentation is not None:
+        instrumentation.add("fragment cache", 0., 0, hits=len(entries) - len(missing), misses=len(missing))
+    simulated = engine.simulate(
+        landscape,
+        parameters,
+        areas,
+        days,
+        rates,
+        drift_reductions,
+        wind_directions,
+        random_seed,
+        missing,
+        workers,
+        instrumentation
+    )
+    for i in applications:
+        if i in missing_set:
+            _, day, row, col, exposure = next(simulated)
+
+            def create(directory, _):
+                np.savez(os.path.join(directory, "fragment.npz"), row=row, col=col, exposure=exposure)
+
+            cache.get(os.path.basename(entries[i]), create, False)
+            yield i, day, row, col, exposure
+            continue
+        try:
+            os.utime(entries[i])
+            with np.load(os.path.join(entries[i], "fragment.npz")) as fragment:
+                row, col, exposure = fragment["row"], fragment["col"], fragment["exposure"]
+        except OSError:
+            # the fragment was evicted by a concurrent run
+            _, _, row, col, exposure = next(engine.simulate(
+                landscape,
+                parameters,
+                areas,
+                days,
+                rates,
+                drift_reductions,
+                wind_directions,
+                random_seed,
+                [i],
+                instrumentation=instrumentation
+            ))
+        yield i, days[i], row, col, exposure
+    cache.evict(set(entries.values()))
@@ -0,0 +1,852 @@
+"""
+The native spray-drift engine. It simulates spray-drift deposition per application the same way as the
+`SDModel_XSprayDrift_x3df_2.R` script of the XSprayDrift module, but in-process and vectorized with NumPy.
+"""
+import concurrent.futures
+import hashlib
+import time
+import numpy as np
+from . import geometry
+from . import profiling
+from . import lookup
+from . import streams
+from . import xdrift
+
+
+# The buffer in meters around applied areas within which deposition is simulated
+ROI_BUFFER = 50
+
+# The width in meters of the exposure paths along the field edge
+EP_WIDTH = 3
+
+# The number of grid rows that are rasterized at once when creating the habitat mask
+MASK_BLOCK_ROWS = 256
+
+# The number of source tables of applied areas and wind directions that a Landscape keeps
+SOURCE_TABLE_CACHE_SIZE = 1024
+
+# The wind direction that requests a randomly sampled wind direction in unsigned wind direction series
+RANDOM_WIND_DIRECTION = 65535
+
+# The largest number of applications of the same day and wind sectors whose deposition is evaluated in one batch
+BATCH_SIZE = 32
+
+# The number of consecutive applications of the schedule within which applications are grouped into batches
+BATCH_WINDOW = 256
+
+
+class Parameters:
+    """
+    The parameters of a native spray-drift simulation that apply to all applications.
+    """
+    def __init__(
+            self,
+            model="XSprayDrift",
+            crop="arable",
+            source_exposure=np.nan,
+            field_distance_sd=0.,
+            ep_distance_sd=0.,
+            minimum_distance=0.,
+            reporting_threshold=0.,
+            simple_drift_filtering=False,
+            filtering_min_width=0.,
+            filtering_fraction=0.,
+            boom_height="low",
+            droplet_size="fine",
+            ag_drift_quantile=.9,
+            filtering_method="vector",
+            drift_curves="exact"
+    ):
+        """
+        Initializes the Parameters.
+
+        Args:
+            model: The spray-drift model, one of `XSprayDrift`, `90thRautmann` or `AgDrift`.
+            crop: The Rautmann crop class used by the `XSprayDrift` and `90thRautmann` models.
+            source_exposure: The deposition fraction reported for cells within applied areas.
+            field_distance_sd: The standard deviation of the distance variation at the field scale.
+            ep_distance_sd: The standard deviation of the distance variation at the exposure path scale.
+            minimum_distance: The lower threshold of positive distances.
+            reporting_threshold: The smallest deposition that is reported.
+            simple_drift_filtering: Specifies whether the simple drift-filtering model is applied.
+            filtering_min_width: The vegetation width needed for drift-filtering to take place.
+            filtering_fraction: The fraction of drift that is filtered by vegetation.
+            boom_height: The boom height of the AgDRIFT model.
+            droplet_size: The droplet size of the AgDRIFT model.
+            ag_drift_quantile: The quantile of the AgDRIFT model.
+            filtering_method: The method that determines vegetation widths, either `vector` or `raster`.
+            drift_curves: The evaluation of the `XSprayDrift` model, either `exact` or `table`.
+        """
+        if model not in ("XSprayDrift", "90thRautmann", "AgDrift"):
+            raise ValueError(f"Unknown spray-drift model: {model}")
+        if filtering_method not in ("vector", "raster"):
+            raise ValueError(f"Unknown drift-filtering method: {filtering_method}")
+        if drift_curves not in ("exact", "table"):
+            raise ValueError(f"Unknown evaluation of drift curves: {drift_curves}")
+        self.model = model
+        self.crop = crop
+        self.source_exposure = source_exposure
+        self.field_distance_sd = field_distance_sd
+        self.ep_distance_sd = ep_distance_sd
+        self.minimum_distance = minimum_distance
+        self.reporting_threshold = reporting_threshold
+        self.simple_drift_filtering = simple_drift_filtering
+        self.filtering_min_width = filtering_min_width
+        self.filtering_fraction = filtering_fraction
+        self.boom_height = boom_height
+        self.droplet_size = droplet_size
+        self.ag_drift_quantile = ag_drift_quantile
+        self.filtering_method = filtering_method
+        self.drift_curves = drift_curves
+
+
+class Landscape:
+    """
+    The static part of a native spray-drift simulation: the landscape geometries, the habitats and drift-filtering
+    vegetation among them, spatial indices of both and the 1-square meter grid on which deposition is simulated. The
+    extent of the landscape is computed once and habitats are rasterized once into a mask of the grid, of which
+    applications only take window views.
+    """
+    def __init__(
+            self,
+            geometries,
+            land_use_land_cover_types,
+            extent,
+            habitat_types,
+            filtering_types=(),
+            mask_path=None
+    ):
+        """
+        Initializes a Landscape.
+
+        Args:
+            geometries: The landscape geometries in Well-Known-Binary representation.
+            land_use_land_cover_types: The land use / land cover type of every geometry.
+            extent: The extent of the square-meter output as x-min, x-max, y-min and y-max.
+            habitat_types: The land use / land cover types that are habitats.
+            filtering_types: The land use / land cover types that filter spray-drift.
+            mask_path: The file path of a memory-mapped habitat mask. If `None`, the mask is held in memory.
+        """
+        self.geometries = [geometry.read_wkb(x) for x in geometries]
+        self.bounds = np.array([geometry.bounding_box(x) for x in self.geometries]).reshape((-1, 4))
+        land_use_land_cover_types = np.asarray(land_use_land_cover_types)
+        self.habitats = np.flatnonzero(np.isin(land_use_land_cover_types, list(habitat_types)))
+        self.filtering = np.flatnonzero(np.isin(land_use_land_cover_types, list(filtering_types)))
+        self.extent = extent
+        self.landscape_bounds = (
+            np.nanmin(self.bounds[:, 0]), np.nanmin(self.bounds[:, 1]),
+            np.nanmax(self.bounds[:, 2]), np.nanmax(self.bounds[:, 3])
+        )
+        self.output_grid = geometry.Grid(
+            extent[0],
+            extent[2] + int(round(extent[3] - extent[2])),
+            int(round(extent[3] - extent[2])),
+            int(round(extent[1] - extent[0]))
+        )
+        self.grid = geometry.Grid.aligned(
+            (extent[0], extent[2]),
+            (
+                min(self.landscape_bounds[0], self.output_grid.bounds[0]),
+                min(self.landscape_bounds[1], self.output_grid.bounds[1]),
+                max(self.landscape_bounds[2], self.output_grid.bounds[2]),
+                max(self.landscape_bounds[3], self.output_grid.bounds[3])
+            )
+        )
+        self.output_offset = (
+            int(round(self.grid.y_max - self.output_grid.y_max)), int(round(self.output_grid.x_min - self.grid.x_min)))
+        self.habitat_index = geometry.BoundsIndex(self.bounds[self.habitats], self.habitats)
+        self.filtering_index = geometry.BoundsIndex(self.bounds[self.filtering], self.filtering)
+        self.mask_path = mask_path
+        if mask_path is None:
+            self.habitat_mask = np.zeros(self.grid.shape, bool)
+        else:
+            self.habitat_mask = np.lib.format.open_memmap(mask_path, "w+", bool, self.grid.shape)
+        for start in range(0, self.grid.rows, MASK_BLOCK_ROWS):
+            window = (slice(start, min(start + MASK_BLOCK_ROWS, self.grid.rows)), slice(0, self.grid.cols))
+            block = self.grid.subgrid(window)
+            habitats = self.habitat_index.query(block.bounds)
+            if len(habitats) > 0:
+                self.habitat_mask[window] = geometry.rasterize_mask([self.geometries[i] for i in habitats], block)
+        if mask_path is not None:
+            self.habitat_mask.flush()
+        self._vegetation_coverage = {}
+        self._source_tables = {}
+        self.source_table_cache = None
+
+    def vegetation_coverage(self, step):
+        """
+        Gets the coverage of drift-filtering vegetation along the grid lines of a direction. The coverage is computed
+        once per line family and shared by opposite directions.
+
+        Args:
+            step: The direction as a tuple of a row and a column step, each -1, 0 or 1.
+
+        Returns:
+            A `geometry.LineCoverage`.
+        """
+        key = tuple(-x for x in step) if tuple(step) < (0, 0) else tuple(step)
+        if key not in self._vegetation_coverage:
+            self._vegetation_coverage[key] = geometry.LineCoverage(
+                [self.geometries[i] for i in self.filtering], self.grid, key)
+        return self._vegetation_coverage[key]
+
+    def source_table(self, area, wind_direction, instrumentation=None):
+        """
+        Gets the source table of an applied area and a wind direction. Source tables only depend on the area and the
+        wind direction, so they are computed once and shared by all applications to the same area in the same wind
+        direction. The most recently used source tables are kept in memory. If the Landscape has a source table
+        cache, source tables are also kept in the landscape cache and shared across processes and runs.
+
+        Args:
+            area: The applied area in Well-Known-Binary representation.
+            wind_direction: The wind direction in degrees, binned into the eight principal directions.
+            instrumentation: The Instrumentation that measures the computation of the source table.
+
+        Returns:
+            The source table as returned by `source_table`.
+        """
+        key = (hashlib.sha1(area).digest(), wind_direction)
+        if key not in self._source_tables:
+            if len(self._source_tables) >= SOURCE_TABLE_CACHE_SIZE:
+                del self._source_tables[next(iter(self._source_tables))]
+            if self.source_table_cache is None:
+                self._source_tables[key] = source_table(self, geometry.read_wkb(area), wind_direction, instrumentation)
+            else:
+                self._source_tables[key] = self.source_table_cache.get(
+                    area,
+                    wind_direction,
+                    lambda: source_table(self, geometry.read_wkb(area), wind_direction, instrumentation),
+                    instrumentation
+                )
+        return self._source_tables[key]
+
+    def __getstate__(self):
+        """
+        Gets the state of the Landscape for pickling. A memory-mapped habitat mask is not pickled, but re-opened from
+        its file. Source tables are not pickled.
+
+        Returns:
+            The state of the Landscape.
+        """
+        state = self.__dict__.copy()
+        state["_source_tables"] = {}
+        if self.mask_path is not None:
+            state["habitat_mask"] = None
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state of a pickled Landscape.
+
+        Args:
+            state: The state of the Landscape.
+
+        Returns:
+            Nothing.
+        """
+        self.__dict__.update(state)
+        if self.mask_path is not None:
+            self.habitat_mask = np.load(self.mask_path, "r")
+
+    def roi(self, area_bounds):
+        """
+        Gets the local region of interest around an applied area, aligned to the grid and clipped to the landscape.
+
+        Args:
+            area_bounds: The bounding box of the applied area.
+
+        Returns:
+            A tuple of a row slice and a column slice of the grid.
+        """
+        bounds = (
+            max(area_bounds[0] - ROI_BUFFER, self.landscape_bounds[0]),
+            max(area_bounds[1] - ROI_BUFFER, self.landscape_bounds[1]),
+            min(area_bounds[2] + ROI_BUFFER, self.landscape_bounds[2]),
+            min(area_bounds[3] + ROI_BUFFER, self.landscape_bounds[3])
+        )
+        return self.grid.window(bounds)
+
+
+def vegetation_widths(landscape, window, row, col, distance, wind_direction, method="vector"):
+    """
+    Calculates the width of vegetation crossed by the trajectories between sinks and the upwind field edge.
+
+    Args:
+        landscape: The Landscape.
+        window: The window of the region of interest in the landscape grid.
+        row: The row indices of the sinks in the window.
+        col: The column indices of the sinks in the window.
+        distance: The distances of the sinks to the field edge.
+        wind_direction: The wind direction in degrees, binned into the eight principal directions.
+        method: Either `vector`, which intersects every trajectory with the vegetation geometries, or `raster`, which
+            looks the trajectories up in the vegetation coverage along the grid lines of the wind direction.
+
+    Returns:
+        The vegetation width of each trajectory in meters.
+    """
+    if method == "raster":
+        dx, dy = xdrift.DOWNWIND_VECTORS[wind_direction]
+        upwind_step = (dy, -dx)
+        return landscape.vegetation_coverage(upwind_step).covered(
+            row + window[0].start, col + window[1].start, upwind_step, distance)
+    grid = landscape.grid.subgrid(window)
+    x = grid.x_min + col + .5
+    y = grid.y_max - row - .5
+    direction = wind_direction / 180
+    return geometry.segment_lengths_within(
+        x,
+        y,
+        x + xdrift.sinpi(direction) * distance,
+        y + xdrift.sinpi(.5 - direction) * distance,
+        [landscape.geometries[i] for i in landscape.filtering_index.query(grid.bounds)]
+    )
+
+
+def source_table(landscape, area, wind_direction, instrumentation=None):
+    """
+    Determines the sinks around an applied area, their exposure paths and their downwind distances to the field, which
+    are the parts of the simulation of an application that neither depend on the application rate nor on random
+    numbers.
+
+    Args:
+        landscape: The Landscape.
+        area: The applied area as returned by `geometry.read_wkb`.
+        wind_direction: The wind direction in degrees, binned into the eight principal directions.
+        instrumentation: The Instrumentation that measures the `roi setup`, `rasterization` and `distance
+            computation` stages.
+
+    Returns:
+        `None` if there are no sinks, otherwise a tuple of the window of the region of interest in the landscape grid,
+        the row and column indices of the sinks in the window, their distances to the field, the identifiers of the
+        exposure paths and the index of the exposure path of every sink. The arrays are read-only.
+    """
+    if instrumentation is None:
+        instrumentation = profiling.Instrumentation()
+    with instrumentation.stage("roi setup") as counts:
+        area_bounds = geometry.bounding_box(area)
+        if np.isnan(area_bounds[0]):
+            return None
+        window = landscape.roi(area_bounds)
+        grid = landscape.grid.subgrid(window)
+        counts["cells"] = grid.rows * grid.cols
+        if grid.rows == 0 or grid.cols == 0:
+            return None
+        habitats = landscape.habitat_mask[window]
+        if not habitats.any():
+            return None
+    with instrumentation.stage("rasterization"):
+        field = geometry.rasterize_mask([area], grid)
+        cells = habitats | field
+        row, col = np.nonzero(cells)
+    if len(row) == 0:
+        return None
+    with instrumentation.stage("distance computation", cells=len(row)):
+        x = grid.x_min + col + .5
+        y = grid.y_max - row - .5
+        distance = xdrift.mindwdist(field, wind_direction, cells)[row, col]
+
+        # exposure paths, which also identify the random streams of their draws
+        bands, ep_index = np.unique(
+            xdrift.bands(x, y, wind_direction, EP_WIDTH, "meteorological"), return_inverse=True)
+    for array in (row, col, distance, bands, ep_index):
+        array.setflags(write=False)
+    return window, row, col, distance, bands, ep_index
+
+
+def simulate_application(
+        landscape,
+        parameters,
+        area,
+        rate,
+        drift_reduction,
+        wind_direction,
+        random_streams,
+        instrumentation=None
+):
+    """
+    Simulates the spray-drift deposition of a single application.
+
+    Args:
+        landscape: The Landscape.
+        parameters: The Parameters.
+        area: The applied area in Well-Known-Binary representation.
+        rate: The application rate.
+        drift_reduction: The drift reduction by technology.
+        wind_direction: The wind direction in degrees, binned into the eight principal directions.
+        random_streams: The RandomStreams of the application.
+        instrumentation: The Instrumentation that measures the stages of the application.
+
+    Returns:
+        A tuple of the row indices and column indices of exposed cells in the landscape grid and their exposure.
+    """
+    return simulate_realizations(
+        landscape, parameters, area, rate, drift_reduction, wind_direction, [random_streams], instrumentation)[0]
+
+
+def simulate_realizations(
+        landscape,
+        parameters,
+        area,
+        rate,
+        drift_reduction,
+        wind_direction,
+        random_streams,
+        instrumentation=None
+):
+    """
+    Simulates several realizations of the spray-drift deposition of a single application in the same wind direction.
+    The source table is determined once and only the random parts of the simulation are sampled per realization,
+    while the deposition curves and drift-filtering are evaluated for all realizations at once.
+
+    Args:
+        landscape: The Landscape.
+        parameters: The Parameters.
+        area: The applied area in Well-Known-Binary representation.
+        rate: The application rate.
+        drift_reduction: The drift reduction by technology.
+        wind_direction: The wind direction in degrees, binned into the eight principal directions.
+        random_streams: A list of the RandomStreams of the application per realization.
+        instrumentation: The Instrumentation that measures the stages of the application.
+
+    Returns:
+        A list with a tuple of the row indices and column indices of exposed cells in the landscape grid and their
+        exposure per realization.
+    """
+    return simulate_batch(
+        landscape, parameters, [(area, rate, drift_reduction, wind_direction, random_streams)], instrumentation)[0]
+
+
+def _sample(parameters, table, random_streams):
+    """
+    Samples the random parts of the simulation of an application for all its realizations and applies the distance
+    variability to the distances of its source table.
+
+    Args:
+        parameters: The Parameters.
+        table: The source table of the application.
+        random_streams: A list of the RandomStreams of the application per realization.
+
+    Returns:
+        A tuple of the distances, the quantiles of the `XSprayDrift` model or `None` and the simple drift-filtering
+        factors or `None`, each of shape (realizations, sinks).
+    """
+    _, _, _, distance, bands, ep_index = table
+    distance = np.tile(distance, (len(random_streams), 1))
+
+    # distance variability at the field and exposure path scale
+    field_offset = np.concatenate([x.normal(
+        streams.FIELD_DISTANCE_OFFSET, sd=parameters.field_distance_sd) for x in random_streams])
+    ep_offset = np.stack([x.normal(
+        streams.EP_DISTANCE_OFFSET, bands, parameters.ep_distance_sd) for x in random_streams]) + field_offset[
+        :, np.newaxis]
+    positive = distance > 0
+    adjusted = distance[positive] + ep_offset[:, ep_index][positive]
+    distance[positive] = np.where(adjusted > parameters.minimum_distance, adjusted, parameters.minimum_distance)
+    q = None
+    if parameters.model == "XSprayDrift":
+        q = np.stack([x.uniform(streams.XSPRAYDRIFT_QUANTILE, bands) for x in random_streams])[:, ep_index]
+    filtered = None
+    if parameters.simple_drift_filtering:
+        filtered = np.stack([x.choice(
+            streams.SIMPLE_DRIFT_FILTERING,
+            bands,
+            xdrift.SIMPLE_DRIFT_FILTERING_FRACTIONS,
+            xdrift.SIMPLE_DRIFT_FILTERING_PROBABILITIES
+        ) for x in random_streams])[:, ep_index]
+    return distance, q, filtered
+
+
+def _deposition_fraction(parameters, distance, q):
+    """
+    Evaluates the deposition curve of the spray-drift model.
+
+    Args:
+        parameters: The Parameters.
+        distance: The distances of the sinks.
+        q: The quantiles of the `XSprayDrift` model per sink, or `None` for the other models.
+
+    Returns:
+        The deposition fraction of every sink.
+    """
+    if parameters.model == "90thRautmann":
+        return xdrift.rautmann90(distance, parameters.crop, parameters.source_exposure)
+    if parameters.model == "AgDrift":
+        return xdrift.agdrift_g(
+            distance,
+            parameters.droplet_size,
+            round(parameters.ag_drift_quantile, 5),
+            parameters.boom_height,
+            parameters.source_exposure
+        )
+    # tables only apply to the XSprayDrift model, the closed forms of the other models are faster
+    curves = lookup if parameters.drift_curves == "table" else xdrift
+    return curves.xspraydrift(distance, q, parameters.source_exposure, parameters.crop)
+
+
+def simulate_batch(landscape, parameters, applications, instrumentation=None):
+    """
+    Simulates the spray-drift deposition of a batch of applications and their realizations. Source tables are
+    determined per applied area and wind direction and shared by applications and realizations, random numbers are
+    drawn per application and realization, but the deposition curves of all sinks of the batch are evaluated in one
+    vectorized pass. Results are identical to simulating the applications one by one.
+
+    Args:
+        landscape: The Landscape.
+        parameters: The Parameters.
+        applications: A list of tuples of the applied area in Well-Known-Binary representation, the application
+            rate, the drift reduction by technology, the wind direction binned into the eight principal directions
+            and a list of the RandomStreams of the application per realization.
+        instrumentation: The Instrumentation that measures the stages of the applications.
+
+    Returns:
+        A list per application with a tuple of the row indices and column indices of exposed cells in the landscape
+        grid and their exposure per realization.
+    """
+    if instrumentation is None:
+        instrumentation = profiling.Instrumentation()
+    tables = [landscape.source_table(area, wind_direction, instrumentation) for area, _, _, wind_direction, _ in
+              applications]
+    sampled = {}
+    with instrumentation.stage("model evaluation") as counts:
+        for i, (table, application) in enumerate(zip(tables, applications)):
+            if table is not None:
+                sampled[i] = _sample(parameters, table, application[4])
+        counts["cells"] = sum(x[0].size for x in sampled.values())
+        counts["batches"] = 1
+        # the deposition curves of all applications and realizations of the batch are evaluated at once
+        fraction = _deposition_fraction(
+            parameters,
+            np.concatenate([x[0].ravel() for x in sampled.values()] + [np.empty(0)]),
+            None if parameters.model != "XSprayDrift" else np.concatenate(
+                [x[1].ravel() for x in sampled.values()] + [np.empty(0)])
+        )
+        bounds = dict(zip(sampled, np.cumsum([0] + [x[0].size for x in sampled.values()])))
+    # the stages of the applications of the batch are measured in total, not per application
+    evaluation_duration = filtering_duration = 0.
+    trajectories = 0
+    results = []
+    for i, (table, (_, rate, drift_reduction, wind_direction, random_streams)) in enumerate(zip(tables, applications)):
+        if table is None:
+            results.append(
+                [(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32))] * len(random_streams))
+            continue
+        window, row, col, _, _, _ = table
+        distance, _, filtered = sampled[i]
+        started = time.perf_counter()
+        application_fraction = np.reshape(fraction[bounds[i]:bounds[i] + distance.size], distance.shape)
+        if filtered is not None:
+            application_fraction = application_fraction * (1 - filtered)
+        exposure = application_fraction * rate * (1 - drift_reduction)
+
+        # reporting threshold
+        with np.errstate(invalid="ignore"):
+            reported = exposure >= parameters.reporting_threshold
+        if len(landscape.filtering) > 0:
+            reported &= distance > 0
+        realization, index = np.nonzero(reported)
+        sink_row, sink_col, distance, exposure = row[index], col[index], distance[reported], exposure[reported]
+        evaluation_duration += time.perf_counter() - started
+
+        # drift filtering by vegetation intersected by the trajectory between sink and source
+        if len(landscape.filtering) > 0 and len(sink_row) > 0:
+            started = time.perf_counter()
+            vegetation_width = vegetation_widths(
+                landscape, window, sink_row, sink_col, distance, wind_direction, parameters.filtering_method)
+            # trajectories that cross no vegetation are never filtered
+            exposure = np.where(
+                (vegetation_width > 0) & (vegetation_width >= parameters.filtering_min_width),
+                exposure * (1 - parameters.filtering_fraction),
+                exposure
+            )
+            filtering_duration += time.perf_counter() - started
+            trajectories += len(sink_row)
+        realization_bounds = np.searchsorted(realization, np.arange(len(random_streams) + 1))
+        results.append([(
+            sink_row[start:stop] + window[0].start,
+            sink_col[start:stop] + window[1].start,
+            exposure[start:stop].astype(np.float32)
+        ) for start, stop in zip(realization_bounds[:-1], realization_bounds[1:])])
+    instrumentation.add("model evaluation", evaluation_duration, 0, instrumentation.peak_memory())
+    if trajectories > 0:
+        instrumentation.add(
+            "filtering", filtering_duration, 1, instrumentation.peak_memory(), trajectories=trajectories)
+    return results
+
+
+def wind_sectors(wind_directions, identities, random_seeds):
+    """
+    Bins the wind directions of all applications into the eight principal directions per realization. Random wind
+    directions are sampled for all applications of a realization at once.
+
+    Args:
+        wind_directions: The wind direction in degrees per application. Negative values and the
+            `RANDOM_WIND_DIRECTION` are replaced by randomly sampled wind directions.
+        identities: The identities of the applications as returned by `streams.application_identities`.
+        random_seeds: The random seeds of the realizations.
+
+    Returns:
+        An array of shape (realizations, applications) with the wind directions rounded to multiples of 45 degrees.
+    """
+    wind_directions = np.asarray(wind_directions, np.float64)
+    random = np.flatnonzero((wind_directions < 0) | (wind_directions == RANDOM_WIND_DIRECTION))
+    sectors = np.empty((len(random_seeds), len(wind_directions)), np.uint16)
+    for realization, random_seed in enumerate(random_seeds):
+        sampled = wind_directions.copy()
+        sampled[random] = np.floor(streams.application_uniform(
+            random_seed, identities[random], streams.WIND_DIRECTION) * 360)
+        sectors[realization] = xdrift.wind_sector(sampled)
+    return sectors
+
+
+def batches(days, sectors, applications, batch_size, window):
+    """
+    Groups a series of applications into batches of applications of the same day and the same wind sector in every
+    realization. Applications are grouped regardless of their order within windows of consecutive applications of the
+    schedule, so that only the results of a window have to be held back to yield them in the order of the
+    applications. The Parameters apply to all applications and do not split batches.
+
+    Args:
+        days: The zero-based simulation day of each application.
+        sectors: The wind sectors per realization and application as returned by `wind_sectors`.
+        applications: The indices of the applications in the order in which they are simulated.
+        batch_size: The largest number of applications per batch.
+        window: The number of consecutive applications within which applications are grouped.
+
+    Returns:
+        A list of lists of application indices, ordered by the first application of each batch.
+    """
+    applications = list(applications)
+    result = []
+    for start in range(0, len(applications), window):
+        groups = {}
+        for i in applications[start:start + window]:
+            key = (days[i], sectors[:, i].tobytes())
+            if key not in groups or len(groups[key]) >= batch_size:
+                groups[key] = []
+                result.append(groups[key])
+            groups[key].append(i)
+    return result
+
+
+def _simulate_indexed_batch(context, batch):
+    """
+    Simulates the realizations of a batch of applications of given indices using their own random streams.
+    Realizations of an application that share a wind sector are simulated together and the deposition of all
+    applications of the batch is evaluated in one pass.
+
+    Args:
+        context: A tuple of the Landscape, the Parameters, the applied areas, the rates, the drift reductions, the
+            wind sectors per realization and application as returned by `wind_sectors`, the identities of the
+            applications, the random seeds of the realizations and whether memory is profiled.
+        batch: The indices of the applications.
+
+    Returns:
+        A tuple of a list with the results per realization of every application of the batch, each a tuple of the
+        row indices and column indices of exposed cells in the landscape grid and their exposure, and the
+        Instrumentation of the batch.
+    """
+    landscape, parameters, areas, rates, drift_reductions, sectors, identities, random_seeds, memory = context
+    instrumentation = profiling.Instrumentation(memory)
+    jobs = []
+    for application in batch:
+        random_streams = [streams.RandomStreams(x, identities[application]) for x in random_seeds]
+        for sector in np.unique(sectors[:, application]):
+            realizations = np.flatnonzero(sectors[:, application] == sector)
+            jobs.append((application, realizations, (
+                areas[application],
+                rates[application],
+                drift_reductions[application],
+                int(sector),
+                [random_streams[i] for i in realizations]
+            )))
+    job_results = simulate_batch(landscape, parameters, [x[2] for x in jobs], instrumentation)
+    results = {x: [None] * len(random_seeds) for x in batch}
+    for (application, realizations, _), realization_results in zip(jobs, job_results):
+        for i, result in zip(realizations, realization_results):
+            results[application][i] = result
+    return [results[x] for x in batch], instrumentation
+
+
+# The simulation context of a worker process
+_worker_context = None
+
+
+def _initialize_worker(context):
+    """
+    Initializes a worker process by storing the simulation context that is shared by all its applications.
+
+    Args:
+        context: The simulation context.
+
+    Returns:
+        Nothing.
+    """
+    global _worker_context
+    _worker_context = context
+
+
+def _simulate_in_worker(batch):
+    """
+    Simulates a batch of applications within a worker process.
+
+    Args:
+        batch: The indices of the applications.
+
+    Returns:
+        A tuple of the results per application and realization and the Instrumentation of the batch.
+    """
+    return _simulate_indexed_batch(_worker_context, batch)
+
+
+def _simulate(context, applications, workers, instrumentation):
+    """
+    Simulates a series of batches of applications in the current process or in worker processes.
+
+    Args:
+        context: The simulation context.
+        applications: The batches of indices of the applications to simulate, as returned by `batches`.
+        workers: The number of worker processes. A value of 1 simulates all applications in the current process.
+        instrumentation: The Instrumentation into which the stages of all applications are merged.
+
+    Returns:
+        A generator of tuples of the application index and its results per realization, in the order of the
+        applications.
+    """
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_initialize_worker, initargs=(context,)) as \
+                executor:
+            results = executor.map(
+                _simulate_in_worker, applications, chunksize=max(len(applications) // (workers * 4), 1))
+            for batch, (batch_results, batch_instrumentation) in zip(applications, results):
+                if instrumentation is not None:
+                    instrumentation.merge(batch_instrumentation)
+                yield from zip(batch, batch_results)
+    else:
+        for batch in applications:
+            batch_results, batch_instrumentation = _simulate_indexed_batch(context, batch)
+            if instrumentation is not None:
+                instrumentation.merge(batch_instrumentation)
+            yield from zip(batch, batch_results)
+
+
+def simulate(
+        landscape,
+        parameters,
+        areas,
+        days,
+        rates,
+        drift_reductions,
+        wind_directions,
+        random_seed=None,
+        applications=None,
+        workers=1,
+        instrumentation=None
+):
+    """
+    Simulates the spray-drift deposition of a series of applications. Random numbers are derived from the random
+    seed, the identity of the application and the exposure path, so results are identical regardless of the number of
+    workers and the order in which applications are simulated. See `streams.application_identities`.
+
+    Args:
+        landscape: The Landscape.
+        parameters: The Parameters.
+        areas: The applied areas in Well-Known-Binary representation.
+        days: The zero-based simulation day of each application.
+        rates: The application rates.
+        drift_reductions: The drift reductions by technology.
+        wind_directions: The wind direction in degrees per application. Negative values and the
+            `RANDOM_WIND_DIRECTION` are replaced by randomly sampled wind directions.
+        random_seed: The random seed from which the random streams of applications are derived. If `None`, a fresh
+            random seed is used.
+        applications: The indices of the applications to simulate. If `None`, all applications are simulated.
+        workers: The number of worker processes. A value of 1 simulates all applications in the current process.
+        instrumentation: The Instrumentation into which the stages of all applications are merged.
+
+    Returns:
+        A generator of tuples of the application index, the simulation day and the row indices, column indices and
+        exposure of exposed cells, in the order of the applications.
+    """
+    for i, _, day, row, col, exposure in simulate_ensemble(
+            landscape,
+            parameters,
+            areas,
+            days,
+            rates,
+            drift_reductions,
+            wind_directions,
+            random_seed,
+            applications,
+            workers,
+            instrumentation
+    ):
+        yield i, day, row, col, exposure
+
+
+def simulate_ensemble(
+        landscape,
+        parameters,
+        areas,
+        days,
+        rates,
+        drift_reductions,
+        wind_directions,
+        random_seed=None,
+        applications=None,
+        workers=1,
+        instrumentation=None,
+        realizations=1
+):
+    """
+    Simulates several realizations of the spray-drift deposition of a series of applications. Every realization has
+    its own random seed derived from the random seed of the ensemble, the first realization uses the random seed
+    itself. The landscape and the source tables of applications are shared by all realizations, only random numbers
+    are drawn per realization. Applications of the same day and wind sectors are simulated in batches whose deposition
+    is evaluated at once. See `batches`.
+
+    Args:
+        landscape: The Landscape.
+        parameters: The Parameters.
+        areas: The applied areas in Well-Known-Binary representation.
+        days: The zero-based simulation day of each application.
+        rates: The application rates.
+        drift_reductions: The drift reductions by technology.
+        wind_directions: The wind direction in degrees per application. Negative values and the
+            `RANDOM_WIND_DIRECTION` are replaced by randomly sampled wind directions per realization.
+        random_seed: The random seed of the ensemble. If `None`, a fresh random seed is used.
+        applications: The indices of the applications to simulate. If `None`, all applications are simulated.
+        workers: The number of worker processes. A value of 1 simulates all applications in the current process.
+        instrumentation: The Instrumentation into which the stages of all applications are merged.
+        realizations: The number of realizations.
+
+    Returns:
+        A generator of tuples of the application index, the realization, the simulation day and the row indices,
+        column indices and exposure of exposed cells, in the order of the applications and realizations.
+    """
+    if random_seed is None:
+        random_seed = streams.random_seed()
+    if applications is None:
+        applications = range(len(areas))
+    random_seeds = tuple(streams.realization_seed(random_seed, x) for x in range(realizations))
+    identities = streams.application_identities(areas, days, rates, drift_reductions)
+    sectors = wind_sectors(wind_directions, identities, random_seeds)
+    context = (
+        landscape,
+        parameters,
+        areas,
+        rates,
+        drift_reductions,
+        sectors,
+        identities,
+        random_seeds,
+        instrumentation is not None and instrumentation.memory
+    )
+    simulated = _simulate(
+        context, batches(days, sectors, applications, BATCH_SIZE, BATCH_WINDOW), workers, instrumentation)
+    # batches are not consecutive, so results of later applications are held back until it is their turn
+    pending = {}
+    for i in applications:
+        while i not in pending:
+            application, results = next(simulated)
+            pending[application] = results
+        for realization, (row, col, exposure) in enumerate(pending.pop(i)):
+            yield i, realization, days[i], row, col, exposure
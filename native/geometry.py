@@ -0,0 +1,556 @@
+"""
+Geometric operations of the native XSprayDrift engine: decoding of Well-Known-Binary polygons and their rasterization
+onto 1-square meter grids.
+"""
+import math
+import struct
+import numpy as np
+
+
+class Grid:
+    """
+    A raster of 1-square meter cells. Rows run from North to South and columns from West to East. Cell values are
+    associated with the cell centers.
+    """
+    def __init__(self, x_min, y_max, rows, cols):
+        """
+        Initializes a Grid.
+
+        Args:
+            x_min: The x-coordinate of the western edge of the grid.
+            y_max: The y-coordinate of the northern edge of the grid.
+            rows: The number of rows.
+            cols: The number of columns.
+        """
+        self.x_min = x_min
+        self.y_max = y_max
+        self.rows = max(int(rows), 0)
+        self.cols = max(int(cols), 0)
+
+    @property
+    def shape(self):
+        """
+        The shape of the grid.
+
+        Returns:
+            A tuple of the number of rows and columns.
+        """
+        return self.rows, self.cols
+
+    @property
+    def bounds(self):
+        """
+        The bounding box of the grid.
+
+        Returns:
+            A tuple of x-min, y-min, x-max and y-max.
+        """
+        return self.x_min, self.y_max - self.rows, self.x_min + self.cols, self.y_max
+
+    @classmethod
+    def aligned(cls, origin, bounds):
+        """
+        Creates a grid whose cell edges are aligned to an origin and that covers a bounding box.
+
+        Args:
+            origin: The x- and y-coordinate of a cell corner.
+            bounds: The bounding box (x-min, y-min, x-max, y-max) to cover.
+
+        Returns:
+            A Grid.
+        """
+        x_min = origin[0] + math.floor(bounds[0] - origin[0])
+        y_min = origin[1] + math.floor(bounds[1] - origin[1])
+        x_max = origin[0] + math.ceil(bounds[2] - origin[0])
+        y_max = origin[1] + math.ceil(bounds[3] - origin[1])
+        return cls(x_min, y_max, y_max - y_min, x_max - x_min)
+
+    def window(self, bounds):
+        """
+        Gets the window of the grid that covers a bounding box.
+
+        Args:
+            bounds: The bounding box (x-min, y-min, x-max, y-max).
+
+        Returns:
+            A tuple of a row slice and a column slice, clipped to the grid.
+        """
+        col_start = min(max(math.floor(bounds[0] - self.x_min), 0), self.cols)
+        col_stop = min(max(math.ceil(bounds[2] - self.x_min), col_start), self.cols)
+        row_start = min(max(math.floor(self.y_max - bounds[3]), 0), self.rows)
+        row_stop = min(max(math.ceil(self.y_max - bounds[1]), row_start), self.rows)
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def subgrid(self, window):
+        """
+        Creates the grid of a window.
+
+        Args:
+            window: A tuple of a row slice and a column slice.
+
+        Returns:
+            A Grid.
+        """
+        rows, cols = window
+        return Grid(self.x_min + cols.start, self.y_max - rows.start, rows.stop - rows.start, cols.stop - cols.start)
+
+
+class BoundsIndex:
+    """
+    A spatial index of bounding boxes. Boxes are registered in all cells of a regular bucket grid that they overlap,
+    so that a query only needs to consider the boxes of the cells it overlaps instead of all boxes.
+    """
+    def __init__(self, bounds, ids=None, cell_size=None):
+        """
+        Initializes a BoundsIndex.
+
+        Args:
+            bounds: The bounding boxes as array of shape (n, 4) with x-min, y-min, x-max and y-max. Boxes with NaN
+                coordinates are not indexed.
+            ids: The identifiers of the boxes that are returned by queries. Defaults to the positions of the boxes.
+            cell_size: The edge length of the bucket cells. Defaults to a size that results in about one box per
+                cell.
+        """
+        bounds = np.asarray(bounds, np.float64).reshape((-1, 4))
+        ids = np.arange(len(bounds)) if ids is None else np.asarray(ids)
+        valid = ~np.isnan(bounds).any(1)
+        self._bounds = bounds[valid]
+        self._ids = ids[valid]
+        if len(self._bounds) == 0:
+            self._origin = (0., 0.)
+            self._cell_size = 1.
+            self._shape = (0, 0)
+            self._offsets = np.zeros(1, np.int64)
+            self._members = np.empty(0, np.int64)
+            return
+        self._origin = (self._bounds[:, 0].min(), self._bounds[:, 1].min())
+        width = self._bounds[:, 2].max() - self._origin[0]
+        height = self._bounds[:, 3].max() - self._origin[1]
+        if cell_size is None:
+            cell_size = math.sqrt(width * height / len(self._bounds))
+        self._cell_size = max(cell_size, 1.)
+        self._shape = (int(width // self._cell_size) + 1, int(height // self._cell_size) + 1)
+        first = self._cells(self._bounds[:, :2])
+        last = self._cells(self._bounds[:, 2:])
+        counts = (last[:, 0] - first[:, 0] + 1) * (last[:, 1] - first[:, 1] + 1)
+        member = np.repeat(np.arange(len(counts)), counts)
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        span = last[member, 1] - first[member, 1] + 1
+        cell_x = first[member, 0] + position // span
+        cell_y = first[member, 1] + position % span
+        cell = cell_x * self._shape[1] + cell_y
+        order = np.argsort(cell, kind="stable")
+        self._members = member[order]
+        self._offsets = np.searchsorted(cell[order], np.arange(self._shape[0] * self._shape[1] + 1))
+
+    def _cells(self, points):
+        """
+        Gets the bucket cells of points, clipped to the index.
+
+        Args:
+            points: An array of shape (n, 2) of x- and y-coordinates.
+
+        Returns:
+            An integer array of shape (n, 2) of the cell column and row.
+        """
+        cells = np.floor((points - np.array(self._origin)) / self._cell_size).astype(np.int64)
+        return np.clip(cells, 0, np.array(self._shape) - 1)
+
+    def query(self, bounds):
+        """
+        Gets the boxes that intersect a bounding box.
+
+        Args:
+            bounds: The bounding box (x-min, y-min, x-max, y-max).
+
+        Returns:
+            The sorted identifiers of the intersecting boxes.
+        """
+        if len(self._members) == 0:
+            return self._ids[:0]
+        first, last = self._cells(np.array([bounds[:2], bounds[2:]], np.float64))
+        candidates = np.unique(np.concatenate([
+            self._members[self._offsets[x * self._shape[1] + first[1]]:self._offsets[x * self._shape[1] + last[1] + 1]]
+            for x in range(first[0], last[0] + 1)
+        ]))
+        boxes = self._bounds[candidates]
+        return self._ids[candidates[
+            (boxes[:, 0] <= bounds[2]) & (boxes[:, 2] >= bounds[0]) &
+            (boxes[:, 1] <= bounds[3]) & (boxes[:, 3] >= bounds[1])
+        ]]
+
+
+def read_wkb(wkb):
+    """
+    Decodes a polygon or multi-polygon from its Well-Known-Binary representation. Z- and M-coordinates are dropped.
+
+    Args:
+        wkb: The Well-Known-Binary representation.
+
+    Returns:
+        A list of polygons where each polygon is a list of rings and each ring a float array of shape (n, 2).
+    """
+    polygons = []
+    _read_geometry(memoryview(bytes(wkb)), 0, polygons)
+    return polygons
+
+
+def _read_geometry(buffer, offset, polygons):
+    """
+    Decodes a single Well-Known-Binary geometry.
+
+    Args:
+        buffer: The binary data.
+        offset: The position of the geometry in the binary data.
+        polygons: The list to which decoded polygons are appended.
+
+    Returns:
+        The position after the geometry.
+    """
+    byte_order = "<" if buffer[offset] == 1 else ">"
+    geometry_type = struct.unpack_from(f"{byte_order}I", buffer, offset + 1)[0]
+    offset += 5
+    dimensions = 2
+    if geometry_type & 0x80000000:
+        dimensions += 1
+    if geometry_type & 0x40000000:
+        dimensions += 1
+    if geometry_type & 0x20000000:
+        offset += 4
+    geometry_type &= 0x0fffffff
+    dimensions += (geometry_type // 1000 in (1, 2)) + 2 * (geometry_type // 1000 == 3)
+    geometry_type %= 1000
+    if geometry_type == 3:
+        ring_count = struct.unpack_from(f"{byte_order}I", buffer, offset)[0]
+        offset += 4
+        rings = []
+        for _ in range(ring_count):
+            point_count = struct.unpack_from(f"{byte_order}I", buffer, offset)[0]
+            offset += 4
+            coordinates = np.frombuffer(
+                buffer, np.dtype(f"{byte_order}f8"), point_count * dimensions, offset).reshape((-1, dimensions))
+            offset += coordinates.nbytes
+            rings.append(coordinates[:, :2].astype(np.float64))
+        polygons.append(rings)
+    elif geometry_type in (6, 7):
+        part_count = struct.unpack_from(f"{byte_order}I", buffer, offset)[0]
+        offset += 4
+        for _ in range(part_count):
+            offset = _read_geometry(buffer, offset, polygons)
+    else:
+        raise ValueError(f"Unsupported geometry type: {geometry_type}")
+    return offset
+
+
+def bounding_box(polygons):
+    """
+    Calculates the bounding box of polygons.
+
+    Args:
+        polygons: The polygons as returned by `read_wkb`.
+
+    Returns:
+        A tuple of x-min, y-min, x-max and y-max. An empty geometry results in NaN values.
+    """
+    if len(polygons) == 0:
+        return np.nan, np.nan, np.nan, np.nan
+    coordinates = np.concatenate([polygon[0] for polygon in polygons])
+    return (coordinates[:, 0].min(), coordinates[:, 1].min(), coordinates[:, 0].max(), coordinates[:, 1].max())
+
+
+def edges(geometries):
+    """
+    Collects the edges of all rings of a list of geometries.
+
+    Args:
+        geometries: A list of geometries as returned by `read_wkb`.
+
+    Returns:
+        A tuple of the edge start points, the edge end points (both of shape (n, 2)) and the index of the geometry
+        each edge belongs to.
+    """
+    starts = []
+    ends = []
+    index = []
+    for i, polygons in enumerate(geometries):
+        for polygon in polygons:
+            for ring in polygon:
+                if len(ring) > 1:
+                    starts.append(ring[:-1])
+                    ends.append(ring[1:])
+                    index.append(np.full(len(ring) - 1, i, np.int64))
+    if len(starts) == 0:
+        return np.empty((0, 2)), np.empty((0, 2)), np.empty(0, np.int64)
+    return np.concatenate(starts), np.concatenate(ends), np.concatenate(index)
+
+
+def rasterize(geometries, grid):
+    """
+    Rasterizes geometries onto a grid. A cell belongs to a geometry if its center is located within the geometry,
+    which is the default behavior of GDAL and terra.
+
+    Args:
+        geometries: A list of geometries as returned by `read_wkb`.
+        grid: The Grid to rasterize onto.
+
+    Returns:
+        A tuple of row indices, column indices and geometry indices of all covered cells.
+    """
+    starts, ends, index = edges(geometries)
+    y_low = np.minimum(starts[:, 1], ends[:, 1])
+    y_high = np.maximum(starts[:, 1], ends[:, 1])
+    # a row is crossed if y_low <= row center < y_high
+    first_row = np.maximum(np.floor(grid.y_max - y_high - .5) + 1, 0).astype(np.int64)
+    last_row = np.minimum(np.floor(grid.y_max - y_low - .5), grid.rows - 1).astype(np.int64)
+    count = np.maximum(last_row - first_row + 1, 0)
+    edge = np.repeat(np.arange(len(count)), count)
+    row = first_row[edge] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    y = grid.y_max - row - .5
+    x = starts[edge, 0] + (y - starts[edge, 1]) * (ends[edge, 0] - starts[edge, 0]) / (
+            ends[edge, 1] - starts[edge, 1])
+    geometry = index[edge]
+    order = np.lexsort((x, row, geometry))
+    x = x[order].reshape((-1, 2))
+    row = row[order][::2]
+    geometry = geometry[order][::2]
+    first_col = np.clip(np.ceil(x[:, 0] - grid.x_min - .5), 0, grid.cols).astype(np.int64)
+    last_col = np.clip(np.ceil(x[:, 1] - grid.x_min - .5), 0, grid.cols).astype(np.int64)
+    count = np.maximum(last_col - first_col, 0)
+    span = np.repeat(np.arange(len(count)), count)
+    col = first_col[span] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    return row[span], col, geometry[span]
+
+
+def rasterize_mask(geometries, grid):
+    """
+    Rasterizes geometries onto a grid as a boolean mask.
+
+    Args:
+        geometries: A list of geometries as returned by `read_wkb`.
+        grid: The Grid to rasterize onto.
+
+    Returns:
+        A boolean array of the shape of the grid.
+    """
+    mask = np.zeros(grid.shape, bool)
+    row, col, _ = rasterize(geometries, grid)
+    mask[row, col] = True
+    return mask
+
+
+def segment_lengths_within(x1, y1, x2, y2, geometries, block_size=1 << 22):
+    """
+    Calculates the length of line segments that is covered by geometries.
+
+    Args:
+        x1: The x-coordinates of the segment starts.
+        y1: The y-coordinates of the segment starts.
+        x2: The x-coordinates of the segment ends.
+        y2: The y-coordinates of the segment ends.
+        geometries: A list of geometries as returned by `read_wkb`.
+        block_size: The maximum number of segment-edge pairs that are evaluated at once.
+
+    Returns:
+        The summed length of each segment that lies within the geometries.
+    """
+    result = np.zeros(len(x1))
+    for polygons in geometries:
+        starts, ends, _ = edges([polygons])
+        if len(starts) == 0:
+            continue
+        bounds = bounding_box(polygons)
+        candidates = np.flatnonzero(
+            (np.maximum(x1, x2) >= bounds[0]) & (np.minimum(x1, x2) <= bounds[2]) &
+            (np.maximum(y1, y2) >= bounds[1]) & (np.minimum(y1, y2) <= bounds[3]))
+        step = max(block_size // len(starts), 1)
+        for block in range(0, len(candidates), step):
+            selection = candidates[block:block + step]
+            result[selection] += _segment_lengths_within_polygons(
+                x1[selection], y1[selection], x2[selection], y2[selection], starts, ends)
+    return result
+
+
+def _segment_lengths_within_polygons(x1, y1, x2, y2, starts, ends):
+    """
+    Calculates the length of line segments that is covered by the rings of a single geometry.
+
+    Args:
+        x1: The x-coordinates of the segment starts.
+        y1: The y-coordinates of the segment starts.
+        x2: The x-coordinates of the segment ends.
+        y2: The y-coordinates of the segment ends.
+        starts: The start points of the ring edges.
+        ends: The end points of the ring edges.
+
+    Returns:
+        The length of each segment that lies within the geometry.
+    """
+    sx, sy = x1[:, None], y1[:, None]
+    dx, dy = x2[:, None] - sx, y2[:, None] - sy
+    ex, ey = (ends - starts)[:, 0], (ends - starts)[:, 1]
+    denominator = dx * ey - dy * ex
+    # an edge crosses the line of the segment if its end points lie on different sides, where points on the line
+    # count as lying on the negative side, so that vertices on the line are counted consistently
+    side_start = dx * (starts[:, 1] - sy) - dy * (starts[:, 0] - sx)
+    side_end = dx * (ends[:, 1] - sy) - dy * (ends[:, 0] - sx)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # the position of the crossing along the segment
+        t = ((starts[:, 0] - sx) * ey - (starts[:, 1] - sy) * ex) / denominator
+    crossed = ((side_start > 0) != (side_end > 0)) & (t > 0)
+    # the parity of crossings of the ray beyond the segment start tells whether the start is inside
+    inside_at_start = (crossed.sum(1) % 2) == 1
+    t = np.where(crossed & (t < 1), t, 1)
+    t.sort(1)
+    boundaries = np.concatenate((np.zeros((len(x1), 1)), t, np.ones((len(x1), 1))), 1)
+    inside = ((np.arange(boundaries.shape[1] - 1) % 2) == 0)[None, :] == inside_at_start[:, None]
+    return (np.diff(boundaries, axis=1) * inside).sum(1) * np.hypot(dx[:, 0], dy[:, 0])
+
+
+def _line_family(step):
+    """
+    Gets the family of grid lines that run along one of the eight grid directions. Opposite directions share the same
+    family.
+
+    Args:
+        step: The direction as a tuple of a row and a column step, each -1, 0 or 1.
+
+    Returns:
+        The canonical step of the family.
+    """
+    row_step, col_step = step
+    if row_step < 0 or (row_step == 0 and col_step < 0):
+        row_step, col_step = -row_step, -col_step
+    return row_step, col_step
+
+
+def _to_line(family, row, col):
+    """
+    Maps row and column coordinates to the lines of a family. Lines are identified by an integer line index and points
+    along a line by a position that increases by one per step.
+
+    Args:
+        family: The canonical step of the family.
+        row: The row coordinates.
+        col: The column coordinates.
+
+    Returns:
+        A tuple of the line indices and positions.
+    """
+    if family == (1, 0):
+        return col, row
+    if family == (0, 1):
+        return row, col
+    if family == (1, 1):
+        return col - row, row
+    return col + row, row
+
+
+class LineCoverage:
+    """
+    The coverage of geometries along the grid lines of one of the eight grid directions that run through the cell
+    centers of a grid. The geometries are rasterized once into covered intervals per line, of which cumulative sums
+    are kept, so that the covered length of any ray along the lines is obtained by two look-ups. Coverage of
+    overlapping geometries is counted per geometry.
+    """
+    def __init__(self, geometries, grid, step):
+        """
+        Initializes a LineCoverage.
+
+        Args:
+            geometries: A list of geometries as returned by `read_wkb`.
+            grid: The Grid whose cell centers the lines run through.
+            step: The direction as a tuple of a row and a column step, each -1, 0 or 1.
+        """
+        self._canonical = _line_family(step)
+        self._position_range = 2 * (grid.rows + grid.cols + 2)
+        starts, ends, index = edges(geometries)
+        # geometry coordinates in row and column units with cell centers at integers
+        line_start, position_start = _to_line(
+            self._canonical, grid.y_max - starts[:, 1] - .5, starts[:, 0] - grid.x_min - .5)
+        line_end, position_end = _to_line(
+            self._canonical, grid.y_max - ends[:, 1] - .5, ends[:, 0] - grid.x_min - .5)
+        # an edge crosses a line if the lower line coordinate <= line < the higher line coordinate
+        first = np.ceil(np.minimum(line_start, line_end)).astype(np.int64)
+        last = np.ceil(np.maximum(line_start, line_end)).astype(np.int64) - 1
+        count = np.maximum(last - first + 1, 0)
+        edge = np.repeat(np.arange(len(count)), count)
+        line = first[edge] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        position = position_start[edge] + (line - line_start[edge]) * (
+                position_end[edge] - position_start[edge]) / (line_end[edge] - line_start[edge])
+        order = np.lexsort((position, line, index[edge]))
+        position = position[order].reshape((-1, 2))
+        line = line[order][::2]
+        self._interval_starts = self._cumulate(line, position[:, 0])
+        self._interval_ends = self._cumulate(line, position[:, 1])
+
+    def _key(self, line, position):
+        """
+        Combines line indices and positions into sortable keys.
+
+        Args:
+            line: The line indices.
+            position: The positions along the lines.
+
+        Returns:
+            The keys.
+        """
+        return line * (2. * self._position_range) + np.clip(
+            position + self._position_range / 2, 0, 1.5 * self._position_range)
+
+    def _cumulate(self, line, position):
+        """
+        Sorts interval boundaries along their lines and accumulates their positions.
+
+        Args:
+            line: The line indices of the boundaries.
+            position: The positions of the boundaries.
+
+        Returns:
+            A tuple of the sorted keys of the boundaries and the cumulative sums of their positions.
+        """
+        keys = self._key(line, position)
+        order = np.argsort(keys)
+        return keys[order], np.concatenate(([0.], np.cumsum(position[order])))
+
+    def _covered(self, line, position, boundaries):
+        """
+        Sums up the ramps that start at interval boundaries before positions along lines.
+
+        Args:
+            line: The line indices.
+            position: The positions along the lines.
+            boundaries: The sorted keys and cumulative positions of the interval boundaries.
+
+        Returns:
+            The sum of the distances from all preceding boundaries of the line to the positions.
+        """
+        keys, cumulative = boundaries
+        first = np.searchsorted(keys, self._key(line, -np.inf))
+        last = np.searchsorted(keys, self._key(line, position), "right")
+        return position * (last - first) - (cumulative[last] - cumulative[first])
+
+    def covered(self, row, col, step, length):
+        """
+        Calculates the length of rays that is covered by the geometries.
+
+        Args:
+            row: The row indices of the ray origins in the grid.
+            col: The column indices of the ray origins in the grid.
+            step: The direction of the rays as a tuple of a row and a column step, each -1, 0 or 1. It must belong to
+                the family of lines of this LineCoverage.
+            length: The length of the rays in meters.
+
+        Returns:
+            The covered length of each ray in meters.
+        """
+        canonical = _line_family(step)
+        if canonical != self._canonical:
+            raise ValueError(f"Direction {step} does not run along the lines of direction {self._canonical}")
+        step_length = math.hypot(*step)
+        line, position = _to_line(self._canonical, np.asarray(row), np.asarray(col))
+        end = position + (1 if tuple(step) == canonical else -1) * length / step_length
+        coverage = []
+        for p in (position, end):
+            coverage.append(
+                self._covered(line, p, self._interval_starts) - self._covered(line, p, self._interval_ends))
+        return np.abs(coverage[1] - coverage[0]) * step_length
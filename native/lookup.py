@@ -0,0 +1,208 @@
+"""
+Lookup-table evaluation of the deposition curves of the XSprayDrift model of the `xdrift` module. Every
+parameterization is tabulated once per process on a regular grid and evaluated by linear interpolation. The model is
+tabulated per distance class over the logit of the quantile, which keeps the tails of the gamma quantile function
+nearly linear. Tables only apply to the XSprayDrift model, whose gamma quantiles are costly to evaluate; the closed
+forms of the Rautmann and AgDRIFT models in `xdrift` are faster than any table.
+
+While building a table, the interpolation is compared against the reference function at the midpoint of every grid
+cell. Cells where the relative deviation exceeds `TOLERANCE`, e.g., cells that contain a break of a piecewise curve,
+are evaluated with the reference function instead. The maximum relative interpolation error is therefore 1e-4, as
+checked at the cell midpoints, where it is largest for the smooth curves involved. Arguments outside the tabulated
+range are always evaluated with the reference function. See `benchmarks/drift_curves.py` for the measured errors and
+speed-up.
+"""
+import functools
+import numpy as np
+from . import xdrift
+
+
+# The maximum relative interpolation error of tabulated cells
+TOLERANCE = 1e-4
+
+# The number of grid points of a table of the XSprayDrift model, which is costly to evaluate but smooth in the logit
+QUANTILE_SAMPLES = 1024
+
+# The range of quantiles covered by tables of the XSprayDrift model
+QUANTILE_RANGE = (1e-9, 1 - 1e-9)
+
+
+class Table:
+    """
+    A function of one argument tabulated on a regular grid of the argument or its logit.
+    """
+    def __init__(self, function, lower, upper, samples=QUANTILE_SAMPLES, scale="linear", log_values=False):
+        """
+        Initializes a Table.
+
+        Args:
+            function: The reference function. It receives a 1-dimensional array of arguments and returns an array of
+                the same shape.
+            lower: The lowest tabulated argument.
+            upper: The highest tabulated argument.
+            samples: The number of grid points.
+            scale: The scale on which the grid is regular, either `linear` or `logit`.
+            log_values: Specifies whether values are interpolated in their logarithm.
+        """
+        if scale not in ("linear", "logit"):
+            raise ValueError(f"Unknown scale: {scale}")
+        self._function = function
+        self._scale = scale
+        self._log_values = log_values
+        self._lower = self._transform(lower)
+        self._step = (self._transform(upper) - self._lower) / (samples - 1)
+        grid = self._lower + self._step * np.arange(samples)
+        self._values = self._forward(self._evaluate(self._inverse(grid)))
+        reference = self._evaluate(self._inverse(grid[:-1] + self._step / 2))
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            interpolated = self._backward((self._values[:-1] + self._values[1:]) / 2)
+            error = np.abs(interpolated - reference) / np.abs(reference)
+        error[interpolated == reference] = 0
+        self._exact = ~(np.isfinite(self._values[:-1]) & np.isfinite(self._values[1:]) & (error <= TOLERANCE))
+
+    def _transform(self, x):
+        """
+        Transforms arguments into grid coordinates.
+
+        Args:
+            x: The arguments.
+
+        Returns:
+            The grid coordinates.
+        """
+        x = np.asarray(x, np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self._scale == "logit":
+                return np.log(x) - np.log1p(-x)
+            return x
+
+    def _inverse(self, t):
+        """
+        Transforms grid coordinates into arguments.
+
+        Args:
+            t: The grid coordinates.
+
+        Returns:
+            The arguments.
+        """
+        if self._scale == "logit":
+            return 1 / (1 + np.exp(-t))
+        return t
+
+    def _forward(self, values):
+        """
+        Transforms values into the space in which they are interpolated.
+
+        Args:
+            values: The values.
+
+        Returns:
+            The transformed values.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.log(values) if self._log_values else values
+
+    def _backward(self, values):
+        """
+        Transforms interpolated values back.
+
+        Args:
+            values: The transformed values.
+
+        Returns:
+            The values.
+        """
+        return np.exp(values) if self._log_values else values
+
+    def _evaluate(self, x):
+        """
+        Evaluates the reference function.
+
+        Args:
+            x: A 1-dimensional array of arguments.
+
+        Returns:
+            The values as float array.
+        """
+        return np.asarray(self._function(x), np.float64).reshape(x.shape)
+
+    def __call__(self, x):
+        """
+        Evaluates the table.
+
+        Args:
+            x: The arguments.
+
+        Returns:
+            The values at the arguments.
+        """
+        x = np.asarray(x, np.float64)
+        position = (self._transform(x) - self._lower) / self._step
+        with np.errstate(invalid="ignore"):
+            cell = np.where(np.isfinite(position), np.floor(position), -1).astype(np.int64)
+        tabulated = (cell >= 0) & (cell < len(self._exact))
+        tabulated[tabulated] = ~self._exact[cell[tabulated]]
+        cell = np.where(tabulated, cell, 0)
+        fraction = np.where(tabulated, position - cell, 0)
+        result = self._backward(self._values[cell] * (1 - fraction) + self._values[cell + 1] * fraction)
+        if not tabulated.all():
+            result[~tabulated] = self._evaluate(x[~tabulated])
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def _xspraydrift_tables(crop, distance_bins):
+    """
+    Gets the tables of the distance classes of a crop class of the XSprayDrift model.
+
+    Args:
+        crop: The crop class.
+        distance_bins: The delineation method of the distance classes.
+
+    Returns:
+        A tuple of Tables over the quantile, one per distance class.
+    """
+    _, index = xdrift.xspraydrift_distance_bins(crop, distance_bins)
+    shape = np.array(xdrift.XSPRAYDRIFT_GAMMA_PARAMETERS[crop][0])[index]
+    rate = np.array(xdrift.XSPRAYDRIFT_GAMMA_PARAMETERS[crop][1])[index]
+    return tuple(
+        Table(
+            lambda q, a=a, b=b: xdrift.qgamma(q, a, b) / 100,
+            *QUANTILE_RANGE,
+            QUANTILE_SAMPLES,
+            "logit",
+            True
+        )
+        for a, b in zip(shape, rate)
+    )
+
+
+def xspraydrift(distance, q, target_exposure=np.nan, crop="arable", pdf_type="gamma", distance_bins="mean"):
+    """
+    Calculates spray-drift exposure with the XSprayDrift model from a table. See `xdrift.xspraydrift` for the
+    reference.
+
+    Args:
+        distance: The distances in meters.
+        q: The quantile of the density functions, either a scalar or one value per distance.
+        target_exposure: The value reported for distances of 0.
+        crop: The crop class.
+        pdf_type: The type of density function. Only `gamma` is supported.
+        distance_bins: The delineation method of the distance classes, either `mean` or `worst`.
+
+    Returns:
+        The fractions of exposure at the given distances.
+    """
+    if pdf_type != "gamma":
+        raise ValueError(f"Unsupported PDF type: {pdf_type}")
+    distance = np.asarray(distance, np.float64)
+    distance_class = xdrift.xspraydrift_class(distance, crop, distance_bins)
+    q, distance_class = np.broadcast_arrays(np.asarray(q, np.float64), distance_class)
+    exposure = np.zeros(distance_class.shape)
+    for i, table in enumerate(_xspraydrift_tables(crop, distance_bins)):
+        selection = distance_class == i
+        exposure[selection] = table(q[selection])
+    exposure[np.isnan(exposure)] = 0
+    exposure[distance == 0] = target_exposure
+    return exposure
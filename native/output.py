@@ -0,0 +1,474 @@
+"""
+Writers that transfer the deposition simulated by the native engine into the `Exposure` output of the component.
+"""
+import numpy as np
+import os
+from . import geometry
+from . import sparse
+
+
+# The record type of deposition spilled to disk by the SquareMeterWriter
+SPILL_RECORD = np.dtype([("row", "<i4"), ("col", "<i4"), ("exposure", "<f8")])
+
+# The number of days of sparse exposure that are densified at once for summaries
+SUMMARY_DAYS = 32
+
+# The label of cells in the habitat grid of the BaseGeometryWriter that are covered by several habitats
+SHARED_CELL = -2
+
+
+def tile_size(max_memory):
+    """
+    Gets the edge length of square tiles whose daily window of float32 values fits into half of a memory limit. The
+    other half is left to buffered deposition.
+
+    Args:
+        max_memory: The memory limit in bytes.
+
+    Returns:
+        The edge length of tiles in cells.
+    """
+    return max(int(np.sqrt(max_memory / 2 / np.dtype(np.float32).itemsize)), 1)
+
+
+class ExposureSummary:
+    """
+    Accumulates the maximum, the sum and the number of days with exposure of every cell or geometry while daily
+    exposure is written and writes them into the `ExposureMax`, `ExposureSum` and `ExposureEventCount` outputs.
+    Summaries are kept for one block of cells at a time and a block is written as soon as exposure of another block is
+    added. Exposure must therefore be added block by block, which all writers do, so that the memory needed is bounded
+    by the block shape instead of the extent.
+    """
+    def __init__(self, outputs, shape, block_shape=None):
+        """
+        Initializes an ExposureSummary.
+
+        Args:
+            outputs: The output container of the component. The summary outputs must already be created with the
+                given shape.
+            shape: The spatial shape of the exposure, i.e., (y, x) or (base_geometry,).
+            block_shape: The shape of the blocks by which exposure is added. The entire shape forms a single block if
+                omitted.
+        """
+        self._outputs = outputs
+        self._shape = tuple(int(x) for x in shape)
+        self._block_shape = self._shape if block_shape is None else tuple(int(x) for x in block_shape)
+        self._block = None
+        self._start = None
+        self._max = None
+        self._sum = None
+        self._count = None
+        self._window = None
+
+    def add(self, values, slices):
+        """
+        Adds daily exposure.
+
+        Args:
+            values: The exposure of a window with the days as last dimension.
+            slices: The spatial slices of the window, which must lie within one block.
+
+        Returns:
+            Nothing.
+        """
+        block = tuple(x.start // b for x, b in zip(slices, self._block_shape))
+        if block != self._block:
+            self.flush()
+            self._block = block
+            self._start = np.array(block) * self._block_shape
+            block_shape = np.minimum(self._start + self._block_shape, self._shape) - self._start
+            self._max = np.zeros(block_shape, np.float32)
+            self._sum = np.zeros(block_shape, np.float64)
+            self._count = np.zeros(block_shape, np.int32)
+            self._window = [[n, 0] for n in block_shape]
+        local = tuple(slice(x.start - s, x.stop - s) for x, s in zip(slices, self._start))
+        np.maximum(self._max[local], values.max(-1), out=self._max[local])
+        self._sum[local] += values.sum(-1, dtype=np.float64)
+        self._count[local] += np.count_nonzero(values > 0, -1).astype(np.int32)
+        for window, x in zip(self._window, local):
+            window[0] = min(window[0], x.start)
+            window[1] = max(window[1], x.stop)
+
+    def flush(self):
+        """
+        Writes the summaries of the current block.
+
+        Returns:
+            Nothing.
+        """
+        if self._block is None:
+            return
+        local = tuple(slice(start, stop) for start, stop in self._window)
+        slices = tuple(slice(x.start + s, x.stop + s) for x, s in zip(local, self._start))
+        self._outputs["ExposureMax"].set_values(self._max[local], slices=slices, create=False, calculate_max=True)
+        self._outputs["ExposureSum"].set_values(
+            self._sum[local].astype(np.float32), slices=slices, create=False, calculate_max=True)
+        self._outputs["ExposureEventCount"].set_values(
+            self._count[local], slices=slices, create=False, calculate_max=True)
+        self._block = None
+        self._max = self._sum = self._count = None
+
+
+class SquareMeterWriter:
+    """
+    Collects the deposition of applications and writes it as daily 1-square meter maps of shape (y, x, t) into an
+    output. Deposition is combined per day, so that every day is written once regardless of the number of applications
+    and their overlap. Only the window of each day that received deposition is written; all other values remain 0. If
+    the collected deposition exceeds the buffer size, it is appended to one file per day in the spill path and read back
+    when flushing. If a tile size is given, the output grid is split into square tiles, deposition is routed to the
+    tiles it falls into and every tile is spilled, read back and written on its own, so that the memory needed for
+    flushing is bounded by the tile size instead of the extent. Realizations of an ensemble are written into an
+    additional last dimension of the output.
+    """
+    def __init__(
+            self, output, landscape, simulation_length, buffer_size=None, spill_path=None, tile_size=None,
+            summary_outputs=None, realizations=None):
+        """
+        Initializes a SquareMeterWriter.
+
+        Args:
+            output: The output that receives the deposition. It must already be created with the shape of the
+                output grid of the landscape and the number of simulated days.
+            landscape: The Landscape of the simulation.
+            simulation_length: The number of simulated days.
+            buffer_size: The number of bytes of deposition records kept in memory. Records are never spilled if
+                omitted.
+            spill_path: The directory that receives spilled records. It is created if needed.
+            tile_size: The edge length of tiles in cells. The output grid is not tiled if omitted.
+            summary_outputs: The output container of the component, if the `ExposureMax`, `ExposureSum` and
+                `ExposureEventCount` outputs are accumulated while writing.
+            realizations: The number of realizations, if the output and the summary outputs have a last dimension
+                of realizations.
+        """
+        self._output = output
+        self._landscape = landscape
+        self._simulation_length = simulation_length
+        self._buffer_size = buffer_size
+        self._spill_path = spill_path
+        self._tile_size = tile_size
+        self._realizations = realizations
+        self._summary = None
+        if summary_outputs is not None and realizations:
+            self._summary = ExposureSummary(
+                summary_outputs,
+                landscape.output_grid.shape + (realizations,),
+                (tile_size, tile_size, 1) if tile_size else landscape.output_grid.shape + (1,)
+            )
+        elif summary_outputs is not None:
+            self._summary = ExposureSummary(
+                summary_outputs, landscape.output_grid.shape, None if tile_size is None else (tile_size, tile_size))
+        self._records = {}
+        self._buffered = 0
+        self._spilled = set()
+        self.tiles = set()
+
+    def add(self, day, row, col, exposure, realization=0):
+        """
+        Adds the deposition of an application.
+
+        Args:
+            day: The zero-based simulation day.
+            row: The row indices of the exposed cells in the landscape grid.
+            col: The column indices of the exposed cells in the landscape grid.
+            exposure: The exposure of the cells.
+            realization: The zero-based realization.
+
+        Returns:
+            Nothing.
+        """
+        row = row - self._landscape.output_offset[0]
+        col = col - self._landscape.output_offset[1]
+        inside = (row >= 0) & (row < self._landscape.output_grid.rows) & (col >= 0) & (
+                col < self._landscape.output_grid.cols)
+        if inside.any():
+            row, col, exposure = row[inside], col[inside], exposure[inside]
+            if self._tile_size:
+                tile_row = row // self._tile_size
+                tile_col = col // self._tile_size
+                for tile in set(zip(tile_row.tolist(), tile_col.tolist())):
+                    in_tile = (tile_row == tile[0]) & (tile_col == tile[1])
+                    self._records.setdefault(tile + (realization, day), []).append(
+                        (row[in_tile], col[in_tile], exposure[in_tile]))
+            else:
+                self._records.setdefault((0, 0, realization, day), []).append((row, col, exposure))
+            self._buffered += len(row) * SPILL_RECORD.itemsize
+            if self._buffer_size is not None and self._buffered > self._buffer_size:
+                self._spill()
+
+    def _spill_file(self, key):
+        """
+        Gets the file that receives the spilled records of a tile, realization and day.
+
+        Args:
+            key: A tuple of the tile row, the tile column, the zero-based realization and the zero-based simulation
+                day.
+
+        Returns:
+            The file path.
+        """
+        return os.path.join(self._spill_path, "tile_{}_{}_realization_{}_day_{}.bin".format(*key))
+
+    def _spill(self):
+        """
+        Appends all collected deposition to the spill files of the days.
+
+        Returns:
+            Nothing.
+        """
+        os.makedirs(self._spill_path, exist_ok=True)
+        for key, records in self._records.items():
+            spilled = np.empty(sum(len(x[0]) for x in records), SPILL_RECORD)
+            for i, field in enumerate(SPILL_RECORD.names):
+                spilled[field] = np.concatenate([x[i] for x in records])
+            with open(self._spill_file(key), "ab") as f:
+                spilled.tofile(f)
+            self._spilled.add(key)
+        self._records = {}
+        self._buffered = 0
+
+    def flush(self):
+        """
+        Writes all collected deposition to the output, tile by tile, realization by realization and day by day.
+
+        Returns:
+            Nothing.
+        """
+        for key in sorted(self._spilled.union(self._records)):
+            realization, day = key[2:]
+            records = self._records.pop(key, [])
+            if key in self._spilled:
+                spilled = np.fromfile(self._spill_file(key), SPILL_RECORD)
+                records = records + [(spilled["row"], spilled["col"], spilled["exposure"])]
+                os.remove(self._spill_file(key))
+            row = np.concatenate([x[0] for x in records])
+            col = np.concatenate([x[1] for x in records])
+            exposure = np.concatenate([x[2] for x in records])
+            window = (slice(row.min(), row.max() + 1), slice(col.min(), col.max() + 1))
+            values = np.zeros((window[0].stop - window[0].start, window[1].stop - window[1].start, 1), np.float32)
+            np.add.at(values, (row - window[0].start, col - window[1].start, 0), exposure)
+            if self._realizations:
+                self._output.set_values(
+                    values[..., np.newaxis],
+                    slices=window + (slice(day, day + 1), slice(realization, realization + 1)),
+                    create=False,
+                    calculate_max=True
+                )
+                if self._summary:
+                    self._summary.add(values[:, :, np.newaxis], window + (slice(realization, realization + 1),))
+            else:
+                self._output.set_values(
+                    values, slices=window + (slice(day, day + 1),), create=False, calculate_max=True)
+                if self._summary:
+                    self._summary.add(values, window)
+            self.tiles.add(key[:2])
+        if self._summary:
+            self._summary.flush()
+        self._records = {}
+        self._buffered = 0
+        self._spilled = set()
+
+
+class BaseGeometryWriter:
+    """
+    Collects the deposition of applications and writes the average deposition per habitat geometry and day into an
+    output of shape (t, base_geometry). All habitats are rasterized once into a grid of geometry indices, deposition
+    is averaged per geometry and day by a single grouped sum and the entire output is written in one block. Cells that
+    are covered by several overlapping habitats are marked in the grid and looked up in a table of their habitats, so
+    that every habitat receives the deposition of all its cells. Realizations of an ensemble are written into an
+    additional last dimension of the output.
+    """
+    def __init__(self, output, landscape, simulation_length, summary_outputs=None, realizations=None):
+        """
+        Initializes a BaseGeometryWriter.
+
+        Args:
+            output: The output that receives the deposition. It must already be created with the shape of the
+                number of simulated days and the number of geometries.
+            landscape: The Landscape of the simulation.
+            simulation_length: The number of simulated days.
+            summary_outputs: The output container of the component, if the `ExposureMax`, `ExposureSum` and
+                `ExposureEventCount` outputs are accumulated while writing.
+            realizations: The number of realizations, if the output and the summary outputs have a last dimension
+                of realizations.
+        """
+        self._output = output
+        self._realizations = realizations
+        self._summary = None if summary_outputs is None else ExposureSummary(
+            summary_outputs, (len(landscape.geometries),) + ((realizations,) if realizations else ()))
+        self._landscape = landscape
+        self._simulation_length = simulation_length
+        habitats = landscape.habitats[
+            (landscape.bounds[landscape.habitats, 2] - landscape.bounds[landscape.habitats, 0] > 1) &
+            (landscape.bounds[landscape.habitats, 3] - landscape.bounds[landscape.habitats, 1] > 1)
+        ]
+        self._labels = np.full(landscape.grid.shape, -1, np.int32)
+        row, col, index = geometry.rasterize([landscape.geometries[i] for i in habitats], landscape.grid)
+        cells = np.ravel_multi_index((row, col), landscape.grid.shape)
+        habitat = habitats[index]
+        single = np.bincount(cells, minlength=self._labels.size)[cells] == 1
+        self._labels.flat[cells[single]] = habitat[single]
+        # cells that are covered more than once, each habitat counting once per cell
+        cells, habitat = np.divmod(
+            np.unique(cells[~single] * len(landscape.geometries) + habitat[~single]), len(landscape.geometries))
+        self._cell_counts = np.bincount(
+            np.concatenate((habitats[index][single], habitat)), minlength=len(landscape.geometries))
+        unique_cells, first, count = np.unique(cells, return_index=True, return_counts=True)
+        self._labels.flat[unique_cells] = np.where(count > 1, SHARED_CELL, habitat[first])
+        shared = np.repeat(count > 1, count)
+        self._shared_cells = cells[shared]
+        self._shared_habitats = habitat[shared]
+        self._keys = []
+        self._values = []
+
+    def add(self, day, row, col, exposure, realization=0):
+        """
+        Adds the deposition of an application.
+
+        Args:
+            day: The zero-based simulation day.
+            row: The row indices of the exposed cells in the landscape grid.
+            col: The column indices of the exposed cells in the landscape grid.
+            exposure: The exposure of the cells.
+            realization: The zero-based realization.
+
+        Returns:
+            Nothing.
+        """
+        labels = self._labels[row, col]
+        habitat = labels >= 0
+        shared = np.flatnonzero(labels == SHARED_CELL)
+        if len(shared) > 0:
+            # cells of overlapping habitats contribute to each of their habitats
+            cells = np.ravel_multi_index((row[shared], col[shared]), self._labels.shape)
+            start = np.searchsorted(self._shared_cells, cells, "left")
+            count = np.searchsorted(self._shared_cells, cells, "right") - start
+            pair = np.repeat(start - np.cumsum(count) + count, count) + np.arange(count.sum())
+            labels = np.concatenate((labels[habitat], self._shared_habitats[pair]))
+            exposure = np.concatenate((exposure[habitat], np.repeat(exposure[shared], count)))
+        else:
+            labels = labels[habitat]
+            exposure = exposure[habitat]
+        self._keys.append(
+            (labels.astype(np.int64) * (self._realizations or 1) + realization) * self._simulation_length + day)
+        self._values.append(exposure)
+
+    def flush(self):
+        """
+        Writes the average deposition of all geometries to the output.
+
+        Returns:
+            Nothing.
+        """
+        keys, inverse = np.unique(np.concatenate(self._keys + [np.empty(0, np.int64)]), return_inverse=True)
+        sums = np.bincount(inverse, np.concatenate(self._values + [np.empty(0, np.float32)]), len(keys))
+        realizations = self._realizations or 1
+        geometry_index, day = np.divmod(keys, self._simulation_length)
+        geometry_index, realization = np.divmod(geometry_index, realizations)
+        values = np.zeros((self._simulation_length, len(self._cell_counts), realizations), np.float32)
+        values[day, geometry_index, realization] = sums / self._cell_counts[geometry_index]
+        if not self._realizations:
+            values = values[:, :, 0]
+        self._output.set_values(
+            values,
+            slices=tuple(slice(0, x) for x in values.shape),
+            create=False,
+            calculate_max=True
+        )
+        if self._summary:
+            self._summary.add(np.moveaxis(values, 0, -1), tuple(slice(0, x) for x in values.shape[1:]))
+            self._summary.flush()
+        self._keys = []
+        self._values = []
+
+
+class SparseWriter:
+    """
+    Collects deposition and writes it as sparse 1-square meter exposure into the `SparseExposureCells`,
+    `SparseExposureValues` and `SparseExposureIndex` outputs. See `sparse.SparseExposure` for the representation.
+    """
+    def __init__(self, outputs, shape, offset=(0, 0), unit=None, start=None, summarize=False):
+        """
+        Initializes a SparseWriter.
+
+        Args:
+            outputs: The output container of the component.
+            shape: The shape (y, x, t) of the dense exposure.
+            offset: The row and column offset of the output grid within the grid of added coordinates.
+            unit: The unit of the exposure.
+            start: The first simulated day.
+            summarize: Specifies whether the `ExposureMax`, `ExposureSum` and `ExposureEventCount` outputs are
+                written, too.
+        """
+        self._outputs = outputs
+        self._summarize = summarize
+        self._shape = shape
+        self._offset = offset
+        self._unit = unit
+        self._start = start
+        self._records = []
+
+    def add(self, day, row, col, exposure, realization=0):
+        """
+        Adds the deposition of an application.
+
+        Args:
+            day: The zero-based simulation day.
+            row: The row indices of the exposed cells.
+            col: The column indices of the exposed cells.
+            exposure: The exposure of the cells.
+            realization: The zero-based realization, which must be 0 as sparse exposure holds a single realization.
+
+        Returns:
+            Nothing.
+        """
+        if realization != 0:
+            raise ValueError("Sparse exposure holds a single realization")
+        row = row - self._offset[0]
+        col = col - self._offset[1]
+        inside = (row >= 0) & (row < self._shape[0]) & (col >= 0) & (col < self._shape[1])
+        if inside.any():
+            self._records.append((row[inside], col[inside], np.broadcast_to(day, row.shape)[inside], exposure[inside]))
+
+    def flush(self):
+        """
+        Writes all collected deposition to the outputs.
+
+        Returns:
+            Nothing.
+        """
+        exposure = sparse.SparseExposure.from_coordinates(
+            self._shape, *(np.concatenate([x[i] for x in self._records] + [np.empty(0, np.int64)]) for i in range(4)))
+        self._outputs["SparseExposureCells"].set_values(
+            exposure.cells, scales="other/deposition, other/coordinate", unit=None)
+        self._outputs["SparseExposureValues"].set_values(exposure.values, scales="other/deposition", unit=self._unit)
+        self._outputs["SparseExposureIndex"].set_values(
+            exposure.index,
+            scales="time/day, other/tile_y, other/tile_x",
+            unit=None,
+            offset=(self._start, None, None)
+        )
+        if self._summarize:
+            self._write_summary(exposure)
+        self._records = []
+
+    def _write_summary(self, exposure):
+        """
+        Writes the summary outputs of sparse exposure. Only tiles that contain exposure are visited, a few days at a
+        time.
+
+        Args:
+            exposure: The SparseExposure.
+
+        Returns:
+            Nothing.
+        """
+        summary = ExposureSummary(self._outputs, self._shape[:2], (exposure.tile_size, exposure.tile_size))
+        tiles = np.unique(exposure.cells[:, :2].astype(np.int64) // exposure.tile_size, axis=0)
+        for tile_row, tile_col in tiles:
+            window = (
+                slice(tile_row * exposure.tile_size, min((tile_row + 1) * exposure.tile_size, self._shape[0])),
+                slice(tile_col * exposure.tile_size, min((tile_col + 1) * exposure.tile_size, self._shape[1]))
+            )
+            for day in range(0, self._shape[2], SUMMARY_DAYS):
+                summary.add(exposure.dense(window + (slice(day, min(day + SUMMARY_DAYS, self._shape[2])),)), window)
+        summary.flush()
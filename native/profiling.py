@@ -0,0 +1,198 @@
+"""
+Per-stage instrumentation of spray-drift simulations. Every stage accumulates its wall time, the number of times it
+ran, counts such as cells, trajectories or applications and, if memory profiling is enabled, the peak resident set size
+of the process at its end.
+Stages of worker processes and of the XSprayDrift module are merged into the instrumentation of the component, which
+reports them to the observer and writes them as JSON.
+"""
+import contextlib
+import ctypes
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss(children=False):
+    """
+    Gets the peak resident set size of the current process or of its terminated child processes.
+
+    Args:
+        children: Specifies whether the peak of the largest terminated child process is returned instead.
+
+    Returns:
+        The peak resident set size in bytes, or `None` if it cannot be determined on this platform.
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # maximum resident set sizes are reported in kilobytes except on macOS
+        return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    if sys.platform == "win32" and not children:
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", ctypes.c_ulong),
+                ("PageFaultCount", ctypes.c_ulong),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t)
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+class Instrumentation:
+    """
+    The accumulated measurements of the stages of a simulation, in the order in which the stages first ran.
+    """
+    def __init__(self, memory=False):
+        """
+        Initializes an empty Instrumentation.
+
+        Args:
+            memory: Specifies whether the peak resident set size is sampled at the end of every stage.
+        """
+        self.stages = {}
+        self.memory = memory
+
+    def peak_memory(self, children=False):
+        """
+        Gets the peak resident set size of the current process or of its terminated child processes if memory
+        profiling is enabled.
+
+        Args:
+            children: Specifies whether the peak of the largest terminated child process is returned instead.
+
+        Returns:
+            The peak resident set size in bytes, or `None` if memory profiling is disabled or the peak cannot be
+            determined on this platform.
+        """
+        return peak_rss(children) if self.memory else None
+
+    @contextlib.contextmanager
+    def stage(self, name, **counts):
+        """
+        Measures a stage. The counts of the stage can be updated through the dictionary that is returned by the
+        context manager.
+
+        Args:
+            name: The name of the stage.
+            counts: The initial counts of the stage.
+
+        Returns:
+            A context manager that yields the dictionary of counts.
+        """
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add(name, time.perf_counter() - start, 1, self.peak_memory(), **counts)
+
+    def iterate(self, name, iterable, **counts):
+        """
+        Measures a stage that produces the items of an iterable. Only the time needed to produce the items counts
+        towards the stage, the time that the consumer spends on an item, e.g., in stages of its own, does not.
+
+        Args:
+            name: The name of the stage.
+            iterable: The iterable that produces the items.
+            counts: The counts of the stage.
+
+        Returns:
+            A generator of the items of the iterable.
+        """
+        # the stage is listed in the order in which it started, not in which it ended
+        self.add(name, 0., 0)
+        iterator = iter(iterable)
+        duration = 0.
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    duration += time.perf_counter() - start
+                yield item
+        finally:
+            self.add(name, duration, 1, self.peak_memory(), **counts)
+
+    def add(self, name, duration, calls=1, peak_memory=None, **counts):
+        """
+        Adds a measurement to a stage.
+
+        Args:
+            name: The name of the stage.
+            duration: The wall time in seconds.
+            calls: The number of times the stage ran.
+            peak_memory: The peak resident set size in bytes, or `None` if unknown.
+            counts: Counts that are summed up per stage.
+
+        Returns:
+            Nothing.
+        """
+        stage = self.stages.setdefault(name, {"duration": 0., "calls": 0, "peak_rss": None, "counts": {}})
+        stage["duration"] += duration
+        stage["calls"] += calls
+        if peak_memory is not None:
+            stage["peak_rss"] = max(stage["peak_rss"] or 0, int(peak_memory))
+        for key, value in counts.items():
+            stage["counts"][key] = stage["counts"].get(key, 0) + int(value)
+
+    def merge(self, other):
+        """
+        Adds the measurements of another Instrumentation, e.g., of a worker process.
+
+        Args:
+            other: The other Instrumentation.
+
+        Returns:
+            Nothing.
+        """
+        for name, stage in other.stages.items():
+            self.add(name, stage["duration"], stage["calls"], stage["peak_rss"], **stage["counts"])
+
+    def report(self, observer):
+        """
+        Reports the stages to an observer.
+
+        Args:
+            observer: The observer.
+
+        Returns:
+            Nothing.
+        """
+        for name, stage in self.stages.items():
+            details = [f"{stage['calls']} calls"]
+            if stage["peak_rss"] is not None:
+                details.append(f"peak RSS {stage['peak_rss'] / 1048576:.1f} MB")
+            details += [f"{value} {key}" for key, value in stage["counts"].items()]
+            observer.write_message(4, f"Stage {name} took {stage['duration']:.3f} s", ", ".join(details))
+
+    def write(self, file_path, **metadata):
+        """
+        Writes the stages into a JSON file.
+
+        Args:
+            file_path: The path of the JSON file.
+            metadata: Additional top-level entries of the file.
+
+        Returns:
+            Nothing.
+        """
+        with open(file_path, "w") as f:
+            json.dump(dict(metadata, stages=[dict(name=k, **v) for k, v in self.stages.items()]), f, indent=2)
@@ -0,0 +1,201 @@
+"""
+File-backed 1-square meter exposure. Instead of copying the exposure into the store, the component leaves it in an
+HDF5 file within the processing path and outputs the path of the file. The file contains a dataset of shape (y, x, t)
+named `exposure`, which is either written by the native engine or an external link to the dataset of the module. Its
+attributes describe the scales, unit and offset of the exposure together with its maximum, which is computed once.
+Consumers open the file as `ExposureReference` and read windows on demand.
+"""
+import os
+import stat
+import h5py
+
+
+# The name of the exposure dataset within referenced files
+DATASET = "exposure"
+
+
+class DatasetOutput:
+    """
+    Receives the writes of a native writer like an output of the component, but writes them into an HDF5 dataset and
+    keeps track of the maximum.
+    """
+    def __init__(self, data_set):
+        """
+        Initializes a DatasetOutput.
+
+        Args:
+            data_set: The HDF5 dataset.
+        """
+        self.data_set = data_set
+        self.max = 0.
+
+    def set_values(self, values, slices, create=False, calculate_max=False):
+        """
+        Writes a block of values.
+
+        Args:
+            values: The values.
+            slices: The slices of the block within the dataset.
+            create: Must be `False`, the dataset already exists.
+            calculate_max: Specifies whether the values are considered for the maximum.
+
+        Returns:
+            Nothing.
+        """
+        if create:
+            raise ValueError("The dataset of a DatasetOutput already exists")
+        self.data_set[slices] = values
+        if calculate_max:
+            self.max = max(self.max, float(values.max(initial=0)))
+
+
+def dataset_max(data_set):
+    """
+    Gets the maximum of a chunked dataset. Only chunks that were actually written are read.
+
+    Args:
+        data_set: The HDF5 dataset.
+
+    Returns:
+        The maximum, which is 0 if no chunks were written.
+    """
+    maximum = 0.
+    for i in range(data_set.id.get_num_chunks()):
+        offset = data_set.id.get_chunk_info(i).chunk_offset
+        chunk = tuple(slice(o, min(o + c, s)) for o, c, s in zip(offset, data_set.chunks, data_set.shape))
+        maximum = max(maximum, float(data_set[chunk].max(initial=0)))
+    return maximum
+
+
+def describe(data_set, maximum, scales, unit, offset):
+    """
+    Stores the metadata of the exposure as attributes of its dataset.
+
+    Args:
+        data_set: The HDF5 dataset.
+        maximum: The maximum of the exposure.
+        scales: The scales of the exposure.
+        unit: The unit of the exposure.
+        offset: The offset of the exposure per dimension as y-origin, x-origin and first simulated day.
+
+    Returns:
+        Nothing.
+    """
+    data_set.attrs["max"] = maximum
+    data_set.attrs["scales"] = scales
+    data_set.attrs["unit"] = "" if unit is None else str(unit)
+    data_set.attrs["offset"] = [str(x) for x in offset]
+
+
+def link(file_path, target_file, target_path):
+    """
+    Creates a file whose exposure dataset is an external link to a dataset of another file. The link is relative to
+    the directory of the new file.
+
+    Args:
+        file_path: The path of the new file.
+        target_file: The path of the file that contains the exposure.
+        target_path: The path of the exposure dataset within the target file.
+
+    Returns:
+        Nothing.
+    """
+    with h5py.File(file_path, "w") as f:
+        f[DATASET] = h5py.ExternalLink(
+            os.path.relpath(target_file, os.path.dirname(os.path.abspath(file_path))), target_path)
+
+
+def protect(file_path):
+    """
+    Removes the write permissions of a file, so that referenced exposure cannot be changed while it is consumed.
+
+    Args:
+        file_path: The path of the file.
+
+    Returns:
+        Nothing.
+    """
+    os.chmod(file_path, stat.S_IMODE(os.stat(file_path).st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+class ExposureReference:
+    """
+    Read access to the exposure of a referenced file. Windows are read on demand.
+    """
+    def __init__(self, file_path):
+        """
+        Initializes an ExposureReference.
+
+        Args:
+            file_path: The path of the file as output by the component.
+        """
+        self._file = h5py.File(file_path, "r")
+        self._data_set = self._file[DATASET]
+        self.shape = self._data_set.shape
+        self.dtype = self._data_set.dtype
+        self.scales = self._data_set.attrs["scales"]
+        self.unit = self._data_set.attrs["unit"] or None
+        self.offset = tuple(self._data_set.attrs["offset"])
+
+    def __enter__(self):
+        """
+        Enters the context of the ExposureReference.
+
+        Returns:
+            The ExposureReference.
+        """
+        return self
+
+    def __exit__(self, *args):
+        """
+        Closes the file when leaving the context.
+
+        Args:
+            args: The exception information, which is ignored.
+
+        Returns:
+            Nothing.
+        """
+        self.close()
+
+    def __getitem__(self, slices):
+        """
+        Reads a window of the exposure.
+
+        Args:
+            slices: The slices or indices of the window.
+
+        Returns:
+            A NumPy array of the window.
+        """
+        return self._data_set[slices]
+
+    def dense(self, slices=None):
+        """
+        Reads a window of the exposure, like `SparseExposure.dense`.
+
+        Args:
+            slices: A tuple of (y, x, t) slices that selects the window. The entire exposure is returned if omitted.
+
+        Returns:
+            A NumPy array of the window.
+        """
+        return self._data_set[slices if slices is not None else ()]
+
+    def max(self):
+        """
+        Gets the maximum exposure without reading the exposure.
+
+        Returns:
+            The maximum value.
+        """
+        return float(self._data_set.attrs["max"])
+
+    def close(self):
+        """
+        Closes the file.
+
+        Returns:
+            Nothing.
+        """
+        self._file.close()
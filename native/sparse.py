@@ -0,0 +1,157 @@
+"""
+A sparse representation of 1-square meter exposure. Deposition only occurs near applied fields on application days,
+so almost all values of the dense (y, x, t) exposure are zero. The sparse representation lists the non-zero cells
+sorted by day and by tile and indexes where the cells of each day and tile start, so that maps, tiles and windows
+can be retrieved without scanning all cells.
+"""
+import numpy as np
+
+
+# The edge length in cells of the square tiles by which cells are indexed
+TILE_SIZE = 256
+
+
+class SparseExposure:
+    """
+    Non-zero exposure values of a grid of shape (y, x, t) together with their cell coordinates and an index by day and
+    tile.
+    """
+    def __init__(self, shape, cells, values, index, tile_size=TILE_SIZE):
+        """
+        Initializes a SparseExposure from its stored arrays.
+
+        Args:
+            shape: The shape (y, x, t) of the dense exposure.
+            cells: An array of shape (n, 3) with the (y, x, t) coordinates of the non-zero values, sorted by day, tile
+                and position within the tile.
+            values: The n non-zero values.
+            index: An array of shape (t, tile rows, tile columns) with the position of the first cell of every day and
+                tile in `cells`.
+            tile_size: The edge length of tiles in cells.
+        """
+        self.shape = tuple(int(x) for x in shape)
+        self.cells = np.asarray(cells)
+        self.values = np.asarray(values)
+        self.index = np.asarray(index)
+        self.tile_size = tile_size
+        self._bounds = np.append(self.index.ravel(), len(self.values))
+
+    @classmethod
+    def from_coordinates(cls, shape, row, col, day, values, tile_size=TILE_SIZE):
+        """
+        Creates a SparseExposure from unsorted coordinates. Values of repeated coordinates are summed up and zeros are
+        dropped.
+
+        Args:
+            shape: The shape (y, x, t) of the dense exposure.
+            row: The row indices of the values.
+            col: The column indices of the values.
+            day: The day indices of the values.
+            values: The values.
+            tile_size: The edge length of tiles in cells.
+
+        Returns:
+            A SparseExposure.
+        """
+        tiles = (-(-shape[0] // tile_size), -(-shape[1] // tile_size))
+        row, col, day = (np.asarray(x, np.int64) for x in (row, col, day))
+        tile = (day * tiles[0] + row // tile_size) * tiles[1] + col // tile_size
+        keys, inverse = np.unique(
+            (tile * tile_size + row % tile_size) * tile_size + col % tile_size, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), np.asarray(values, np.float64), len(keys)).astype(np.float32)
+        keys = keys[sums != 0]
+        sums = sums[sums != 0]
+        tile, position = np.divmod(keys, tile_size * tile_size)
+        day, tile_index = np.divmod(tile, tiles[0] * tiles[1])
+        tile_row, tile_col = np.divmod(tile_index, tiles[1])
+        position_row, position_col = np.divmod(position, tile_size)
+        cells = np.stack(
+            (tile_row * tile_size + position_row, tile_col * tile_size + position_col, day), 1).astype(np.uint32)
+        index = np.searchsorted(tile, np.arange(shape[2] * tiles[0] * tiles[1])).reshape((shape[2],) + tiles)
+        return cls(shape, cells, sums, index, tile_size)
+
+    def _select(self, positions):
+        """
+        Gets the cells of a set of days and tiles.
+
+        Args:
+            positions: The flat positions of the days and tiles in the index.
+
+        Returns:
+            An array of cell indices.
+        """
+        starts = self._bounds[positions]
+        counts = self._bounds[positions + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(counts.sum())
+
+    def day(self, day):
+        """
+        Gets the non-zero cells of a day.
+
+        Args:
+            day: The zero-based day.
+
+        Returns:
+            A tuple of the row indices, column indices and values of the non-zero cells.
+        """
+        start, end = self._bounds[day * self.index[0].size], self._bounds[(day + 1) * self.index[0].size]
+        return self.cells[start:end, 0], self.cells[start:end, 1], self.values[start:end]
+
+    def tile(self, day, tile_row, tile_col):
+        """
+        Gets the non-zero cells of a tile at a day.
+
+        Args:
+            day: The zero-based day.
+            tile_row: The row index of the tile.
+            tile_col: The column index of the tile.
+
+        Returns:
+            A tuple of the row indices, column indices and values of the non-zero cells.
+        """
+        position = np.ravel_multi_index((day, tile_row, tile_col), self.index.shape)
+        start, end = self._bounds[position], self._bounds[position + 1]
+        return self.cells[start:end, 0], self.cells[start:end, 1], self.values[start:end]
+
+    def dense(self, slices=None):
+        """
+        Gets a dense view of the exposure. Only the tiles intersecting the requested window are visited.
+
+        Args:
+            slices: A tuple of (y, x, t) slices with a step of 1 that selects the window. The entire exposure is
+                returned if omitted.
+
+        Returns:
+            A float32 array of the window.
+        """
+        if slices is None:
+            slices = (slice(None),) * 3
+        window = [s.indices(n)[:2] for s, n in zip(slices, self.shape)]
+        values = np.zeros([max(stop - start, 0) for start, stop in window], np.float32)
+        if values.size == 0:
+            return values
+        days, tile_rows, tile_cols = np.meshgrid(
+            np.arange(window[2][0], window[2][1]),
+            np.arange(window[0][0] // self.tile_size, (window[0][1] - 1) // self.tile_size + 1),
+            np.arange(window[1][0] // self.tile_size, (window[1][1] - 1) // self.tile_size + 1),
+            indexing="ij"
+        )
+        selection = self._select(
+            np.ravel_multi_index((days.ravel(), tile_rows.ravel(), tile_cols.ravel()), self.index.shape))
+        cells = self.cells[selection].astype(np.int64)
+        inside = (cells[:, 0] >= window[0][0]) & (cells[:, 0] < window[0][1]) & (cells[:, 1] >= window[1][0]) & (
+                cells[:, 1] < window[1][1])
+        cells = cells[inside]
+        values[cells[:, 0] - window[0][0], cells[:, 1] - window[1][0], cells[:, 2] - window[2][0]] = self.values[
+            selection[inside]]
+        return values
+
+    def max(self):
+        """
+        Gets the maximum exposure.
+
+        Returns:
+            The maximum value, which is 0 if there are no non-zero values.
+        """
+        return float(self.values.max(initial=0))
@@ -0,0 +1,186 @@
+"""
+Counter-based random streams of the native engine. Random numbers are not drawn sequentially from a shared
+generator, but derived by hashing a key of the random seed, the identity of the application, the exposure path and
+the kind of draw. Any random number can therefore be computed in isolation, regardless of the order in which
+applications and exposure paths are processed. The identity of an application is a hash of its applied area, day,
+rate and drift reduction, so that an application keeps its random numbers if other applications are added, removed or
+reordered.
+"""
+import hashlib
+import struct
+import numpy as np
+
+
+# The kinds of draws made during the simulation of an application
+WIND_DIRECTION = 0
+FIELD_DISTANCE_OFFSET = 1
+EP_DISTANCE_OFFSET = 2
+XSPRAYDRIFT_QUANTILE = 3
+SIMPLE_DRIFT_FILTERING = 4
+
+# Random seeds are reduced to 63 bits
+_SEED_MASK = (1 << 63) - 1
+
+
+def _mix(x):
+    """
+    Applies the SplitMix64 finalizer to unsigned 64-bit integers.
+
+    Args:
+        x: An array of unsigned 64-bit integers.
+
+    Returns:
+        The mixed integers.
+    """
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _key(values):
+    """
+    Converts integers of any sign into unsigned 64-bit integers.
+
+    Args:
+        values: The integers.
+
+    Returns:
+        An array of unsigned 64-bit integers of at least one dimension.
+    """
+    return np.atleast_1d(np.asarray(values, np.int64)).view(np.uint64)
+
+
+def application_identities(areas, days, rates, drift_reductions):
+    """
+    Gets the identities of a series of applications. Identical applications are told apart by the number of identical
+    applications that precede them.
+
+    Args:
+        areas: The applied areas in Well-Known-Binary representation.
+        days: The zero-based simulation day of each application.
+        rates: The application rates.
+        drift_reductions: The drift reductions by technology.
+
+    Returns:
+        An int64 array with a non-negative identity per application.
+    """
+    identities = np.empty(len(areas), np.int64)
+    occurrences = {}
+    for i, (area, day, rate, drift_reduction) in enumerate(zip(areas, days, rates, drift_reductions)):
+        content = hashlib.sha256(bytes(area)).digest() + struct.pack(
+            "<qdd", int(day), float(rate), float(drift_reduction))
+        occurrence = occurrences[content] = occurrences.get(content, -1) + 1
+        digest = hashlib.sha256(content + struct.pack("<q", occurrence)).digest()
+        identities[i] = int.from_bytes(digest[:8], "little") & _SEED_MASK
+    return identities
+
+
+class RandomStreams:
+    """
+    The random streams of a single application.
+    """
+    def __init__(self, seed, application):
+        """
+        Initializes the RandomStreams.
+
+        Args:
+            seed: The random seed of the simulation.
+            application: The identity of the application as returned by `application_identities`.
+        """
+        self.seed = seed
+        self.application = application
+        self._key = _mix(_key(application) ^ _mix(_key(int(seed) & _SEED_MASK)))
+
+    def uniform(self, draw, bands=0, index=0):
+        """
+        Gets uniformly distributed random numbers in [0, 1).
+
+        Args:
+            draw: The kind of draw.
+            bands: The exposure path identifiers for which a number is drawn.
+            index: The index of the number within a draw that needs several numbers per exposure path.
+
+        Returns:
+            An array with a random number per exposure path.
+        """
+        x = _mix(self._key ^ _mix(_key(bands) ^ _mix(_key(draw * 4 + index))))
+        return (x >> np.uint64(11)).astype(np.float64) * 2. ** -53
+
+    def normal(self, draw, bands=0, sd=1.):
+        """
+        Gets normally distributed random numbers with a mean of 0 using the Box-Muller transform.
+
+        Args:
+            draw: The kind of draw.
+            bands: The exposure path identifiers for which a number is drawn.
+            sd: The standard deviation of the normal distribution.
+
+        Returns:
+            An array with a random number per exposure path.
+        """
+        radius = np.sqrt(-2 * np.log1p(-self.uniform(draw, bands, 0)))
+        return sd * radius * np.cos(2 * np.pi * self.uniform(draw, bands, 1))
+
+    def choice(self, draw, bands, values, probabilities):
+        """
+        Samples values according to relative probabilities.
+
+        Args:
+            draw: The kind of draw.
+            bands: The exposure path identifiers for which a value is drawn.
+            values: The values to sample from.
+            probabilities: The relative probabilities of the values.
+
+        Returns:
+            An array with a sampled value per exposure path.
+        """
+        cumulative = np.cumsum(probabilities, dtype=np.float64)
+        index = np.searchsorted(cumulative, self.uniform(draw, bands) * cumulative[-1], "right")
+        return np.asarray(values)[np.minimum(index, len(values) - 1)]
+
+
+def application_uniform(seed, applications, draw):
+    """
+    Gets a uniformly distributed random number per application for a draw that is made once per application. The
+    numbers equal those of `RandomStreams(seed, application).uniform(draw)`, but are derived for all applications at
+    once.
+
+    Args:
+        seed: The random seed of the simulation.
+        applications: The identities of the applications as returned by `application_identities`.
+        draw: The kind of draw.
+
+    Returns:
+        An array with a random number in [0, 1) per application.
+    """
+    key = _mix(_key(applications) ^ _mix(_key(int(seed) & _SEED_MASK)))
+    x = _mix(key ^ _mix(_key(0) ^ _mix(_key(draw * 4))))
+    return (x >> np.uint64(11)).astype(np.float64) * 2. ** -53
+
+
+def random_seed():
+    """
+    Gets a fresh random seed for simulations without a fixed random seed.
+
+    Returns:
+        A non-negative integer.
+    """
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> np.uint64(1))
+
+
+def realization_seed(seed, realization):
+    """
+    Gets the random seed of a realization of an ensemble. The first realization uses the random seed itself, so that
+    an ensemble of a single realization equals a simulation without ensemble.
+
+    Args:
+        seed: The random seed of the ensemble.
+        realization: The zero-based index of the realization.
+
+    Returns:
+        A non-negative integer.
+    """
+    if realization == 0:
+        return seed
+    return int(_mix(_key(int(seed) & _SEED_MASK) ^ _mix(_key(realization)))[0] & np.uint64(_SEED_MASK))
@@ -0,0 +1,516 @@
+"""
+A NumPy port of the functions of the XDrift R package (version 1.1.0) that are used by the XSprayDrift module.
+"""
+import math
+import numpy as np
+
+try:
+    from scipy import special
+except ImportError:
+    special = None
+
+
+# The distances in meters at which the field trials underlying the XSprayDrift model measured deposition
+DISTANCE_CLASSES = (0., 1., 3., 5., 7.5, 10., 15., 20., 30., 50., 75., 100.)
+
+# The lumped gamma distribution parameters (shape, rate) per crop and distance class, as shipped with XDrift 1.1.0
+XSPRAYDRIFT_GAMMA_PARAMETERS = {
+    "arable": (
+        (14.09192079, 1.6859848, 2.18477314, 2.08079845, 2.10002762, 1.76207125, 1.49224389, 1.29280413, 1.16691886,
+         1.16504216, 1.94554591, 2.24782061),
+        (0.9380264, 1.39530463, 5.15322181, 7.02212983, 11.54947758, 12.12509553, 25.07729063, 19.19855004,
+         26.01068245, 31.5387933, 129.8362567, 164.1871813)
+    ),
+    "hops": (
+        (np.nan, np.nan, 3.9189498, 5.02071111, 3.41103791, 2.92266495, 1.68923903, 1.27330217, 0.99736627,
+         1.26645377, np.nan, np.nan),
+        (np.nan, np.nan, 0.33697256, 0.65735557, 0.73648565, 0.89444548, 1.02571987, 1.38886076, 2.93250413,
+         16.31579137, np.nan, np.nan)
+    ),
+    "orchards.late": (
+        (np.nan, np.nan, 3.23479117, 2.89358929, 2.26608974, 1.55097031, 1.30467792, 1.49662547, 1.4828835, np.nan,
+         np.nan, np.nan),
+        (np.nan, np.nan, 0.39699712, 0.63309703, 0.82655222, 0.84154509, 1.3655052, 2.68800721, 5.97820939, np.nan,
+         np.nan, np.nan)
+    ),
+    "orchards.early": (
+        (np.nan, np.nan, 6.041257, 3.64919705, 3.58986405, 2.5755806, 2.15976432, 1.77717079, 1.26510627, 0.83016068,
+         1.42303341, 1.33245819),
+        (np.nan, np.nan, 0.33380985, 0.25093488, 0.43650375, 0.41209965, 0.6789444, 0.92986061, 1.47051233,
+         7.74197235, 31.23073474, 50.27611992)
+    ),
+    "vines": (
+        (np.nan, np.nan, 3.35175186, 1.78079832, 1.72469496, 1.50618428, 1.62109982, 1.84373881, 1.22864322, 0.964792,
+         np.nan, np.nan),
+        (np.nan, np.nan, 0.87079513, 0.96399236, 1.70106473, 2.4263123, 5.65941534, 11.61103514, 72.79685246,
+         31.96897057, np.nan, np.nan)
+    )
+}
+
+# The options and probabilities of the simple drift-filtering model
+SIMPLE_DRIFT_FILTERING_FRACTIONS = (.25, .5, .75, .9)
+SIMPLE_DRIFT_FILTERING_PROBABILITIES = (.1, .5, .75, .9)
+
+# The unit vectors (x, y) pointing downwind for the eight wind directions in meteorological notation
+DOWNWIND_VECTORS = {
+    0: (0, -1),
+    45: (-1, -1),
+    90: (-1, 0),
+    135: (-1, 1),
+    180: (0, 1),
+    225: (1, 1),
+    270: (1, 0),
+    315: (1, -1)
+}
+
+
+def sinpi(x):
+    """
+    Calculates sin(pi * x) exactly at multiples of 0.5, like the R function of the same name.
+
+    Args:
+        x: The argument in half-turns.
+
+    Returns:
+        The sine of the argument.
+    """
+    x = np.fmod(x, 2.)
+    result = np.sin(np.pi * x)
+    return np.where(np.fmod(x, 1.) == 0, 0., np.where(np.fmod(x, .5) == 0, np.where((x == .5) | (x == -1.5), 1., -1.),
+                                                      result))
+
+
+def tanpi(x):
+    """
+    Calculates tan(pi * x) exactly at multiples of 0.25, like the R function of the same name.
+
+    Args:
+        x: The argument in half-turns.
+
+    Returns:
+        The tangent of the argument.
+    """
+    x = np.fmod(x, 1.)
+    x = np.where(x > .5, x - 1., np.where(x <= -.5, x + 1., x))
+    result = np.tan(np.pi * x)
+    return np.where(x == 0, 0., np.where(x == .25, 1., np.where(x == -.25, -1., result)))
+
+
+def bands(x, y, angle, width=1., angle_def="mathematical"):
+    """
+    Subdivides the Euclidean plane into parallel bands of equal width and returns the band of each point. This is a
+    port of the `bands` function of the XDrift R package.
+
+    Args:
+        x: The x-coordinates of the points.
+        y: The y-coordinates of the points.
+        angle: The orientation of the bands in degrees.
+        width: The width of the bands.
+        angle_def: Either `mathematical` or `meteorological`.
+
+    Returns:
+        An integer array that identifies the band of each point. Equal values indicate points on the same band.
+    """
+    if width <= 0:
+        raise ValueError("width must be > 0")
+    if angle_def not in ("mathematical", "meteorological"):
+        raise ValueError("angle_def must be either 'mathematical' or 'meteorological'")
+    if angle_def == "meteorological":
+        angle = 270 - angle
+    angle = angle % 180
+    alpha = angle / 180
+    beta = (90 - angle) / 180
+    if angle < 45 or angle >= 135:
+        b = y - tanpi(alpha) * x
+        d = abs(width / sinpi(beta))
+    else:
+        b = x - tanpi(beta) * y
+        d = abs(width / sinpi(alpha))
+    return np.ceil(b / d).astype(np.int64)
+
+
+def wind_sector(direction):
+    """
+    Bins wind directions into the eight principal directions the same way as the XSprayDrift module does.
+
+    Args:
+        direction: The wind directions in degrees and meteorological notation.
+
+    Returns:
+        The wind directions rounded to multiples of 45 degrees.
+    """
+    direction = np.asarray(direction, np.float64)
+    sector = np.ceil((direction - 22.5) / 45)
+    return np.where((direction > 22.5) & (direction <= 337.5), sector * 45, 0).astype(np.int64)
+
+
+def mindwdist(sources, direction, cells=None):
+    """
+    Calculates for every cell of a 1-square meter raster the minimum distance to a source cell in upwind direction.
+    This is the raster equivalent of the `mindwdist` function of the XDrift R package for points located at cell
+    centers and a maximum deviation of 0 degrees. Distances are measured along the eight principal directions, rows of
+    the raster run from North to South.
+
+    Args:
+        sources: A boolean raster that flags source cells.
+        direction: The wind direction in meteorological notation. Must be a multiple of 45 degrees.
+        cells: An optional boolean raster that flags the cells that are considered at all.
+
+    Returns:
+        A float raster of distances. Sources have a distance of 0 and cells without upwind source are NaN.
+    """
+    if direction not in DOWNWIND_VECTORS:
+        raise ValueError(f"Direction must be a multiple of 45 degrees: {direction}")
+    dx, dy = DOWNWIND_VECTORS[direction]
+    rows, cols = sources.shape
+    row, col = np.indices(sources.shape)
+    # coordinates with y pointing North
+    x = col
+    y = rows - 1 - row
+    if dx == 0:
+        line = x
+        position = y * dy
+    elif dy == 0:
+        line = y
+        position = x * dx
+    else:
+        line = y - dx * dy * x
+        position = x * dx
+    line = line - line.min()
+    position = position - position.min()
+    stride = position.max() + 2
+    order = np.lexsort((position.ravel(), line.ravel()))
+    key = line.ravel()[order] * stride
+    marked = np.where(sources.ravel()[order], key + position.ravel()[order], key - 1)
+    last_source = np.maximum.accumulate(marked) - key
+    steps = np.where(last_source >= 0, position.ravel()[order] - last_source, -1)
+    result = np.empty(rows * cols, np.float64)
+    result[order] = np.where(steps >= 0, steps * math.hypot(dx, dy), np.nan)
+    result = result.reshape(sources.shape)
+    if cells is not None:
+        result[~cells] = np.nan
+    return result
+
+
+def rautmann90(distance, crop="arable", target_exposure=np.nan):
+    """
+    Calculates spray-drift exposure according to the 90th percentile regressions of Rautmann et al. This is a port
+    of the `rautmann90` function of the XDrift R package.
+
+    Args:
+        distance: The distances in meters.
+        crop: The crop class, one of `arable`, `vines`, `orchards.early`, `orchards.late` or `hops`.
+        target_exposure: The value reported for distances of 0.
+
+    Returns:
+        The fractions of exposure at the given distances.
+    """
+    distance = np.asarray(distance, np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if crop == "arable":
+            exposure = 2.7705 * distance ** -0.9787 / 100
+        elif crop == "vines":
+            exposure = 44.506 * distance ** -1.5593 / 100
+        elif crop == "orchards.early":
+            exposure = np.where(
+                distance <= 11.4577, 66.686 * distance ** -0.7517 / 100, 3908.3 * distance ** -2.421 / 100)
+        elif crop == "orchards.late":
+            exposure = np.where(
+                distance <= 10.52439, 60.36 * distance ** -1.2243 / 100, 212.13 * distance ** -1.7583 / 100)
+        elif crop == "hops":
+            exposure = np.where(
+                distance <= 15.4687, 58.271 * distance ** -1.0043 / 100, 9205.3 * distance ** -2.8527 / 100)
+        else:
+            raise ValueError("crop must be 'arable', 'vines', 'orchards.early', 'orchards.late' or 'hops'")
+    exposure[np.isnan(exposure)] = 0
+    exposure[distance == 0] = target_exposure
+    return exposure
+
+
+def agdrift_g(distance, droplets="fine", q=.9, boom="low", target_exposure=np.nan):
+    """
+    Calculates spray-drift exposure according to the AgDRIFT model for ground applications. This is a port of the
+    `agdrift.g` function of the XDrift R package.
+
+    Args:
+        distance: The distances in meters.
+        droplets: The droplet size spectrum, either `fine` or `medium`.
+        q: The quantile, either 0.5 or 0.9.
+        boom: The boom height, either `low` or `high`.
+        target_exposure: The value reported for distances of 0.
+
+    Returns:
+        The fractions of exposure at the given distances.
+    """
+    if droplets not in ("fine", "medium"):
+        raise ValueError("droplets must be 'fine' or 'medium'")
+    if q not in (.5, .9):
+        raise ValueError("quantile must be 0.5 or 0.9")
+    if boom not in ("low", "high"):
+        raise ValueError("boom must be 'low' or 'high'")
+    distance = np.asarray(distance, np.float64)
+    feet = distance / .3048
+    near, far, high = {
+        ("low", .9, "fine"): ((1, .4081, 1.5866), (1.3322, .5262, 1.5548), None),
+        ("low", .9, "medium"): ((1, 2.0913, 1.2572), (.1419, .3187, 1.3885), None),
+        ("low", .5, "fine"): ((1, .8082, 1.5208), (1.2628, .9749, 1.5085), None),
+        ("low", .5, "medium"): ((1, 1.3742, 1.4863), (1.2205, 1.6014, 1.4803), None),
+        ("high", .9, "fine"): ((1, .1243, 1.91), (1.3322, .5262, 1.5548), (2.1749, .001185)),
+        ("high", .9, "medium"): ((1, 1.3058, 1.2714), (.1419, .3187, 1.3885), (.7089, .000754)),
+        ("high", .5, "fine"): ((1, .1409, 1.8605), (1.2628, .9749, 1.5085), (5.4877, .001541)),
+        ("high", .5, "medium"): ((1, .7802, 1.5183), (1.2205, 1.6014, 1.4803), (1.0639, .00091))
+    }[(boom, q, droplets)]
+    with np.errstate(invalid="ignore"):
+        exposure = np.where(
+            feet <= 25, near[0] / (1 + near[1] * feet) ** near[2], far[0] / (1 + far[1] * feet) ** far[2])
+        if high is not None:
+            exposure = exposure * (1 + high[0] * np.exp(-high[1] * feet))
+    exposure[np.isnan(exposure)] = 0
+    exposure[distance == 0] = target_exposure
+    return exposure
+
+
+def _log_gamma(a):
+    """
+    Calculates the logarithm of the gamma function element-wise.
+
+    Args:
+        a: The arguments.
+
+    Returns:
+        The logarithms of the gamma function.
+    """
+    return np.frompyfunc(math.lgamma, 1, 1)(a).astype(np.float64)
+
+
+def _regularized_gamma(a, x):
+    """
+    Calculates the regularized lower incomplete gamma function P(a, x) element-wise. Series and continued fraction
+    are only iterated for elements that have not converged yet.
+
+    Args:
+        a: The shape parameters, all positive.
+        x: The arguments, all non-negative.
+
+    Returns:
+        The values of P(a, x).
+    """
+    a, x = np.broadcast_arrays(np.asarray(a, np.float64), np.asarray(x, np.float64))
+    result = np.zeros(a.shape)
+    log_prefix = np.zeros(a.shape)
+    positive = x > 0
+    log_prefix[positive] = -x[positive] + a[positive] * np.log(x[positive]) - _log_gamma(a[positive])
+    series = np.flatnonzero(positive & (x < a + 1))
+    if len(series) > 0:
+        ap, xs = a.flat[series], x.flat[series]
+        term = 1 / ap
+        total = term.copy()
+        active = np.arange(len(series))
+        for _ in range(1000):
+            ap[active] += 1
+            term[active] *= xs[active] / ap[active]
+            total[active] += term[active]
+            active = active[np.abs(term[active]) >= np.abs(total[active]) * 1e-15]
+            if len(active) == 0:
+                break
+        result.flat[series] = total * np.exp(log_prefix.flat[series])
+    fraction = np.flatnonzero(positive & ~(x < a + 1))
+    if len(fraction) > 0:
+        af, xf = a.flat[fraction], x.flat[fraction]
+        tiny = 1e-300
+        b = xf + 1 - af
+        c = np.full(af.shape, 1 / tiny)
+        d = 1 / b
+        h = d.copy()
+        active = np.arange(len(fraction))
+        for i in range(1, 1000):
+            an = -i * (i - af[active])
+            b[active] += 2
+            d_active = an * d[active] + b[active]
+            d_active = np.where(np.abs(d_active) < tiny, tiny, d_active)
+            c_active = b[active] + an / c[active]
+            c_active = np.where(np.abs(c_active) < tiny, tiny, c_active)
+            d[active] = 1 / d_active
+            c[active] = c_active
+            delta = d[active] * c_active
+            h[active] *= delta
+            active = active[np.abs(delta - 1) >= 1e-15]
+            if len(active) == 0:
+                break
+        result.flat[fraction] = 1 - np.exp(log_prefix.flat[fraction]) * h
+    return result
+
+
+def _inverse_regularized_gamma(p, a):
+    """
+    Inverts the regularized lower incomplete gamma function by Halley's method, iterating only elements that have not
+    converged yet.
+
+    Args:
+        p: The probabilities, all within (0, 1).
+        a: The shape parameters, all positive.
+
+    Returns:
+        The arguments x with P(a, x) = p.
+    """
+    a1 = a - 1
+    log_gamma = _log_gamma(a)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # initial guess according to Numerical Recipes (3rd ed.), section 6.2.1
+        pp = np.where(p < .5, p, 1 - p)
+        t = np.sqrt(-2 * np.log(pp))
+        z = (2.30753 + t * .27061) / (1 + t * (.99229 + t * .04481)) - t
+        z = np.where(p < .5, -z, z)
+        x_large = np.maximum(1e-3, a * (1 - 1 / (9 * a) - z / (3 * np.sqrt(a))) ** 3)
+        t = 1 - a * (.253 + a * .12)
+        x_small = np.where(p < t, (p / t) ** (1 / a), 1 - np.log(1 - (p - t) / (1 - t)))
+        x = np.where(a > 1, x_large, x_small)
+        active = np.arange(len(x))
+        for _ in range(100):
+            xa, aa, a1a = x[active], a[active], a1[active]
+            error = _regularized_gamma(aa, xa) - p[active]
+            density = np.exp(-xa + a1a * np.log(xa) - log_gamma[active])
+            u = error / density
+            step = u / (1 - .5 * np.minimum(1, u * (a1a / xa - 1)))
+            step = np.where(np.isfinite(step), step, 0)
+            x_new = xa - step
+            x_new = np.where(x_new <= 0, .5 * xa, x_new)
+            x[active] = x_new
+            active = active[np.abs(x_new - xa) > 1e-14 * xa]
+            if len(active) == 0:
+                break
+    return x
+
+
+def qgamma(p, shape, rate=1.):
+    """
+    Calculates quantiles of the gamma distribution element-wise, like the R function of the same name. The inversion
+    uses `scipy.special.gammaincinv` if SciPy is installed and falls back to a NumPy implementation otherwise.
+
+    Args:
+        p: The probabilities.
+        shape: The shape parameters.
+        rate: The rate parameters.
+
+    Returns:
+        The quantiles. NaN parameters result in NaN quantiles.
+    """
+    p, a, rate = np.broadcast_arrays(
+        np.asarray(p, np.float64), np.asarray(shape, np.float64), np.asarray(rate, np.float64))
+    result = np.full(p.shape, np.nan)
+    valid = ~(np.isnan(p) | np.isnan(a) | np.isnan(rate))
+    result[valid & (p == 0)] = 0
+    result[valid & (p == 1)] = np.inf
+    solve = valid & (p > 0) & (p < 1)
+    if not solve.any():
+        return result
+    if special is not None:
+        result[solve] = special.gammaincinv(a[solve], p[solve]) / rate[solve]
+    else:
+        result[solve] = _inverse_regularized_gamma(p[solve], a[solve]) / rate[solve]
+    return result
+
+
+def xspraydrift_distance_bins(crop="arable", distance_bins="mean"):
+    """
+    Returns the lower boundaries of the distance classes of the XSprayDrift model together with the indices of
+    the associated parameter sets. This is a port of the distance classes returned by the `xspraydriftparameters`
+    function of the XDrift R package.
+
+    Args:
+        crop: The crop class.
+        distance_bins: Either `mean` for boundaries between measurement distances or `worst` for boundaries at
+            measurement distances.
+
+    Returns:
+        A tuple of the lower boundaries of the distance classes and the indices of the parameter sets.
+    """
+    if crop not in XSPRAYDRIFT_GAMMA_PARAMETERS:
+        raise ValueError(f"Unknown crop: {crop}")
+    index = np.flatnonzero(~np.isnan(XSPRAYDRIFT_GAMMA_PARAMETERS[crop][0]))
+    distance_classes = np.array(DISTANCE_CLASSES)[index]
+    if distance_bins == "mean":
+        boundaries = np.concatenate(((distance_classes[0],), distance_classes[:-1])) + np.concatenate(
+            ((0,), np.diff(distance_classes) / 2))
+    elif distance_bins == "worst":
+        boundaries = distance_classes
+    else:
+        raise ValueError("distance_bins must be 'mean' or 'worst'")
+    return boundaries, index
+
+
+def xspraydrift_class(distance, crop="arable", distance_bins="mean"):
+    """
+    Determines the distance class of the XSprayDrift model for each distance.
+
+    Args:
+        distance: The distances in meters.
+        crop: The crop class.
+        distance_bins: The delineation method of the distance classes.
+
+    Returns:
+        The zero-based indices of the distance classes. Distances outside the model domain result in -1.
+    """
+    boundaries, _ = xspraydrift_distance_bins(crop, distance_bins)
+    distance = np.asarray(distance, np.float64)
+    distance = np.where((distance > 0) & (distance < boundaries[0]), boundaries[0], distance)
+    upper = np.concatenate((boundaries, (250,)))
+    with np.errstate(invalid="ignore"):
+        distance_class = np.searchsorted(upper, distance, "right") - 1
+        distance_class[~((distance >= upper[0]) & (distance < upper[-1]))] = -1
+    return distance_class
+
+
+def xspraydrift_quantiles(q, crop="arable", distance_bins="mean"):
+    """
+    Calculates the deposition fractions of the XSprayDrift model for each distance class and quantile.
+
+    Args:
+        q: The quantiles.
+        crop: The crop class.
+        distance_bins: The delineation method of the distance classes.
+
+    Returns:
+        A float array with one row per quantile and one column per distance class.
+    """
+    _, index = xspraydrift_distance_bins(crop, distance_bins)
+    shape = np.array(XSPRAYDRIFT_GAMMA_PARAMETERS[crop][0])[index]
+    rate = np.array(XSPRAYDRIFT_GAMMA_PARAMETERS[crop][1])[index]
+    q = np.asarray(q, np.float64).reshape((-1, 1))
+    return qgamma(q, shape, rate) / 100
+
+
+def xspraydrift(distance, q, target_exposure=np.nan, crop="arable", pdf_type="gamma", distance_bins="mean"):
+    """
+    Calculates spray-drift exposure with the XSprayDrift model. This is a port of the `xspraydrift` function of the
+    XDrift R package, restricted to the lumped gamma parameterization.
+
+    Args:
+        distance: The distances in meters.
+        q: The quantile of the density functions, either a scalar or one value per distance.
+        target_exposure: The value reported for distances of 0.
+        crop: The crop class.
+        pdf_type: The type of density function. Only `gamma` is supported.
+        distance_bins: The delineation method of the distance classes, either `mean` or `worst`.
+
+    Returns:
+        The fractions of exposure at the given distances.
+    """
+    if pdf_type != "gamma":
+        raise ValueError(f"Unsupported PDF type: {pdf_type}")
+    distance = np.asarray(distance, np.float64)
+    distance_class = xspraydrift_class(distance, crop, distance_bins)
+    q, distance_class = np.broadcast_arrays(np.asarray(q, np.float64), distance_class)
+    exposure = np.zeros(q.shape)
+    inside = distance_class >= 0
+    # only distinct pairs of quantile and distance class are evaluated
+    _, index = xspraydrift_distance_bins(crop, distance_bins)
+    unique_q, q_index = np.unique(q[inside], return_inverse=True)
+    pairs, pair_index = np.unique(np.ravel(q_index) * len(index) + distance_class[inside], return_inverse=True)
+    pair_q, pair_class = np.divmod(pairs, len(index))
+    shape = np.array(XSPRAYDRIFT_GAMMA_PARAMETERS[crop][0])[index]
+    rate = np.array(XSPRAYDRIFT_GAMMA_PARAMETERS[crop][1])[index]
+    exposure[inside] = (qgamma(unique_q[pair_q], shape[pair_class], rate[pair_class]) / 100)[np.ravel(pair_index)]
+    exposure[np.isnan(exposure)] = 0
+    exposure[distance == 0] = target_exposure
+    return exposure
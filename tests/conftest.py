@@ -0,0 +1,68 @@
+"""
+Fixtures of the tests of the XSprayDrift component. The tests run in the Python environment of the Landscape Model,
+whose `base` and `attrib` packages must be importable, as the component folder itself is imported as package. Run as
+`python -m pytest tests` from the component folder.
+"""
+import importlib
+import os
+import sys
+import types
+import pytest
+
+# The folder of the component
+COMPONENT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, COMPONENT_FOLDER)
+
+
+class StubInput:
+    """
+    Stands in for an input of the component and provides a fixed value with global scale.
+    """
+    def __init__(self, value, unit=None):
+        """
+        Initializes a StubInput.
+
+        Args:
+            value: The value of the input.
+            unit: The unit of the value.
+        """
+        self._value = value
+        self._unit = unit
+
+    def read(self):
+        """
+        Reads the input.
+
+        Returns:
+            The data of the input with its values and unit.
+        """
+        return types.SimpleNamespace(values=self._value, unit=self._unit)
+
+    def describe(self):
+        """
+        Describes the input.
+
+        Returns:
+            A dictionary of the metadata of the input.
+        """
+        return {"unit": self._unit, "scales": "global", "element_names": (None,), "geometries": (None,)}
+
+
+@pytest.fixture
+def component():
+    """
+    Creates SprayDrift components whose inputs provide fixed values.
+
+    Returns:
+        A function that receives the input values by input name and returns a SprayDrift component.
+    """
+    sys.path.insert(0, os.path.dirname(COMPONENT_FOLDER))
+    component_type = importlib.import_module(os.path.basename(COMPONENT_FOLDER)).SprayDrift
+
+    def create(values):
+        result = component_type("SprayDrift", None, None)
+        result._inputs = {name: StubInput(value) for name, value in values.items()}
+        return result
+
+    return create
@@ -0,0 +1,62 @@
+"""
+Tests of the aggregation of deposition at the base_geometry scale by the native engine.
+"""
+import struct
+import numpy as np
+import native
+
+
+class ArrayOutput:
+    """
+    Stands in for an output and keeps the values of the last write.
+    """
+    def __init__(self):
+        """
+        Initializes an ArrayOutput.
+        """
+        self.values = None
+
+    def set_values(self, values, **keywords):
+        """
+        Receives values.
+
+        Args:
+            values: The values.
+            keywords: The slices and flags of the write, which are ignored.
+
+        Returns:
+            Nothing.
+        """
+        self.values = values
+
+
+def rectangle(x_min, x_max, y_min, y_max):
+    """
+    Encodes a rectangle in little-endian Well-Known-Binary representation.
+
+    Args:
+        x_min: The lowest x-coordinate.
+        x_max: The highest x-coordinate.
+        y_min: The lowest y-coordinate.
+        y_max: The highest y-coordinate.
+
+    Returns:
+        The Well-Known-Binary representation.
+    """
+    ring = ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max), (x_min, y_min))
+    return struct.pack("<BIII", 1, 3, 1, len(ring)) + b"".join(struct.pack("<dd", x, y) for x, y in ring)
+
+
+def test_overlapping_habitats():
+    # two habitats of 6 by 10 cells that overlap in the columns 4 and 5 of the grid
+    landscape = native.Landscape([rectangle(0, 6, 0, 10), rectangle(4, 10, 0, 10)], [2, 2], (0, 10, 0, 10), [2])
+    output = ArrayOutput()
+    writer = native.BaseGeometryWriter(output, landscape, 5)
+    row, col = np.nonzero(np.isin(np.arange(10), (4, 5))[np.newaxis].repeat(10, 0))
+    writer.add(1, row, col, np.ones(len(row), np.float32))
+    writer.add(4, np.array([9]), np.array([9]), np.array([3], np.float32))
+    writer.flush()
+    expected = np.zeros((5, 2), np.float32)
+    expected[1] = 20 / 60
+    expected[4, 1] = 3 / 60
+    np.testing.assert_allclose(output.values, expected, rtol=1e-6)
@@ -0,0 +1,44 @@
+"""
+Tests of the parameter record that the component writes for the XSprayDrift module.
+"""
+import h5py
+import numpy as np
+import pytest
+
+# The values of the inputs that are written into the parameter record
+INPUTS = {
+    "HabitatTypes": "2, 3",
+    "FieldDistanceSD": 1.,
+    "EPDistanceSD": 1.,
+    "MinimumDistanceToField": 0.,
+    "SourceExposure": "NA",
+    "RautmannClass": "arable",
+    "ReportingThreshold": 0.,
+    "ApplySimpleDriftFiltering": True,
+    "SprayDriftModel": "XSprayDrift",
+    "RandomSeed": 5,
+    "FilteringMinWidth": 1.,
+    "FilteringFraction": .5,
+    "AgDriftBoomHeight": "low",
+    "AgDriftDropletSize": "fine",
+    "AgDriftQuantile": .9,
+    "WriteBufferSize": 64.,
+    "MaxMemory": 0.
+}
+
+
+@pytest.mark.parametrize("filtering_types, expected", [([], b" "), ([5], b"5"), ([5, 6], b"5, 6")])
+def test_filtering_types(component, tmp_path, filtering_types, expected):
+    sd = component(dict(INPUTS, FilteringTypes=filtering_types))
+    with h5py.File(tmp_path / "arr.dat", "w") as f:
+        sd.write_module_parameters(f, "1sqm")
+    with h5py.File(tmp_path / "arr.dat", "r") as f:
+        data_set = f["/data/simulation/region/spray_drift/params"]
+        record = data_set[0]
+        assert data_set.attrs["schema_version"] == sd.PARAMETER_SCHEMA_VERSION
+    assert record["filtering_types"] == expected
+    # the module splits the filtering types like `strsplit(filtering_lulc_types, ", ", TRUE)`
+    assert [int(x) for x in record["filtering_types"].decode().split(", ") if x.strip()] == filtering_types
+    assert record["habitat_types"] == b"2, 3"
+    assert record["random_seed"] == 5
+    assert np.isclose(record["filtering_fraction"], .5)
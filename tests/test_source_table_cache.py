@@ -0,0 +1,42 @@
+"""
+Tests of the source tables that the native engine keeps in the landscape cache.
+"""
+import pickle
+import struct
+import numpy as np
+import native
+
+
+def rectangle(x_min, x_max, y_min, y_max):
+    """
+    Encodes a rectangle in little-endian Well-Known-Binary representation.
+
+    Args:
+        x_min: The lowest x-coordinate.
+        x_max: The highest x-coordinate.
+        y_min: The lowest y-coordinate.
+        y_max: The highest y-coordinate.
+
+    Returns:
+        The Well-Known-Binary representation.
+    """
+    ring = ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max), (x_min, y_min))
+    return struct.pack("<BIII", 1, 3, 1, len(ring)) + b"".join(struct.pack("<dd", x, y) for x, y in ring)
+
+
+def test_source_tables_are_shared_across_landscapes(tmp_path):
+    # a field next to a habitat and a field far away from any habitat
+    geometries = [rectangle(0, 20, 0, 40), rectangle(20, 60, 0, 40), rectangle(200, 220, 0, 20)]
+    cache = native.LandscapeCache(str(tmp_path), 1 << 30)
+    first, _ = native.cached_landscape(cache, geometries, [1, 2, 1], (0, 220, 0, 40), [2])
+    instrumentation = native.Instrumentation()
+    tables = [first.source_table(geometries[i], 90, instrumentation) for i in (0, 2)]
+    assert tables[0] is not None and tables[1] is None
+    # a landscape restored in another run or worker process reads the source tables from the cache
+    second = pickle.loads(pickle.dumps(native.cached_landscape(cache, geometries, [1, 2, 1], (0, 220, 0, 40), [2])[0]))
+    cached = [second.source_table(geometries[i], 90, instrumentation) for i in (0, 2)]
+    assert cached[0][0] == tables[0][0] and cached[1] is None
+    for expected, actual in zip(tables[0][1:], cached[0][1:]):
+        np.testing.assert_array_equal(actual, expected)
+        assert not actual.flags.writeable
+    assert instrumentation.stages["source table cache"]["counts"] == {"hits": 2, "misses": 2}